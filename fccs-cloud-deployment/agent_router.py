@@ -1,142 +1,673 @@
 """
 Intelligent Agent Router for CrewAI FCCS Project
-Routes user queries to the most appropriate single agent based on intent analysis
+Routes user queries to the most appropriate single agent based on intent analysis,
+or fans composite questions out to several agents and merges their answers
+
+Heavy dependencies (CrewAI, the Claude client, the RAG backend, the RL optimizer
+and the orchestrator configuration) are resolved lazily on first use so that
+importing this module is cheap. Set AGENT_ROUTER_PROFILE_INIT=1 to print how long
+each component takes to initialise, and use warm_up()/is_ready() to drive and
+observe readiness separately from "module imported".
 """
-from crewai import Agent, Crew, Task
-from typing import Dict, List, Tuple, Optional
-import re
+import asyncio
+import json
+import logging
 import os
-try:
-    from langchain_anthropic import ChatAnthropic
-    anthropic_api_key = os.getenv('ANTHROPIC_API_KEY')
-    if not anthropic_api_key:
-        raise ValueError("ANTHROPIC_API_KEY environment variable not set")
-
-    llm = ChatAnthropic(
-        model="claude-sonnet-4-20250514",
-        api_key=anthropic_api_key,
-        temperature=0.3,  # Consistent across all agents
-        max_tokens=800,   # Much shorter responses
-        timeout=30  # Consistent timeout
-    )
-    print(f"✅ ChatAnthropic initialized with Claude Sonnet 4")
-except ImportError as e:
-    llm = None
-    print(f"❌ Failed to import ChatAnthropic: {e}")
-except Exception as e:
-    llm = None
-    print(f"❌ Failed to initialize Claude: {e}")
-try:
-    from pinecone_rag_system import PineconeRAGSystem as RAGSystem
-    print("✅ Using PineconeRAGSystem for enhanced knowledge retrieval")
-except ImportError:
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TYPE_CHECKING
+
+from answer_cache import AnswerCache
+from bulkheads import AgentBulkheads, BulkheadFull
+from context_packer import ContextPacker
+from deadlines import (CACHED_ANSWER, PARTIAL_RESPONSE, SKIPPED_RAG, SKIPPED_RL, DeadlineExceeded,
+                       DeadlinePolicy, RequestDeadline)
+from execution_tiers import ExecutionProfile, ExecutionTierPolicy
+from fanout import FanoutPolicy, merge_answers
+from language_id import get_language_identifier
+from rag_cache import RAGContextCache
+from rl_snapshot import SnapshotRLPolicy
+from rl_writer import BackgroundInteractionWriter
+from routing_matcher import DEFAULT_CONFIG_PATH, RoutingMatcher, RoutingRulesWatcher
+from routing_metrics import RouterMetrics
+from session_memory import ConversationMemory, llm_summarizer
+from singleflight import SingleFlight, coalescing_key
+from tracing import RequestTrace, Tracer, UNSAMPLED
+from response_formatter import FCCSStreamingFormatter
+
+if TYPE_CHECKING:
+    from crewai import Agent, Crew, Task
+
+_MODULE_IMPORT_STARTED = time.perf_counter()
+
+# Status messages go through logging so production deployments can silence them
+logger = logging.getLogger(__name__)
+
+PROFILE_INIT = os.getenv('AGENT_ROUTER_PROFILE_INIT', '').lower() in ('1', 'true', 'yes')
+# CrewAI's step-by-step console output for every crew; per request, route_query(trace=True) turns it on
+VERBOSE = os.getenv('AGENT_ROUTER_VERBOSE', '0').lower() in ('1', 'true', 'yes')
+
+# Lazily initialised components, guarded by a re-entrant lock so that loaders
+# may depend on each other and concurrent first requests initialise only once
+_init_lock = threading.RLock()
+_components: Dict[str, object] = {}
+_init_profile: List[Dict] = []
+_ready = threading.Event()
+
+
+def _lazy_component(name: str) -> Callable:
+    """Decorator that runs a component loader once, caching and profiling the result"""
+    def decorator(loader: Callable) -> Callable:
+        def accessor():
+            if name in _components:
+                return _components[name]
+            with _init_lock:
+                if name in _components:
+                    return _components[name]
+                started = time.perf_counter()
+                try:
+                    value = loader()
+                except Exception as e:
+                    _record_init(name, time.perf_counter() - started, 'error', str(e))
+                    raise
+                _record_init(name, time.perf_counter() - started, 'ok')
+                _components[name] = value
+                return value
+        accessor.__name__ = loader.__name__
+        accessor.__doc__ = loader.__doc__
+        return accessor
+    return decorator
+
+
+def _record_init(component: str, seconds: float, status: str, detail: str = "") -> None:
+    """Record a component initialisation in the profile report"""
+    entry = {'component': component, 'seconds': seconds, 'status': status, 'detail': detail}
+    _init_profile.append(entry)
+    if PROFILE_INIT:
+        print(f"⏱️ init {component}: {seconds * 1000:.1f} ms ({status}){' - ' + detail if detail else ''}")
+
+
+@_lazy_component('crewai')
+def get_crewai() -> Tuple[type, type, type]:
+    """Import CrewAI on first use and return (Agent, Crew, Task)"""
+    from crewai import Agent, Crew, Task
+    return Agent, Crew, Task
+
+
+DEFAULT_LLM_SETTINGS = {
+    'model': "claude-sonnet-4-20250514",
+    'temperature': 0.3,  # Consistent across all agents
+    'max_tokens': 800,   # Much shorter responses
+    'timeout': 30  # Consistent timeout
+}
+
+_tier_llms: Dict[Tuple, object] = {}
+
+
+def create_llm(**overrides):
+    """Create an LLM client from DEFAULT_LLM_SETTINGS plus overrides, or None if it is unavailable
+
+    AGENT_ROUTER_LLM_BACKEND=offline returns the deterministic stand-in from
+    offline_backends instead of ChatAnthropic.
+    """
+    settings = dict(DEFAULT_LLM_SETTINGS, **overrides)
+    if os.getenv('AGENT_ROUTER_LLM_BACKEND', 'anthropic').lower() == 'offline':
+        from offline_backends import DeterministicLLM
+        logger.info(f"🧪 Using offline deterministic LLM ({settings['model']})")
+        return DeterministicLLM.from_env(**settings)
     try:
-        from rag_system import SimpleRAGSystem as RAGSystem
-        print("⚠️ Using SimpleRAGSystem (fallback)")
-    except ImportError:
-        # Create OpenAI-powered RAG fallback system
+        from langchain_anthropic import ChatAnthropic
+        anthropic_api_key = os.getenv('ANTHROPIC_API_KEY')
+        if not anthropic_api_key:
+            raise ValueError("ANTHROPIC_API_KEY environment variable not set")
+
+        llm = ChatAnthropic(api_key=anthropic_api_key, **settings)
+        logger.info(f"✅ ChatAnthropic initialized with {settings['model']}")
+        return llm
+    except ImportError as e:
+        logger.error(f"❌ Failed to import ChatAnthropic: {e}")
+    except Exception as e:
+        logger.error(f"❌ Failed to initialize Claude: {e}")
+    return None
+
+
+@_lazy_component('llm')
+def get_llm():
+    """Create the shared ChatAnthropic client, or None if it is unavailable"""
+    return create_llm()
+
+
+def get_tier_llm(overrides: Dict):
+    """Shared LLM client for an execution tier's model settings, created on first use"""
+    key = tuple(sorted(overrides.items()))
+    if key not in _tier_llms:
+        with _init_lock:
+            if key not in _tier_llms:
+                started = time.perf_counter()
+                _tier_llms[key] = create_llm(**overrides)
+                _record_init(f"llm{list(key)}", time.perf_counter() - started, 'ok')
+    return _tier_llms[key]
+
+
+class OpenAIRAGSystem:
+    """OpenAI-powered RAG fallback used when no knowledge base backend is installed"""
+
+    def __init__(self, openai_api_key=None):
+        from openai import OpenAI
+        self.openai_client = OpenAI(api_key=openai_api_key) if openai_api_key else None
+
+    def retrieve_relevant_context(self, query, prioritize_uploads=False):
+        if not self.openai_client:
+            return [f"Context for: {query[:50]}..."]
+
         try:
-            from openai import OpenAI
+            # Use OpenAI to generate contextual information
+            response = self.openai_client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": "You are an Oracle FCCS expert. Provide relevant context for the user's query."},
+                    {"role": "user", "content": f"Provide relevant FCCS context for: {query}"}
+                ],
+                max_tokens=200,
+                temperature=0.1
+            )
+            return [response.choices[0].message.content]
+        except Exception as e:
+            logger.warning(f"OpenAI RAG fallback error: {e}")
+            return [f"FCCS context for: {query[:50]}..."]
 
-            class OpenAIRAGSystem:
-                def __init__(self, openai_api_key=None):
-                    self.openai_client = OpenAI(api_key=openai_api_key) if openai_api_key else None
 
-                def retrieve_relevant_context(self, query, prioritize_uploads=False):
-                    if not self.openai_client:
-                        return [f"Context for: {query[:50]}..."]
+class MinimalRAGSystem:
+    """Final minimal fallback that only echoes the query"""
 
-                    try:
-                        # Use OpenAI to generate contextual information
-                        response = self.openai_client.chat.completions.create(
-                            model="gpt-3.5-turbo",
-                            messages=[
-                                {"role": "system", "content": "You are an Oracle FCCS expert. Provide relevant context for the user's query."},
-                                {"role": "user", "content": f"Provide relevant FCCS context for: {query}"}
-                            ],
-                            max_tokens=200,
-                            temperature=0.1
-                        )
-                        return [response.choices[0].message.content]
-                    except Exception as e:
-                        print(f"OpenAI RAG fallback error: {e}")
-                        return [f"FCCS context for: {query[:50]}..."]
-
-            RAGSystem = OpenAIRAGSystem
-            print("✅ Using OpenAI RAG System fallback")
-        except ImportError:
-            # Final minimal fallback
-            class RAGSystem:
-                def __init__(self, openai_api_key=None):
-                    pass
-                def retrieve_relevant_context(self, query, prioritize_uploads=False):
-                    return [f"Context for: {query[:50]}..."]
-            print("⚠️ Using minimal RAG system")
-
-# Import Enhanced RL optimizer
-try:
-    from enhanced_rl_system import get_rl_optimizer, AgentInteraction
-    RL_ENABLED = True
-    print("✅ Enhanced RL System with Random Forest and Q-Learning available")
-except ImportError:
+    def __init__(self, openai_api_key=None):
+        pass
+
+    def retrieve_relevant_context(self, query, prioritize_uploads=False):
+        return [f"Context for: {query[:50]}..."]
+
+
+@_lazy_component('rag_backend')
+def get_rag_system_class() -> type:
+    """Resolve the best available RAG system class; AGENT_ROUTER_RAG_BACKEND=offline selects the stand-in"""
+    if os.getenv('AGENT_ROUTER_RAG_BACKEND', '').lower() == 'offline':
+        from offline_backends import OfflineRAGSystem
+        logger.info("🧪 Using offline RAG system")
+        return OfflineRAGSystem
+    try:
+        from pinecone_rag_system import PineconeRAGSystem
+        logger.info("✅ Using PineconeRAGSystem for enhanced knowledge retrieval")
+        return PineconeRAGSystem
+    except ImportError:
+        pass
+    try:
+        from rag_system import SimpleRAGSystem
+        logger.warning("⚠️ Using SimpleRAGSystem (fallback)")
+        return SimpleRAGSystem
+    except ImportError:
+        pass
+    try:
+        import openai  # noqa: F401
+        logger.info("✅ Using OpenAI RAG System fallback")
+        return OpenAIRAGSystem
+    except ImportError:
+        logger.warning("⚠️ Using minimal RAG system")
+        return MinimalRAGSystem
+
+
+@_lazy_component('rl_optimizer')
+def get_rl_components() -> Tuple[Optional[Callable], Optional[type]]:
+    """Resolve the RL optimizer factory and interaction record type, or (None, None)"""
+    if os.getenv('AGENT_ROUTER_RL_BACKEND', '').lower() == 'offline':
+        from offline_backends import OfflineInteraction, get_offline_rl_optimizer
+        logger.info("🧪 Using offline RL optimizer")
+        return get_offline_rl_optimizer, OfflineInteraction
+    # Import Enhanced RL optimizer
+    try:
+        from enhanced_rl_system import get_rl_optimizer, AgentInteraction
+        logger.info("✅ Enhanced RL System with Random Forest and Q-Learning available")
+        return get_rl_optimizer, AgentInteraction
+    except ImportError:
+        pass
     try:
         from rl_agent_optimizer import get_rl_optimizer, AgentInteraction
-        RL_ENABLED = True
-        print("✅ Fallback RL Agent Optimizer available")
+        logger.info("✅ Fallback RL Agent Optimizer available")
+        return get_rl_optimizer, AgentInteraction
     except ImportError:
-        RL_ENABLED = False
-        print("⚠️ No RL Agent Optimizer available")
+        logger.warning("⚠️ No RL Agent Optimizer available")
+        return None, None
 
-import time
-import uuid
-from datetime import datetime
 
-# Import enhanced orchestrator configuration
-try:
-    from orchestrator_config import orchestrator_config
-    ORCHESTRATOR_ENHANCED = True
-    print("✅ Enhanced Orchestrator Configuration loaded")
-except ImportError:
-    ORCHESTRATOR_ENHANCED = False
-    print("⚠️ Enhanced Orchestrator Configuration not available")
+def rl_enabled() -> bool:
+    """Whether an RL optimizer implementation is installed"""
+    return get_rl_components()[0] is not None
+
+
+@_lazy_component('orchestrator_config')
+def get_orchestrator_config():
+    """Load the enhanced orchestrator configuration, or None if not installed"""
+    try:
+        from orchestrator_config import orchestrator_config
+        logger.info("✅ Enhanced Orchestrator Configuration loaded")
+        return orchestrator_config
+    except ImportError:
+        logger.warning("⚠️ Enhanced Orchestrator Configuration not available")
+        return None
+
+
+def warm_up() -> List[Dict]:
+    """Initialise every lazy component and mark the module ready; returns the init profile"""
+    get_crewai()
+    get_llm()
+    get_rag_system_class()
+    get_rl_components()
+    get_orchestrator_config()
+    _ready.set()
+    return get_init_profile()
+
+
+def warm_up_in_background() -> threading.Thread:
+    """Start warm_up() on a daemon thread so a server can accept probes immediately"""
+    def _run():
+        try:
+            warm_up()
+        except Exception as e:
+            logger.error(f"❌ Agent router warm-up failed: {e}")
+
+    thread = threading.Thread(target=_run, name='agent-router-warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+def is_ready() -> bool:
+    """Readiness signal: True once all components are initialised (not merely imported)"""
+    return _ready.is_set()
+
+
+def wait_until_ready(timeout: Optional[float] = None) -> bool:
+    """Block until the router is ready or the timeout expires"""
+    return _ready.wait(timeout)
+
+
+# Process-wide limit on concurrent aroute_query() executions; asyncio
+# semaphores are bound to a loop, so one is kept per running event loop
+MAX_ASYNC_CONCURRENCY = int(os.getenv('AGENT_ROUTER_MAX_CONCURRENCY', '200'))
+_async_limiters: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]' = weakref.WeakKeyDictionary()
+
+
+def _get_async_limiter() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    limiter = _async_limiters.get(loop)
+    if limiter is None:
+        limiter = asyncio.Semaphore(MAX_ASYNC_CONCURRENCY)
+        _async_limiters[loop] = limiter
+    return limiter
+
+
+def get_init_profile() -> List[Dict]:
+    """Return import and component initialisation timings in the order they happened"""
+    return list(_init_profile)
+
+
+def format_init_profile() -> str:
+    """Render the init profile as a human readable report"""
+    lines = ["Agent router init profile:"]
+    total = 0.0
+    for entry in get_init_profile():
+        total += entry['seconds']
+        detail = f" ({entry['detail']})" if entry['detail'] else ""
+        lines.append(f"  {entry['component']:<22} {entry['seconds'] * 1000:9.1f} ms  {entry['status']}{detail}")
+    lines.append(f"  {'total':<22} {total * 1000:9.1f} ms")
+    lines.append(f"  ready: {is_ready()}")
+    return "\n".join(lines)
+
+
+# Backwards compatible module attributes, resolved on first access
+_LAZY_ATTRIBUTES = {
+    'Agent': lambda: get_crewai()[0],
+    'Crew': lambda: get_crewai()[1],
+    'Task': lambda: get_crewai()[2],
+    'llm': get_llm,
+    'RAGSystem': get_rag_system_class,
+    'RL_ENABLED': rl_enabled,
+    'get_rl_optimizer': lambda: get_rl_components()[0],
+    'AgentInteraction': lambda: get_rl_components()[1],
+    'orchestrator_config': get_orchestrator_config,
+    'ORCHESTRATOR_ENHANCED': lambda: get_orchestrator_config() is not None,
+}
+
+
+def __getattr__(name: str):
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Professional user context for all agents; one constant so every backstory ends in identical bytes
+PROFESSIONAL_CONTEXT = (
+    "IMPORTANT: All system users are qualified financial professionals, senior consultants, and responsible "
+    "technical experts.\n"
+    "They do not require disclaimers, warnings about consulting professionals, or basic cautionary statements.\n"
+    "Provide direct, actionable, technical responses without legal disclaimers or suggestions to "
+    "\"consult with professionals.\"\n"
+    "Focus on practical solutions and expert-level guidance."
+)
+
+# Language-specific prompt fragments substituted into TASK_TEMPLATES
+LANGUAGE_PROMPTS = {
+    'pt': {
+        'language_instruction': "Responda em português brasileiro com linguagem técnica e detalhada.",
+        'lang_suffix': "em português brasileiro"
+    },
+    'en': {
+        'language_instruction': "Respond in English with technical and detailed language.",
+        'lang_suffix': "in English"
+    }
+}
+
+# Task prompt templates per agent; placeholders are {query}, {enhanced_context},
+# {language_instruction} and {lang_suffix}
+TASK_TEMPLATES = {
+    'fccs_expert': {
+        'description': """
+                You are an Oracle FCCS expert focused on giving EXACTLY what the user needs.
+
+                CRITICAL INSTRUCTIONS:
+                - For CONFIGURATION questions: Give navigation steps and settings only
+                - For SCRIPTING questions: Provide code only when specifically requested
+                - Keep responses under 3 sentences for simple questions
+                - Never provide scripts unless explicitly asked for code/script/groovy
+                - Ask for clarification if unsure whether they want configuration steps or code
+
+                QUESTION TYPE DETECTION:
+                - "How do I set up..." = Configuration (give menu steps)
+                - "Where do I find..." = Configuration (give navigation)
+                - "What settings..." = Configuration (list settings)
+                - "Create a script..." = Scripting (provide code)
+                - "Write groovy..." = Scripting (provide code)
+
+                User Question: {query}
+
+                Enhanced Context: {enhanced_context}
+
+                Respond with EXACTLY what they need - configuration steps OR code - not both {lang_suffix}
+                """,
+        'expected_output': "Precise, concise answer matching the question type (configuration steps OR code) {lang_suffix}"
+    },
+    'groovy_validator': {
+        'description': """
+                Analyze and validate the following Groovy code/rule for FCCS:
+
+                CODE/RULE: {query}
+
+                CONTEXT: {enhanced_context}
+
+                {language_instruction}
+                Check for syntax errors, logic issues, and performance problems.
+                Suggest specific improvements and best practices.
+                """,
+        'expected_output': "Technical validation with improvement suggestions {lang_suffix}"
+    },
+    'smartview_designer': {
+        'description': """
+                Design a Smart View report layout for FCCS based on the following requirements:
+
+                REQUIREMENTS: {query}
+
+                CONTEXT: {enhanced_context}
+
+                {language_instruction}
+                Include POV setup, dimensions, member selections, and formatting recommendations.
+                """,
+        'expected_output': "Smart View report model with detailed layout {lang_suffix}"
+    },
+    'pdf_converter': {
+        'description': """
+                Extract and process technical content from the provided document:
+
+                DOCUMENT: {query}
+
+                CONTEXT: {enhanced_context}
+
+                {language_instruction}
+                Focus on technical FCCS information, procedures, and configuration details.
+                """,
+        'expected_output': "Extracted and processed technical content {lang_suffix}"
+    },
+    'consolidation_validator': {
+        'description': """
+                Analyze and detect consolidation errors in Oracle FCCS:
+
+                ISSUE/QUERY: {query}
+
+                CONTEXT: {enhanced_context}
+
+                {language_instruction}
+
+                Perform the following analysis:
+                1. Identify the type of consolidation error (elimination posting, intercompany mismatch, account mapping, etc.)
+                2. Explain the root cause of the error
+                3. Assess the impact on financial statements
+                4. Provide step-by-step correction procedures
+                5. Suggest preventive measures for future occurrences
+                6. Include relevant Groovy rules or Data Management corrections if applicable
+
+                Focus on practical, actionable solutions for FCCS consolidation issues.
+                """,
+        'expected_output': "Comprehensive consolidation error analysis with correction steps {lang_suffix}"
+    },
+    'document_intelligence': {
+        'description': """
+                Analyze uploaded documents to extract specific company information and answer the question:
+
+                QUESTION: {query}
+
+                CONTEXT: {enhanced_context}
+
+                {language_instruction}
+
+                Focus on finding specific information from uploaded documents rather than providing generic advice:
+                1. Search for specific company procedures, and timelines mentioned in uploaded documents
+                2. Extract exact dates, deadlines, and schedules from company materials
+                3. Identify organization-specific requirements and procedures
+                4. Quote or reference specific sections from uploaded documents when available
+                5. If specific information isn't found in documents, clearly state that and suggest where to look
+                6. Prioritize document-sourced answers over general best practices
+
+                Always specify the source of information (uploaded document vs. general knowledge).
+                """,
+        'expected_output': "Document-specific analysis with exact quotes and references {lang_suffix}"
+    },
+    'sox_compliance': {
+        'description': """
+                Provide expert SOX compliance guidance for the following FCCS-related question:
+
+                QUESTION: {query}
+
+                CONTEXT: {enhanced_context}
+
+                {language_instruction}
+
+                Address the following SOX compliance aspects:
+                1. Identify relevant SOX requirements and control objectives
+                2. Specify applicable COSO framework components
+                3. Detail required control activities and documentation
+                4. Explain testing procedures and evidence requirements
+                5. Address segregation of duties and access control requirements
+                6. Identify potential control deficiencies and remediation steps
+                7. Provide audit preparation guidance and evidence collection
+                8. Reference relevant PCAOB standards when applicable
+
+                Focus on practical, implementable SOX controls for FCCS environments.
+                Include specific control procedures, testing steps, and documentation requirements.
+                """,
+        'expected_output': "Comprehensive SOX compliance guidance with specific control procedures {lang_suffix}"
+    },
+    'orchestrator': {
+        'description': """
+                You coordinate FCCS workflows with a friendly, efficient approach.
+
+                STYLE:
+                - Be conversational and supportive
+                - Keep responses brief and focused
+                - Show understanding of workflow pressures
+                - Give step-by-step guidance when needed
+
+                USER REQUEST: {query}
+
+                Determine what type of close they need and give them clear next steps {lang_suffix}
+                """,
+        'expected_output': "Clear workflow guidance with next steps {lang_suffix}"
+    }
+}
+
+
+# Garbled or very simple inputs skip the orchestrator and go straight to rule routing
+ORCHESTRATOR_BYPASS_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r'[a-z]{20,}',  # Long strings of repeated characters
+    r'[;]{3,}',      # Multiple semicolons
+    r'[i]{10,}',     # Long repeated characters
+    r'^[a-z]{1,3}\s*$',  # Very short queries
+    r'[-]{3,}',      # Multiple dashes
+    r'[a-z]+\s+r[-]+',  # Patterns like "sdeau r-------"
+    r'[^\w\s]{3,}',  # Multiple special characters
+    r'\w+\s*[-]{2,}\w+',  # Words with dashes
+    r'[a-z]+\s+[a-z][-]+[a-z]+',  # Garbled text patterns
+))
+
+
+class _PreparedRequest:
+    """A request routed up to the point where its agent runs; shared by the sync, async and streaming paths"""
+    __slots__ = ('session_id', 'query', 'start_time', 'timings', 'deadline', 'profile', 'retrievals', 'agent',
+                 'confidence', 'language', 'candidates', 'prioritize_uploads', 'rag_context', 'cache_key',
+                 'context_packing', 'crew')
+
+    def __init__(self, session_id: str, query: str, deadline: RequestDeadline, profile: ExecutionProfile):
+        self.session_id = session_id
+        self.query = query
+        self.start_time = time.time()
+        self.timings: Dict[str, float] = {}
+        self.deadline = deadline
+        self.profile = profile
+        self.retrievals: Dict = {}
+        self.agent: Optional[str] = None
+        self.confidence = 0.0
+        self.language: Optional[str] = None
+        self.candidates: List[Tuple[str, float]] = []
+        self.prioritize_uploads = False
+        self.rag_context: List[str] = []
+        self.cache_key: Optional[str] = None
+        self.context_packing: Optional[Dict] = None
+        self.crew = None
+
 
 class AgentRouter:
     """Routes user queries to the most appropriate agent based on intent analysis"""
 
     def __init__(self):
         # Initialize RAG system with OpenAI key (still needed for embeddings)
+        RAGSystem = get_rag_system_class()
         openai_key = os.getenv('OPENAI_API_KEY')
         if openai_key:
             self.rag_system = RAGSystem(openai_api_key=openai_key)
         else:
-            print("⚠️ OPENAI_API_KEY not set - RAG system may not work properly")
+            logger.warning("⚠️ OPENAI_API_KEY not set - RAG system may not work properly")
             self.rag_system = RAGSystem()
+        self.rag_cache = RAGContextCache.from_env()
+        self.answer_cache = AnswerCache.from_env()
+        # Concurrent identical queries share one crew execution
+        self.singleflight = SingleFlight.from_env()
+        # Default per-request deadline and how it is split across stages
+        self.deadlines = DeadlinePolicy.from_env()
+        # Head-sampled request spans (AGENT_ROUTER_TRACING_*)
+        self.tracer = Tracer.from_env()
+        # Per-conversation memory, compacted in the background to a fixed token budget
+        summarizer = llm_summarizer(get_llm()) if os.getenv('SESSION_MEMORY_SUMMARIZER') == 'llm' else None
+        self.session_memory = ConversationMemory.from_env(summarizer)
+        # In-flight aroute_query() calls by request id, for cancel_request()
+        self._inflight_requests: Dict[str, Tuple[asyncio.AbstractEventLoop, asyncio.Task]] = {}
+        # Background pool for I/O that overlaps routing (RAG retrieval)
+        self._io_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('AGENT_ROUTER_IO_WORKERS', '8')),
+            thread_name_prefix='agent-router-io'
+        )
         self.agents = self._initialize_agents()
-        self.routing_rules = self._define_routing_rules()
+        # Per-agent execution slots and queues, each a share of the router-wide limit,
+        # so one overloaded agent cannot starve the rest
+        self.bulkheads = AgentBulkheads.from_env(MAX_ASYNC_CONCURRENCY, len(self.agents))
+        # Routing rules come from agents_config.json, which must be present,
+        # and are recompiled in the background when the file changes
+        self.routing_config_path = os.getenv('AGENTS_CONFIG_PATH', DEFAULT_CONFIG_PATH)
+        self._matcher = self._build_matcher()
+        self.routing_watcher = RoutingRulesWatcher.from_env(
+            self.routing_config_path, self._build_matcher, self._swap_matcher
+        )
+        self._task_templates = self._compile_task_templates()
+        self.context_packer = ContextPacker.from_env()
+        self.metrics = RouterMetrics.from_env()
+        self.fanout = FanoutPolicy.from_env()
+        # Per-complexity execution profiles; tiers that change LLM settings get their own agents
+        self.execution_tiers = ExecutionTierPolicy.from_env()
+        self._tier_agents: Dict[str, Dict[str, 'Agent']] = {}
+        self._tier_agents_lock = threading.Lock()
+        self._fanout_executor: Optional[ThreadPoolExecutor] = None
+        self._fanout_executor_lock = threading.Lock()
 
         # Initialize RL optimizer
-        if RL_ENABLED:
+        get_rl_optimizer, _ = get_rl_components()
+        if get_rl_optimizer:
             self.rl_optimizer = get_rl_optimizer()
         else:
             self.rl_optimizer = None
-
-    def _initialize_agents(self) -> Dict[str, Agent]:
-        """Initialize all available agents"""
-
-        # Professional user context for all agents
-        professional_context = """
-        IMPORTANT: All system users are qualified financial professionals, senior consultants, and responsible technical experts. 
-        They do not require disclaimers, warnings about consulting professionals, or basic cautionary statements.
-        Provide direct, actionable, technical responses without legal disclaimers or suggestions to "consult with professionals."
-        Focus on practical solutions and expert-level guidance.
+        # With AGENT_ROUTER_RL_INFERENCE=snapshot, recommendations come from policy snapshots trained in a
+        # background process, which also feeds every interaction to its own copy of the optimizer
+        self.rl_policy = SnapshotRLPolicy.from_env(list(self.agents)) if self.rl_optimizer else None
+        # Interactions are persisted off the request path when the writer is enabled
+        recorder = self.rl_policy or self.rl_optimizer
+        self.rl_writer = BackgroundInteractionWriter.from_env(recorder) if recorder else None
+
+        # A constructed router has every component it needs to serve requests
+        _ready.set()
+
+    @classmethod
+    def routing_only(cls) -> 'AgentRouter':
+        """Build a router with routing rules only, for offline analysis and benchmarks
+
+        No LLM, RAG backend, CrewAI agents or RL optimizer are created, so the
+        returned router can score, route and detect language but not execute.
         """
+        router = cls.__new__(cls)
+        router.agents = dict.fromkeys(TASK_TEMPLATES)
+        router.routing_config_path = os.getenv('AGENTS_CONFIG_PATH', DEFAULT_CONFIG_PATH)
+        router._matcher = router._build_matcher()
+        router.routing_watcher = None
+        router.rl_optimizer = None
+        router.rl_policy = None
+        router.metrics = RouterMetrics()
+        router.fanout = FanoutPolicy.from_env()
+        router.execution_tiers = ExecutionTierPolicy.from_env()
+        return router
+
+    def _initialize_agents(self, llm=None) -> Dict[str, 'Agent']:
+        """Initialize all available agents, on the shared LLM unless another one is given"""
+        Agent, _, _ = get_crewai()
+        if llm is None:
+            llm = get_llm()
+
+        professional_context = PROFESSIONAL_CONTEXT
 
         return {
             'fccs_expert': Agent(
                 role="Oracle FCCS Expert",
                 goal="Provide precise technical answers to Oracle FCCS questions, using exclusively the content provided in the context.",
                 backstory=f"Senior Oracle EPM Cloud consultant specialized in FCCS. Technical support for operational and functional questions. {professional_context}",
-                verbose=True,
+                verbose=VERBOSE,
                 allow_delegation=False,
                 tools=[],
                 llm=llm
@@ -199,402 +730,60 @@ class AgentRouter:
             )
         }
 
-    def _define_routing_rules(self) -> Dict[str, Dict]:
-        """Define routing rules based on keywords and patterns"""
-        return {
-            'fccs_expert': {
-                'keywords': [
-                    'consolidação', 'consolidation', 'fccs', 'close', 'fechamento',
-                    'eliminação', 'elimination', 'intercompany', 'entity',
-                    'scenario', 'período', 'period', 'workflow', 'processo',
-                    'dimensão', 'dimension', 'como fazer', 'how to', 'dúvida',
-                    'problema', 'error', 'erro', 'configuração', 'setup'
-                ],
-                'patterns': [
-                    r'como\s+.*fccs',
-                    r'o\s+que\s+é',
-                    r'para\s+que\s+serve',
-                    r'onde\s+.*encontrar',
-                    r'erro\s+.*fccs',
-                    r'problema\s+com'
-                ],
-                'priority': 1
-            },
-            'groovy_validator': {
-                'keywords': [
-                    'groovy', 'script', 'regra', 'rule', 'business rule',
-                    'código', 'code', 'syntax', 'erro de sintaxe', 'validar',
-                    'validate', 'revisar', 'review', 'calculation', 'cálculo',
-                    'formula', 'fórmula', 'function', 'função'
-                ],
-                'patterns': [
-                    r'groovy.*erro',
-                    r'validar.*groovy',
-                    r'revisar.*script',
-                    r'business\s+rule.*erro',
-                    r'código.*fccs',
-                    r'fix.*groovy'
-                ],
-                'priority': 2
-            },
-            'smartview_designer': {
-                'keywords': [
-                    'smart view', 'smartview', 'relatório', 'report', 'reporting',
-                    'layout', 'design', 'visualização', 'visualization',
-                    'dashboard', 'tabela', 'table', 'gráfico', 'chart',
-                    'formato', 'format', 'excel', 'export'
-                ],
-                'patterns': [
-                    r'smart\s+view.*layout',
-                    r'relatório.*fccs',
-                    r'criar.*relatório',
-                    r'design.*report',
-                    r'formato.*smart\s+view'
-                ],
-                'priority': 3
-            },
-            'pdf_converter': {
-                'keywords': [
-                    'pdf', 'documento', 'document', 'manual', 'guide',
-                    'guia', 'extrair', 'extract', 'converter', 'convert',
-                    'processar', 'process', 'arquivo', 'file'
-                ],
-                'patterns': [
-                    r'pdf.*fccs',
-                    r'extrair.*pdf',
-                    r'converter.*documento',
-                    r'processar.*manual'
-                ],
-                'priority': 4
-            },
-            'consolidation_validator': {
-                'keywords': [
-                    'error', 'erro', 'posting', 'elimination', 'eliminação',
-                    'equity pickup', 'intercompany', 'consolidation', 'consolidação',
-                    'wrong account', 'conta errada', 'mismatch', 'divergência',
-                    'validate', 'validar', 'detect', 'detectar', 'check',
-                    'revenue instead', 'investment', 'balance', 'saldo'
-                ],
-                'patterns': [
-                    r'elimination.*posting.*wrong',
-                    r'equity.*pickup.*revenue',
-                    r'intercompany.*mismatch',
-                    r'consolidation.*error',
-                    r'posting.*wrong.*account',
-                    r'detect.*error',
-                    r'validate.*consolidation',
-                    r'wrong.*account.*elimination'
-                ],
-                'priority': 1
-            },
-            'document_intelligence': {
-                'keywords': [
-                    'target date', 'data alvo', 'deadline', 'prazo', 'schedule', 'cronograma',
-                    'procedure', 'procedimento', 'company', 'empresa',
-                    'organization', 'organização', 'specific', 'específico', 'according to',
-                    'conforme', 'wiseclose', 'closewise', 'at wiseclose', 'na wiseclose', 
-                    'our company', 'nossa empresa', 'our organization', 'nossa organização', 
-                    'company specific', 'document says', 'documento diz', 'uploaded', 'carregado', 
-                    'based on', 'baseado em', 'by which date', 'what date', 'when must'
-                ],
-                'patterns': [
-                    r'wiseclose.*date',
-                    r'closewise.*date',
-                    r'by\s+which\s+date.*wiseclose',
-                    r'target\s+date.*at\s+\w+',
-                    r'deadline.*at\s+\w+',
-                    r'when.*\w+.*complete',
-                    r'schedule.*at\s+\w+',
-                    r'procedure.*at\s+\w+',
-                    r'according\s+to.*document',
-                    r'based\s+on.*uploaded',
-                    r'company.*specific.*date',
-                    r'organization.*specific'
-                ],
-                'priority': 1
-            },
-            'sox_compliance': {
-                'keywords': [
-                    'sox', 'sarbanes oxley', 'sarbanes-oxley', 'compliance', 'conformidade',
-                    'internal control', 'controle interno', 'audit', 'auditoria', 'pcaob',
-                    'control deficiency', 'deficiência', 'material weakness', 'fraqueza material',
-                    'significant deficiency', 'coso', 'itgc', 'application control',
-                    'segregation of duties', 'segregação', 'access control', 'controle acesso',
-                    'evidence', 'evidência', 'documentation', 'documentação', 'testing',
-                    'teste', 'walkthrough', 'monitoring', 'monitoramento', 'remediation',
-                    'remediação', 'control activities', 'atividades controle', 'risk assessment',
-                    'avaliação risco', 'control environment', 'ambiente controle', 'entity level',
-                    'fraud', 'fraude', 'authorization', 'autorização', 'approval', 'aprovação'
-                ],
-                'patterns': [
-                    r'sox.*control',
-                    r'sarbanes.*oxley',
-                    r'internal.*control.*\w+',
-                    r'audit.*requirement',
-                    r'control.*deficiency',
-                    r'material.*weakness',
-                    r'significant.*deficiency',
-                    r'segregation.*duties',
-                    r'access.*control.*fccs',
-                    r'control.*testing',
-                    r'evidence.*audit',
-                    r'documentation.*control',
-                    r'compliance.*requirement',
-                    r'regulatory.*audit',
-                    r'control.*framework'
-                ],
-                'priority': 1
-            },
-            'orchestrator': {
-                'keywords': [
-                    'workflow', 'process', 'end-to-end', 'complete', 'full', 'comprehensive',
-                    'month-end', 'quarter-end', 'year-end', 'close process', 'prepare',
-                    'coordinate', 'manage', 'orchestrate', 'multiple', 'all agents',
-                    'entire process', 'full consolidation', 'complete close', 'step by step',
-                    'beginning to end', 'start to finish', 'overall', 'holistic'
-                ],
-                'patterns': [
-                    r'month.*end.*close',
-                    r'quarter.*end.*close',
-                    r'year.*end.*close',
-                    r'prepare.*close',
-                    r'complete.*consolidation',
-                    r'entire.*process',
-                    r'full.*workflow',
-                    r'end.*to.*end',
-                    r'coordinate.*agents',
-                    r'manage.*process',
-                    r'orchestrate.*workflow',
-                    r'step.*by.*step.*process'
-                ],
-                'priority': 1
-            },
-            'orchestrator_agent': {
-                'keywords': [
-                    'master control', 'controle mestre', 'workflow master', 'coordinate all',
-                    'complex workflow', 'multiple processes', 'advanced orchestration',
-                    'full automation', 'complete automation', 'enterprise workflow'
-                ],
-                'patterns': [
-                    r'master.*control',
-                    r'complex.*workflow',
-                    r'advanced.*orchestration',
-                    r'full.*automation',
-                    r'enterprise.*workflow'
-                ],
-                'priority': 1
-            },
-            'data_integration_agent': {
-                'keywords': [
-                    'data integration', 'integração dados', 'erp integration', 'source data',
-                    'data loader', 'extract data', 'extrair dados', 'integration', 'integração',
-                    'source system', 'sistema origem', 'load data', 'carregar dados',
-                    'data mapping', 'mapeamento dados', 'etl', 'data pipeline'
-                ],
-                'patterns': [
-                    r'data.*integration',
-                    r'erp.*integration',
-                    r'source.*data.*load',
-                    r'extract.*data.*fccs',
-                    r'integration.*erp',
-                    r'load.*data.*source'
-                ],
-                'priority': 2
-            },
-            'data_load_agent': {
-                'keywords': [
-                    'trial balance', 'balancete', 'data load', 'carregar dados', 'load trial',
-                    'balance load', 'tb load', 'trial balance load', 'data loading',
-                    'carregamento dados', 'load process', 'processo carga'
-                ],
-                'patterns': [
-                    r'trial.*balance.*load',
-                    r'load.*trial.*balance',
-                    r'tb.*load',
-                    r'balance.*load',
-                    r'data.*load.*process',
-                    r'load.*data.*fccs'
-                ],
-                'priority': 2
-            },
-            'data_validation_agent': {
-                'keywords': [
-                    'data validation', 'validação dados', 'data completeness', 'completude dados',
-                    'data integrity', 'integridade dados', 'validate data', 'validar dados',
-                    'data quality', 'qualidade dados', 'completeness check', 'data check'
-                ],
-                'patterns': [
-                    r'data.*validation',
-                    r'validate.*data',
-                    r'data.*completeness',
-                    r'data.*integrity',
-                    r'data.*quality',
-                    r'completeness.*check'
-                ],
-                'priority': 2
-            },
-            'fx_rate_agent': {
-                'keywords': [
-                    'fx rate', 'taxa câmbio', 'currency', 'moeda', 'exchange rate',
-                    'taxa câmbio', 'currency translation', 'tradução moeda', 'foreign exchange',
-                    'câmbio', 'translation', 'tradução', 'currency conversion', 'conversão moeda'
-                ],
-                'patterns': [
-                    r'fx.*rate',
-                    r'currency.*translation',
-                    r'exchange.*rate',
-                    r'foreign.*exchange',
-                    r'currency.*conversion',
-                    r'translation.*currency'
-                ],
-                'priority': 2
-            },
-            'intercompany_recon_agent': {
-                'keywords': [
-                    'intercompany reconciliation', 'reconciliação intercompany', 'ic recon',
-                    'intercompany recon', 'reconciliation', 'reconciliação', 'ic reconciliation',
-                    'intercompany matching', 'match intercompany', 'ic matching'
-                ],
-                'patterns': [
-                    r'intercompany.*reconciliation',
-                    r'ic.*recon',
-                    r'intercompany.*recon',
-                    r'reconciliation.*intercompany',
-                    r'intercompany.*matching',
-                    r'ic.*matching'
-                ],
-                'priority': 2
-            },
-            'intercompany_elimination_agent': {
-                'keywords': [
-                    'intercompany elimination', 'eliminação intercompany', 'ic elimination',
-                    'elimination', 'eliminação', 'intercompany entries', 'lançamentos intercompany',
-                    'elimination entries', 'lançamentos eliminação', 'ic entries'
-                ],
-                'patterns': [
-                    r'intercompany.*elimination',
-                    r'ic.*elimination',
-                    r'elimination.*intercompany',
-                    r'intercompany.*entries',
-                    r'elimination.*entries',
-                    r'ic.*entries'
-                ],
-                'priority': 2
-            },
-            'journal_monitoring_agent': {
-                'keywords': [
-                    'journal workflow', 'workflow journal', 'journal monitoring', 'monitor journal',
-                    'journal approval', 'aprovação journal', 'journal entry workflow',
-                    'workflow lançamento', 'journal process', 'processo journal'
-                ],
-                'patterns': [
-                    r'journal.*workflow',
-                    r'workflow.*journal',
-                    r'journal.*monitoring',
-                    r'monitor.*journal',
-                    r'journal.*approval',
-                    r'journal.*process'
-                ],
-                'priority': 2
-            },
-            'variance_analysis_agent': {
-                'keywords': [
-                    'variance analysis', 'análise variação', 'variance', 'variação',
-                    'trend analysis', 'análise tendência', 'financial analysis', 'análise financeira',
-                    'performance analysis', 'análise desempenho', 'variance report'
-                ],
-                'patterns': [
-                    r'variance.*analysis',
-                    r'analysis.*variance',
-                    r'trend.*analysis',
-                    r'financial.*analysis',
-                    r'performance.*analysis',
-                    r'variance.*report'
-                ],
-                'priority': 2
-            },
-            'sox_compliance_agent': {
-                'keywords': [
-                    'sox control', 'controle sox', 'sox validation', 'validação sox',
-                    'control validation', 'validação controle', 'sox compliance',
-                    'conformidade sox', 'internal control validation', 'sox audit'
-                ],
-                'patterns': [
-                    r'sox.*control',
-                    r'sox.*validation',
-                    r'control.*validation',
-                    r'sox.*compliance',
-                    r'sox.*audit',
-                    r'internal.*control.*validation'
-                ],
-                'priority': 2
-            },
-            'audit_trail_agent': {
-                'keywords': [
-                    'audit trail', 'trilha auditoria', 'audit documentation', 'documentação auditoria',
-                    'audit report', 'relatório auditoria', 'trail extraction', 'extração trilha',
-                    'audit evidence', 'evidência auditoria', 'audit log'
-                ],
-                'patterns': [
-                    r'audit.*trail',
-                    r'audit.*documentation',
-                    r'audit.*report',
-                    r'trail.*extraction',
-                    r'audit.*evidence',
-                    r'audit.*log'
-                ],
-                'priority': 2
-            }
+    @property
+    def routing_rules(self) -> Dict[str, Dict]:
+        """Rules behind the routing matcher currently in use"""
+        return self._matcher.rules
+
+    def _build_matcher(self, version: int = 0) -> RoutingMatcher:
+        return RoutingMatcher.from_config(self.routing_config_path, version)
+
+    def _swap_matcher(self, matcher: RoutingMatcher) -> None:
+        # A single reference assignment: requests hold on to the matcher they
+        # started with and the next request picks up the new one
+        self._matcher = matcher
+
+    def reload_routing_rules(self) -> bool:
+        """Re-read agents_config.json now instead of waiting for the watcher"""
+        if self.routing_watcher is not None:
+            return self.routing_watcher.check()
+        self._swap_matcher(self._build_matcher(self._matcher.version + 1))
+        return True
+
+    def get_routing_rules_stats(self) -> Dict:
+        """Source, version and reload counters of the active routing rules"""
+        matcher = self._matcher
+        stats = {
+            'source': matcher.source,
+            'version': matcher.version,
+            'loaded_at': datetime.fromtimestamp(matcher.loaded_at).isoformat(),
+            'agents': len(matcher.agent_names)
         }
+        if self.routing_watcher is not None:
+            stats['watcher'] = self.routing_watcher.get_stats()
+        return stats
 
-    def analyze_intent(self, query: str) -> Tuple[str, float]:
+    def analyze_intent(self, query: str, matcher: Optional[RoutingMatcher] = None,
+                       scores: Optional[Dict[str, float]] = None) -> Tuple[str, float]:
         """Analyze user query and determine the best agent with orchestrator bypass option"""
         query_lower = query.lower()
 
         # Check for orchestrator bypass keywords (garbled input, simple technical queries)
-        bypass_patterns = [
-            r'[a-z]{20,}',  # Long strings of repeated characters
-            r'[;]{3,}',      # Multiple semicolons
-            r'[i]{10,}',     # Long repeated characters
-            r'^[a-z]{1,3}\s*$',  # Very short queries
-            r'[-]{3,}',      # Multiple dashes
-            r'[a-z]+\s+r[-]+',  # Patterns like "sdeau r-------"
-            r'[^\w\s]{3,}',  # Multiple special characters
-            r'\w+\s*[-]{2,}\w+',  # Words with dashes
-            r'[a-z]+\s+[a-z][-]+[a-z]+',  # Garbled text patterns
-        ]
-
-        for pattern in bypass_patterns:
-            if re.search(pattern, query_lower):
+        for pattern in ORCHESTRATOR_BYPASS_PATTERNS:
+            if pattern.search(query_lower):
                 # Bypass orchestrator for garbled/simple inputs
-                return self._direct_agent_routing(query_lower)
+                return self._direct_agent_routing(query_lower, matcher, scores)
 
         # For normal queries, use orchestrator-first approach
         return 'orchestrator', 0.95
 
-    def _direct_agent_routing(self, query_lower: str) -> Tuple[str, float]:
+    def _direct_agent_routing(self, query_lower: str, matcher: Optional[RoutingMatcher] = None,
+                              scores: Optional[Dict[str, float]] = None) -> Tuple[str, float]:
         """Direct routing bypassing orchestrator for simple/garbled queries"""
-        scores = {}
-
-        for agent_name, rules in self.routing_rules.items():
-            if agent_name == 'orchestrator':  # Skip orchestrator
-                continue
-
-            score = 0
-
-            # Check keywords
-            for keyword in rules['keywords']:
-                if keyword in query_lower:
-                    score += 1
-
-            # Check patterns
-            for pattern in rules['patterns']:
-                if re.search(pattern, query_lower):
-                    score += 2  # Patterns get higher weight
-
-            # Apply priority weighting (lower priority number = higher weight)
-            priority_weight = 1 / rules['priority']
-            scores[agent_name] = score * priority_weight
+        if scores is None:
+            scores = (matcher or self._matcher).weighted_scores(query_lower)
+        # Skip orchestrator
+        scores = {agent_name: score for agent_name, score in scores.items() if agent_name != 'orchestrator'}
 
         # Find the agent with highest score
         if not scores or max(scores.values()) == 0:
@@ -608,144 +797,1195 @@ class AgentRouter:
 
     def detect_language(self, query: str) -> str:
         """Detect if query is in Portuguese or English"""
-        portuguese_indicators = [
-            'como', 'fazer', 'onde', 'quando', 'porque', 'qual', 'quais', 'para', 'com', 'sem',
-            'consolidação', 'relatório', 'regra', 'erro', 'problema', 'configuração', 'validar',
-            'criar', 'gerar', 'extrair', 'processar', 'analisar', 'revisar', 'desenhar'
-        ]
+        return get_language_identifier().detect(query)[0]
+
+    def detect_language_with_confidence(self, query: str) -> Tuple[str, float]:
+        """Detect the query language with the identifier's confidence in [0.5, 1.0]"""
+        return get_language_identifier().detect(query)
+
+    def route_query(self, query: str, context: str = "", bypass_cache: bool = False,
+                    fan_out: Optional[bool] = None, deadline: Optional[float] = None,
+                    conversation_id: Optional[str] = None, trace: bool = False,
+                    memory: Optional[str] = None) -> Dict:
+        """Route query to appropriate agent and execute
+
+        Answers are served from the persistent answer cache when possible;
+        pass bypass_cache=True to always run the crew (the fresh answer is
+        still stored). With fan-out enabled (fan_out=True or
+        AGENT_ROUTER_FANOUT=1), queries whose top specialist scores are close
+        run on several agents concurrently and return one merged answer.
+
+        `deadline` (seconds; default AGENT_ROUTER_DEADLINE_SECONDS) bounds the
+        whole request. Retrieval gets a share of it, RL scoring is skipped when
+        it is short, and when too little is left for the LLM the latest cached
+        answer or a partial response is returned instead. Applied degradations
+        are listed in result['deadline'].
+
+        Queries sharing a `conversation_id` see a bounded memory of the earlier
+        turns (see session_memory.py) instead of the caller resending history.
+        Callers that keep conversation state themselves (worker_pool.py) pass
+        the rendered section as `memory` instead.
+
+        A sampled share of requests (AGENT_ROUTER_TRACING_SAMPLE_RATE) is traced
+        as spans; trace=True always traces the request and runs its crew
+        verbose. Traced results carry a 'trace_id'.
+        """
+        request_trace = self.tracer.start(flagged=trace)
+        if memory is None:
+            memory = self._recall(conversation_id)
+        try:
+            result = self._route_query(query, context, bypass_cache, fan_out, deadline, memory, request_trace)
+        except Exception as e:
+            request_trace.end(error=str(e))
+            raise
+        self._remember(conversation_id, query, result)
+        return self._end_trace(request_trace, result)
 
-        query_lower = query.lower()
-        portuguese_count = sum(1 for word in portuguese_indicators if word in query_lower)
+    def _prepare_request(self, session_id: str, query: str, deadline: Optional[float], fan_out: Optional[bool],
+                         request_trace: RequestTrace, start_retrieval: Callable[[str], Dict]) -> _PreparedRequest:
+        """Execution tier, speculative retrieval, agent selection and fan-out candidates for a new request
 
-        # If 2 or more Portuguese indicators, assume Portuguese
-        return 'pt' if portuguese_count >= 2 else 'en'
+        `start_retrieval` is _start_speculative_retrieval() or its async
+        counterpart; the caller awaits the variant the routing picked.
+        """
+        request = _PreparedRequest(session_id, query, self.deadlines.start(deadline), self._select_profile(query))
+
+        # Start RAG retrieval before routing so the slow I/O overlaps agent selection
+        stage_start = time.perf_counter()
+        if request.profile.retrieves:
+            request.retrievals = start_retrieval(query)
+        request.timings['retrieval_dispatch'] = time.perf_counter() - stage_start
+
+        with request_trace.span('route'):
+            request.agent, request.confidence, request.language = self._select_agent(query, request.timings,
+                                                                                     session_id, request.deadline)
+            request.candidates = self._fanout_candidates(query, fan_out)
+        routed_agents = [request.agent] + [name for name, _ in request.candidates]
+        request.prioritize_uploads = 'document_intelligence' in routed_agents
+        return request
+
+    def _prepare_execution(self, request: _PreparedRequest, context: str, memory: str, bypass_cache: bool,
+                           verbose: bool = False) -> Optional[Dict]:
+        """Answer cache lookup, deadline check, context packing and crew build for a single-agent request
+
+        Returns the result when the request is answered without running its
+        agent (a cache hit or the deadline fallback); otherwise None, with
+        request.crew ready to run.
+        """
+        request.cache_key, cached_answer = self._lookup_answer(request.agent, request.query, context + memory,
+                                                               request.rag_context, request.language, bypass_cache,
+                                                               request.profile)
+        if cached_answer is not None:
+            return self._success_result(request.session_id, request.query, request.agent, request.confidence,
+                                        request.rag_context, request.start_time, request.timings, cached_answer,
+                                        cached=True, request_deadline=request.deadline,
+                                        execution_tier=request.profile.name)
+        if not request.deadline.can_execute():
+            return self._deadline_fallback(request.session_id, request.query, request.agent, request.confidence,
+                                           request.rag_context, request.start_time, request.timings,
+                                           request.language, request.deadline, execution_tier=request.profile.name)
+
+        packed_context, request.context_packing = self._pack_context(request.agent, request.query,
+                                                                     request.rag_context, request.timings,
+                                                                     request.profile)
+        request.crew = self._build_crew(request.agent, request.query, context, packed_context, request.language,
+                                        request.timings, request.profile, memory, verbose)
+        return None
+
+    def _finish_execution(self, request: _PreparedRequest, answer, partial: bool, coalesced: bool) -> Dict:
+        """Cache a fresh answer and build the success result; partial and coalesced answers are not stored"""
+        if partial:
+            request.deadline.degrade(PARTIAL_RESPONSE)
+        elif not coalesced:
+            self._store_answer(request.cache_key, request.agent, answer, request.query, request.language)
+        return self._success_result(request.session_id, request.query, request.agent, request.confidence,
+                                    request.rag_context, request.start_time, request.timings, answer,
+                                    coalesced=coalesced, request_deadline=request.deadline,
+                                    context_packing=request.context_packing, execution_tier=request.profile.name)
+
+    def _route_query(self, query: str, context: str, bypass_cache: bool, fan_out: Optional[bool],
+                     deadline: Optional[float], memory: str = "", request_trace: RequestTrace = UNSAMPLED) -> Dict:
+        request = self._prepare_request(str(uuid.uuid4()), query, deadline, fan_out, request_trace,
+                                        self._start_speculative_retrieval)
 
-    def route_query(self, query: str, context: str = "") -> Dict:
-        """Route query to appropriate agent and execute"""
-        start_time = time.time()
-        session_id = str(uuid.uuid4())
+        # Get relevant context from RAG system
+        with request_trace.span('retrieve'):
+            request.rag_context = self._await_retrieval(request.retrievals, query, request.prioritize_uploads,
+                                                        request.timings, request.profile, request.deadline)
+        if request.candidates:
+            with request_trace.span('kickoff', fanout=len(request.candidates)):
+                return self._route_fanout(request, context, bypass_cache, memory)
+        result = self._prepare_execution(request, context, memory, bypass_cache, request_trace.verbose)
+        if result is not None:
+            return result
 
-        # Get traditional confidence scores for all agents
-        traditional_scores = {}
-        for agent_name in self.agents.keys():
-            if agent_name == 'orchestrator':
-                traditional_scores[agent_name] = 0.95  # Default orchestrator confidence
+        # Execute and return result
+        timings = request.timings
+        stage_start = time.perf_counter()
+        partial = coalesced = False
+        try:
+            with request_trace.span('kickoff'):
+                if request.deadline.bounded:
+                    result, partial = self._execute_within(request.agent, request.crew, request.profile,
+                                                           request.deadline.execution_budget(), timings)
+                else:
+                    result, coalesced = self._kickoff(
+                        coalescing_key(request.agent, query, request.language, context + memory), request.crew,
+                        timings
+                    )
+        except BulkheadFull as e:
+            timings['kickoff'] = time.perf_counter() - stage_start
+            return self._shed_result(request.session_id, query, request.agent, request.confidence,
+                                     request.start_time, timings, e, request_deadline=request.deadline,
+                                     execution_tier=request.profile.name)
+        except DeadlineExceeded:
+            timings['kickoff'] = time.perf_counter() - stage_start
+            return self._deadline_fallback(request.session_id, query, request.agent, request.confidence,
+                                           request.rag_context, request.start_time, timings, request.language,
+                                           request.deadline, context_packing=request.context_packing,
+                                           execution_tier=request.profile.name)
+        except Exception as e:
+            timings['kickoff'] = time.perf_counter() - stage_start
+            return self._failure_result(request.session_id, query, request.agent, request.confidence,
+                                        request.rag_context, request.start_time, timings, str(e),
+                                        request_deadline=request.deadline, context_packing=request.context_packing,
+                                        execution_tier=request.profile.name)
+        timings['kickoff'] = time.perf_counter() - stage_start
+        with request_trace.span('format'):
+            return self._finish_execution(request, result, partial, coalesced)
+
+    def _end_trace(self, request_trace: RequestTrace, result: Dict) -> Dict:
+        """Close and export a request's trace; sampled results get its trace_id"""
+        request_trace.end(result)
+        if request_trace.sampled:
+            result['trace_id'] = request_trace.trace_id
+        return result
+
+    async def aroute_query(self, query: str, context: str = "", request_id: Optional[str] = None,
+                           timeout: Optional[float] = None, bypass_cache: bool = False,
+                           fan_out: Optional[bool] = None, deadline: Optional[float] = None,
+                           conversation_id: Optional[str] = None, trace: bool = False) -> Dict:
+        """Async variant of route_query() using async retrieval and the crew's async kickoff
+
+        Concurrent calls share a process-wide limiter (AGENT_ROUTER_MAX_CONCURRENCY).
+        A request is cancelled when its task is cancelled, when cancel_request()
+        is called with its request_id, or when `timeout` seconds elapse.
+        `deadline` degrades gracefully instead, as in route_query().
+        """
+        session_id = request_id or str(uuid.uuid4())
+        current = asyncio.current_task()
+        self._inflight_requests[session_id] = (asyncio.get_running_loop(), current)
+        memory = self._recall(conversation_id)
+        request_trace = self.tracer.start(flagged=trace)
+        try:
+            async with _get_async_limiter():
+                routing = self._aroute_query(session_id, query, context, bypass_cache, fan_out, deadline, memory,
+                                             request_trace)
+                if timeout is None:
+                    result = await routing
+                else:
+                    try:
+                        result = await asyncio.wait_for(routing, timeout)
+                    except asyncio.TimeoutError:
+                        return self._end_trace(request_trace, {
+                            'success': False,
+                            'error': f"Request timed out after {timeout:g}s",
+                            'cancelled': True,
+                            'session_id': session_id
+                        })
+                self._remember(conversation_id, query, result)
+                return self._end_trace(request_trace, result)
+        except BaseException as e:
+            request_trace.end(error=f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            self._inflight_requests.pop(session_id, None)
+
+    async def _aroute_query(self, session_id: str, query: str, context: str, bypass_cache: bool,
+                            fan_out: Optional[bool] = None, deadline: Optional[float] = None,
+                            memory: str = "", request_trace: RequestTrace = UNSAMPLED) -> Dict:
+        request = self._prepare_request(session_id, query, deadline, fan_out, request_trace,
+                                        self._astart_speculative_retrieval)
+        try:
+            with request_trace.span('retrieve'):
+                request.rag_context = await self._aawait_retrieval(request.retrievals, query,
+                                                                   request.prioritize_uploads, request.timings,
+                                                                   request.profile, request.deadline)
+            if request.candidates:
+                with request_trace.span('kickoff', fanout=len(request.candidates)):
+                    return await self._aroute_fanout(request, context, bypass_cache, memory)
+            result = self._prepare_execution(request, context, memory, bypass_cache, request_trace.verbose)
+            if result is not None:
+                return result
+
+            timings = request.timings
+            stage_start = time.perf_counter()
+            partial = coalesced = False
+            try:
+                with request_trace.span('kickoff'):
+                    if request.deadline.bounded:
+                        result, partial = await asyncio.to_thread(self._execute_within, request.agent, request.crew,
+                                                                  request.profile,
+                                                                  request.deadline.execution_budget(), timings)
+                    else:
+                        result, coalesced = await self._akickoff(
+                            coalescing_key(request.agent, query, request.language, context + memory), request.crew,
+                            timings
+                        )
+            except asyncio.CancelledError:
+                raise
+            except BulkheadFull as e:
+                timings['kickoff'] = time.perf_counter() - stage_start
+                return self._shed_result(session_id, query, request.agent, request.confidence, request.start_time,
+                                         timings, e, request_deadline=request.deadline,
+                                         execution_tier=request.profile.name)
+            except DeadlineExceeded:
+                timings['kickoff'] = time.perf_counter() - stage_start
+                return self._deadline_fallback(session_id, query, request.agent, request.confidence,
+                                               request.rag_context, request.start_time, timings, request.language,
+                                               request.deadline, context_packing=request.context_packing,
+                                               execution_tier=request.profile.name)
+            except Exception as e:
+                timings['kickoff'] = time.perf_counter() - stage_start
+                return self._failure_result(session_id, query, request.agent, request.confidence,
+                                            request.rag_context, request.start_time, timings, str(e),
+                                            request_deadline=request.deadline,
+                                            context_packing=request.context_packing,
+                                            execution_tier=request.profile.name)
+            timings['kickoff'] = time.perf_counter() - stage_start
+            with request_trace.span('format'):
+                return self._finish_execution(request, result, partial, coalesced)
+        except asyncio.CancelledError:
+            for task in request.retrievals.values():
+                task.cancel()
+            self._record_interaction(session_id, query, request.agent, request.confidence,
+                                     time.time() - request.start_time, request.rag_context, success=False)
+            raise
+
+    def stream_query(self, query: str, context: str = "", bypass_cache: bool = False,
+                     fan_out: Optional[bool] = None, deadline: Optional[float] = None,
+                     conversation_id: Optional[str] = None, trace: bool = False) -> Iterator[Dict]:
+        """Route a query and stream the answer as events while the LLM generates it
+
+        Yields dicts with an 'event' key:
+        - 'route': selected agent, confidence and language, before generation starts
+        - 'token': raw text as it arrives from the LLM
+        - 'html': formatted HTML for each block completed so far
+        - 'done' or 'error': final result and timings (incl. time_to_first_token)
+        Pass the generator to stream_to_sse() to serve it as Server-Sent Events.
+        Cached and fan-out answers arrive as a single 'token' event.
+        With a `deadline`, generation stops when it runs out and the text so far
+        is returned as a partial response. Tracing works as in route_query().
+        """
+        memory = self._recall(conversation_id)
+        request_trace = self.tracer.start(flagged=trace, streamed=True)
+        result = None
+        error = None
+        # The trace is ended exactly once, below, however the stream stops: the last event,
+        # an exception, or the client closing the generator (GeneratorExit at a yield)
+        try:
+            request = self._prepare_request(str(uuid.uuid4()), query, deadline, fan_out, request_trace,
+                                            self._start_speculative_retrieval)
+            yield {
+                'event': 'route',
+                'selected_agent': request.agent,
+                'confidence': request.confidence,
+                'language': request.language,
+                'execution_tier': request.profile.name,
+                'session_id': request.session_id
+            }
+
+            with request_trace.span('retrieve'):
+                request.rag_context = self._await_retrieval(request.retrievals, query, request.prioritize_uploads,
+                                                            request.timings, request.profile, request.deadline)
+            if request.candidates:
+                with request_trace.span('kickoff', fanout=len(request.candidates)):
+                    result = self._route_fanout(request, context, bypass_cache, memory)
             else:
-                score = self._calculate_agent_confidence(query, agent_name)
-                traditional_scores[agent_name] = score
+                result = self._prepare_execution(request, context, memory, bypass_cache, request_trace.verbose)
+            if result is not None:
+                yield from self._stream_result(request, result)
+                self._remember(conversation_id, query, result)
+                yield self._final_event(request_trace, result)
+                return
+
+            timings = request.timings
+            try:
+                release = self._acquire_slot(request.agent, timings, request.deadline.execution_budget()
+                                             if request.deadline.bounded else None)
+            except BulkheadFull as e:
+                result = self._shed_result(request.session_id, query, request.agent, request.confidence,
+                                           request.start_time, timings, e, request_deadline=request.deadline,
+                                           execution_tier=request.profile.name)
+                yield self._final_event(request_trace, result)
+                return
+            chunks = self._stream_task(request.agent, request.crew.tasks[0], request.profile, request_trace.verbose)
+
+            formatter = FCCSStreamingFormatter()
+            parts = []
+            partial = False
+            stage_start = time.perf_counter()
+            try:
+                with request_trace.span('kickoff'):
+                    for text in chunks:
+                        if not parts:
+                            timings['time_to_first_token'] = time.time() - request.start_time
+                        parts.append(text)
+                        yield {'event': 'token', 'text': text}
+                        for fragment in formatter.feed(text):
+                            yield {'event': 'html', 'html': fragment}
+                        if request.deadline.bounded and request.deadline.execution_budget() <= 0:
+                            partial = True
+                            break
+                    for fragment in formatter.flush():
+                        yield {'event': 'html', 'html': fragment}
+            except Exception as e:
+                timings['kickoff'] = time.perf_counter() - stage_start
+                result = self._failure_result(request.session_id, query, request.agent, request.confidence,
+                                              request.rag_context, request.start_time, timings, str(e),
+                                              request_deadline=request.deadline,
+                                              context_packing=request.context_packing,
+                                              execution_tier=request.profile.name)
+                yield self._final_event(request_trace, result)
+                return
+            finally:
+                # Stop pulling from the LLM when the client disconnects or the deadline cut it short
+                chunks.close()
+                if release is not None:
+                    release()
+            timings['kickoff'] = time.perf_counter() - stage_start
+            with request_trace.span('format'):
+                result = self._finish_execution(request, "".join(parts), partial, False)
+            self._remember(conversation_id, query, result)
+            yield self._final_event(request_trace, result)
+        except GeneratorExit:
+            error = "stream closed by the client"
+            raise
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            # A client leaving after the last event does not turn a finished request into an error
+            if result is not None and 'event' in result:
+                request_trace.end(result)
+            else:
+                request_trace.end(error=error or "stream ended without a result")
+
+    def _stream_result(self, request: _PreparedRequest, result: Dict) -> Iterator[Dict]:
+        """stream_query() events for an answer produced without streaming (cache hit, deadline fallback, fan-out)"""
+        if result['success']:
+            request.timings['time_to_first_token'] = time.time() - request.start_time
+            yield {'event': 'token', 'text': result['result']}
+            formatter = FCCSStreamingFormatter()
+            for fragment in formatter.feed(result['result']) + formatter.flush():
+                yield {'event': 'html', 'html': fragment}
+
+    @staticmethod
+    def _final_event(request_trace: RequestTrace, result: Dict) -> Dict:
+        """A stream's last event, 'done' or 'error'; sampled streams carry their trace_id"""
+        result['event'] = 'done' if result['success'] else 'error'
+        if request_trace.sampled:
+            result['trace_id'] = request_trace.trace_id
+        return result
+
+    def _execute_within(self, agent_name: str, crew: 'Crew', profile: Optional[ExecutionProfile],
+                        budget: float, timings: Optional[Dict] = None) -> Tuple[str, bool]:
+        """Run a single-task crew for at most `budget` seconds; returns (answer, partial)
+
+        The answer is produced on a worker thread through _stream_task(). With a
+        streaming LLM, whatever arrived before the budget ran out is returned as
+        a partial answer; DeadlineExceeded is raised if nothing arrived. A
+        running LLM call cannot be interrupted, so the worker just stops
+        consuming it. Time spent waiting for the agent's bulkhead slot counts
+        against the budget; the slot is held until the worker stops.
+        """
+        ends_at = time.monotonic() + budget
+        release = self._acquire_slot(agent_name, timings, budget)
+        chunks: 'queue.Queue' = queue.Queue()
+        stop = threading.Event()
+        finished = object()
+
+        def produce() -> None:
+            stream = self._stream_task(agent_name, crew.tasks[0], profile, getattr(crew, 'verbose', False))
+            try:
+                for text in stream:
+                    if stop.is_set():
+                        break
+                    chunks.put(text)
+            except Exception as e:
+                chunks.put(e)
+                return
+            finally:
+                stream.close()
+                if release is not None:
+                    release()
+            chunks.put(finished)
+
+        threading.Thread(target=produce, name='agent-router-deadline', daemon=True).start()
+        parts = []
+        while True:
+            try:
+                item = chunks.get(timeout=max(0.0, ends_at - time.monotonic()))
+            except queue.Empty:
+                stop.set()
+                if parts:
+                    return "".join(parts), True
+                raise DeadlineExceeded(f"{agent_name} produced no answer within {budget:.2f}s")
+            if item is finished:
+                return "".join(parts), False
+            if isinstance(item, Exception):
+                raise item
+            parts.append(item)
+
+    def _deadline_error(self, request_deadline: RequestDeadline, agent_name: str) -> str:
+        return f"Deadline of {request_deadline.seconds:g}s left no time for {agent_name} to answer"
+
+    def _deadline_fallback(self, session_id: str, query: str, selected_agent: str, confidence: float,
+                           rag_context: List[str], start_time: float, timings: Dict, language: str,
+                           request_deadline: RequestDeadline, **extra) -> Dict:
+        """Serve the latest cached answer to the same question when the deadline leaves no time to run the agent"""
+        answer = None
+        if self.answer_cache is not None:
+            answer = self.answer_cache.get_fallback(self.answer_cache.make_query_key(selected_agent, query, language))
+        if answer is not None:
+            request_deadline.degrade(CACHED_ANSWER)
+            return self._success_result(session_id, query, selected_agent, confidence, rag_context, start_time,
+                                        timings, answer, cached=True, request_deadline=request_deadline, **extra)
+        return self._failure_result(session_id, query, selected_agent, confidence, rag_context, start_time, timings,
+                                    self._deadline_error(request_deadline, selected_agent),
+                                    request_deadline=request_deadline, **extra)
+
+    def _stream_task(self, agent_name: str, task: 'Task', profile: Optional[ExecutionProfile] = None,
+                     verbose: bool = False) -> Iterator[str]:
+        """Stream the task's answer straight from the agent's LLM
+
+        A single-agent, tool-less crew is one LLM call, so the same prompt CrewAI
+        would build is sent directly. Without a streaming-capable LLM the crew
+        runs as usual (verbose prints CrewAI's steps) and its result is emitted
+        as one chunk.
+        """
+        agent = self._agent_for(agent_name, profile)
+        llm = getattr(agent, 'llm', None)
+        if llm is None or not hasattr(llm, 'stream'):
+            _, Crew, _ = get_crewai()
+            crew = Crew(agents=[task.agent], tasks=[task], verbose=VERBOSE or verbose, memory=False,
+                        process="sequential")
+            yield str(crew.kickoff())
+            return
+
+        messages = [
+            ("system", self._system_prompt(agent)),
+            ("human", f"{task.description}\n\nThis is the expected criteria for your final answer: {task.expected_output}")
+        ]
+        for chunk in llm.stream(messages):
+            content = getattr(chunk, 'content', chunk)
+            if isinstance(content, list):
+                content = "".join(block.get('text', '') for block in content if isinstance(block, dict))
+            if content:
+                yield content
+
+    @staticmethod
+    def _system_prompt(agent: 'Agent') -> str:
+        """The system prompt CrewAI builds for an agent; identical for every request to it"""
+        return f"You are {agent.role}. {agent.backstory}\nYour personal goal is: {agent.goal}"
+
+    def cancel_request(self, request_id: str) -> bool:
+        """Cancel an in-flight aroute_query() call; safe to call from any thread"""
+        inflight = self._inflight_requests.get(request_id)
+        if inflight is None:
+            return False
+        loop, task = inflight
+        loop.call_soon_threadsafe(task.cancel)
+        return True
+
+    def _select_agent(self, query: str, timings: Dict, session_id: Optional[str] = None,
+                      request_deadline: Optional[RequestDeadline] = None) -> Tuple[str, float, str]:
+        """Score all agents, pick one and detect the query language
+
+        RL scoring is skipped in favour of rule-based routing when the
+        request deadline is too short for it.
+        """
+        # Score every rule once against one matcher, even if a reload swaps it mid-request
+        stage_start = time.perf_counter()
+        matcher = self._matcher
+        rule_scores = matcher.weighted_scores(query.lower())
+        traditional_scores = self._traditional_scores(matcher, rule_scores)
+        timings['rule_scoring'] = time.perf_counter() - stage_start
 
         # Use RL optimizer if available
-        if self.rl_optimizer:
+        stage_start = time.perf_counter()
+        use_rl = self.rl_optimizer is not None and (request_deadline is None or request_deadline.allows_rl())
+        if self.rl_optimizer and not use_rl:
+            request_deadline.degrade(SKIPPED_RL)
+        if use_rl and self.rl_policy is not None:
+            # The snapshot policy departs from the rule decision only where it has learned to
+            selected_agent, confidence = self.rl_policy.get_optimized_agent_recommendation(
+                query, traditional_scores
+            )
+            timings['rl_recommendation'] = time.perf_counter() - stage_start
+        elif use_rl:
             selected_agent, confidence = self.rl_optimizer.get_optimized_agent_recommendation(
                 query, traditional_scores
             )
+            timings['rl_recommendation'] = time.perf_counter() - stage_start
         else:
             # Fallback to traditional routing
-            selected_agent, confidence = self.analyze_intent(query)
+            selected_agent, confidence = self.analyze_intent(query, matcher, rule_scores)
+            timings['intent_analysis'] = time.perf_counter() - stage_start
 
         # Detect language
+        stage_start = time.perf_counter()
         language = self.detect_language(query)
+        timings['language_detection'] = time.perf_counter() - stage_start
 
-        # Get relevant context from RAG system
-        prioritize_uploads = selected_agent == 'document_intelligence'
-        rag_context = self.rag_system.retrieve_relevant_context(query, prioritize_uploads=prioritize_uploads)
+        if self.metrics.should_trace():
+            self.metrics.record_trace(self._routing_trace(query, session_id, traditional_scores,
+                                                          selected_agent, confidence, language))
+        return selected_agent, confidence, language
 
-        # Create task for selected agent
-        task = self._create_task_for_agent(selected_agent, query, context, rag_context, language)
+    def _traditional_scores(self, matcher: RoutingMatcher, rule_scores: Dict[str, float]) -> Dict[str, float]:
+        """Rule-based confidence for every agent, the input to RL recommendation"""
+        traditional_scores = {}
+        for agent_name in self.agents.keys():
+            if agent_name == 'orchestrator':
+                traditional_scores[agent_name] = 0.95  # Default orchestrator confidence
+            else:
+                traditional_scores[agent_name] = matcher.confidence(rule_scores, agent_name)
+        return traditional_scores
+
+    def _routing_trace(self, query: str, session_id: Optional[str], traditional_scores: Dict[str, float],
+                       selected_agent: str, confidence: float, language: str) -> Dict:
+        """Build a routing decision record: every agent's score and why the winner was chosen"""
+        ranked = sorted(traditional_scores.items(), key=lambda item: item[1], reverse=True)
+        if self.rl_policy:
+            reason = f'rl policy snapshot v{self.rl_policy.snapshot.version} over rule scores'
+        elif self.rl_optimizer:
+            reason = 'rl_optimizer recommendation over rule scores'
+        elif selected_agent == 'orchestrator':
+            reason = 'orchestrator-first: no bypass pattern matched'
+        else:
+            reason = 'bypass pattern matched: highest direct rule score'
+        rule_winner = ranked[0][0] if ranked else None
+        return {
+            'session_id': session_id,
+            'query': query,
+            'language': language,
+            'scores': dict(ranked),
+            'selected_agent': selected_agent,
+            'confidence': confidence,
+            'reason': reason,
+            'rule_winner': rule_winner,
+            'margin': ranked[0][1] - ranked[1][1] if len(ranked) > 1 else None,
+            'overrode_rules': selected_agent != rule_winner
+        }
 
-        # Create crew with only the selected agent
+    def get_metrics(self) -> Dict:
+        """Per-stage latency histograms by selected agent, for a metrics endpoint"""
+        return self.metrics.snapshot()
+
+    def render_metrics(self) -> str:
+        """Stage latency histograms and bulkhead queues in Prometheus text format"""
+        text = self.metrics.render_prometheus()
+        if self.bulkheads is not None:
+            text += self.bulkheads.render_prometheus()
+        return text
+
+    def get_routing_traces(self, limit: Optional[int] = None) -> List[Dict]:
+        """Recent sampled routing decision traces (AGENT_ROUTER_TRACE_SAMPLE_RATE)"""
+        return self.metrics.get_traces(limit)
+
+    def _select_profile(self, query: str) -> ExecutionProfile:
+        """Execution profile for the query's assessed complexity"""
+        return self.execution_tiers.select(self._assess_query_complexity(query))
+
+    def _agent_for(self, agent_name: str, profile: Optional[ExecutionProfile] = None) -> 'Agent':
+        """The agent to run under a profile; tiers that override LLM settings get their own agent set"""
+        overrides = profile.llm_settings if profile is not None else {}
+        if not overrides:
+            return self.agents[agent_name]
+        agents = self._tier_agents.get(profile.name)
+        if agents is None:
+            with self._tier_agents_lock:
+                agents = self._tier_agents.get(profile.name)
+                if agents is None:
+                    agents = self._tier_agents[profile.name] = self._initialize_agents(get_tier_llm(overrides))
+        return agents[agent_name]
+
+    def _crew_agent(self, agent_name: str, profile: Optional[ExecutionProfile] = None) -> 'Agent':
+        """A new agent for one crew, with the definition and LLM client of the profile's cached agent
+
+        CrewAI refuses to run the same agent's executor concurrently, so
+        concurrent requests (async, fan-out, pool threads) must not share
+        agent instances; the LLM client itself is safe to share.
+        """
+        template = self._agent_for(agent_name, profile)
+        Agent, _, _ = get_crewai()
+        return Agent(
+            role=template.role,
+            goal=template.goal,
+            backstory=template.backstory,
+            verbose=template.verbose,
+            allow_delegation=template.allow_delegation,
+            tools=[],
+            llm=template.llm
+        )
+
+    def get_execution_tiers(self) -> Dict:
+        """Get the configured execution tiers and how complexity levels map to them"""
+        return self.execution_tiers.get_info()
+
+    def _kickoff(self, key: Tuple, crew: 'Crew', timings: Optional[Dict] = None) -> Tuple[object, bool]:
+        """Run the crew, or join an identical in-flight run; returns (result, coalesced)
+
+        Only the run itself takes a slot in the agent's bulkhead; callers joining it do not.
+        """
+        def kickoff():
+            if self.bulkheads is None:
+                return crew.kickoff()
+            with self.bulkheads.get(key[0]).slot() as waited:
+                if timings is not None:
+                    timings['bulkhead_wait'] = waited
+                return crew.kickoff()
+
+        if self.singleflight is None:
+            return kickoff(), False
+        return self.singleflight.do(key, kickoff)
+
+    async def _akickoff(self, key: Tuple, crew: 'Crew', timings: Optional[Dict] = None) -> Tuple[object, bool]:
+        async def kickoff():
+            if self.bulkheads is None:
+                return await crew.kickoff_async()
+            async with self.bulkheads.get(key[0]).aslot() as waited:
+                if timings is not None:
+                    timings['bulkhead_wait'] = waited
+                return await crew.kickoff_async()
+
+        if self.singleflight is None:
+            return await kickoff(), False
+        return await self.singleflight.ado(key, kickoff)
+
+    def _acquire_slot(self, agent_name: str, timings: Optional[Dict] = None,
+                      timeout: Optional[float] = None) -> Optional[Callable[[], None]]:
+        """Take a slot in the agent's bulkhead for work that outlives this call; returns its release
+        function (None without bulkheads). Raises BulkheadFull when the request is shed."""
+        if self.bulkheads is None:
+            return None
+        bulkhead = self.bulkheads.get(agent_name)
+        waited = bulkhead.acquire(timeout)
+        if timings is not None:
+            timings['bulkhead_wait'] = waited
+        started = time.monotonic()
+        released = threading.Event()
+
+        def release() -> None:
+            if not released.is_set():
+                released.set()
+                bulkhead.release(time.monotonic() - started)
+        return release
+
+    def get_bulkhead_stats(self) -> Dict:
+        """Get per-agent concurrency limits, occupancy, queue waits and shed counts"""
+        if self.bulkheads is None:
+            return {'enabled': False}
+        return dict(self.bulkheads.get_stats(), enabled=True)
+
+    def get_coalescing_stats(self) -> Dict:
+        """Get how many crew executions were shared by concurrent identical queries"""
+        if self.singleflight is None:
+            return {'enabled': False}
+        return dict(self.singleflight.get_stats(), enabled=True)
+
+    def _fanout_candidates(self, query: str, fan_out: Optional[bool] = None) -> List[Tuple[str, float]]:
+        """Agents to run concurrently for this query, or [] for single-agent routing"""
+        if not (self.fanout.enabled if fan_out is None else fan_out):
+            return []
+        matcher = self._matcher
+        rule_scores = matcher.weighted_scores(query.lower())
+        return self.fanout.candidates({
+            name: matcher.confidence(rule_scores, name) for name in self.agents if name in rule_scores
+        })
+
+    def _get_fanout_executor(self) -> ThreadPoolExecutor:
+        if self._fanout_executor is None:
+            with self._fanout_executor_lock:
+                if self._fanout_executor is None:
+                    self._fanout_executor = ThreadPoolExecutor(
+                        max_workers=int(os.getenv('AGENT_ROUTER_FANOUT_WORKERS', '8')),
+                        thread_name_prefix='agent-router-fanout'
+                    )
+        return self._fanout_executor
+
+    def _prepare_fanout(self, request: _PreparedRequest, context: str, bypass_cache: bool,
+                        memory: str = "") -> List[Dict]:
+        """Cache lookup, context packing and crew construction for each fan-out agent"""
+        query, language, rag_context, profile = request.query, request.language, request.rag_context, request.profile
+        branches = []
+        for agent_name, confidence in request.candidates:
+            cache_key, cached_answer = self._lookup_answer(agent_name, query, context + memory, rag_context, language,
+                                                           bypass_cache, profile)
+            deadline = self.fanout.deadline_for(agent_name)
+            if request.deadline.bounded:
+                deadline = min(deadline, request.deadline.execution_budget())
+            branch = {
+                'agent': agent_name,
+                'confidence': confidence,
+                'deadline': deadline,
+                'cache_key': cache_key,
+                'coalescing_key': coalescing_key(agent_name, query, language, context + memory),
+                'coalesced': False,
+                'answer': cached_answer,
+                'status': 'cached' if cached_answer is not None else 'pending',
+                'timings': {},
+                'crew': None
+            }
+            if cached_answer is None:
+                packed_context, branch['context_packing'] = self._pack_context(agent_name, query, rag_context,
+                                                                               branch['timings'], profile)
+                branch['crew'] = self._build_crew(agent_name, query, context, packed_context, language,
+                                                  branch['timings'], profile, memory)
+            branches.append(branch)
+        for stage in ('context_packing', 'task_build'):
+            total = sum(branch['timings'].get(stage, 0.0) for branch in branches)
+            if total:
+                request.timings[stage] = total
+        return branches
+
+    def _route_fanout(self, request: _PreparedRequest, context: str, bypass_cache: bool, memory: str = "") -> Dict:
+        """Run the candidates' crews concurrently, each bounded by its own deadline, and merge the answers"""
+        branches = self._prepare_fanout(request, context, bypass_cache, memory)
+
+        stage_start = time.perf_counter()
+        executor = self._get_fanout_executor()
+        running = {branch['agent']: executor.submit(self._kickoff, branch['coalescing_key'], branch['crew'])
+                   for branch in branches if branch['crew'] is not None}
+        for branch in sorted(branches, key=lambda item: item['deadline']):
+            future = running.get(branch['agent'])
+            if future is None:
+                continue
+            remaining = branch['deadline'] - (time.perf_counter() - stage_start)
+            try:
+                branch['answer'], branch['coalesced'] = future.result(timeout=max(0.0, remaining))
+                branch['status'] = 'success'
+            except FutureTimeoutError:
+                # A running kickoff cannot be interrupted; its late answer is discarded
+                future.cancel()
+                branch['status'] = 'timeout'
+                branch['error'] = f"no answer within {branch['deadline']:g}s"
+            except BulkheadFull as e:
+                branch['status'] = 'shed'
+                branch['error'] = str(e)
+            except Exception as e:
+                branch['status'] = 'error'
+                branch['error'] = str(e)
+            branch['timings']['kickoff'] = time.perf_counter() - stage_start
+        request.timings['kickoff'] = time.perf_counter() - stage_start
+        return self._fanout_result(request.session_id, request.query, branches, request.language,
+                                   request.rag_context, request.start_time, request.timings,
+                                   request_deadline=request.deadline, execution_tier=request.profile.name)
+
+    async def _aroute_fanout(self, request: _PreparedRequest, context: str, bypass_cache: bool,
+                             memory: str = "") -> Dict:
+        """Async variant of _route_fanout() using each crew's async kickoff"""
+        branches = self._prepare_fanout(request, context, bypass_cache, memory)
+        stage_start = time.perf_counter()
+
+        async def run(branch: Dict) -> None:
+            try:
+                branch['answer'], branch['coalesced'] = await asyncio.wait_for(
+                    self._akickoff(branch['coalescing_key'], branch['crew']), branch['deadline']
+                )
+                branch['status'] = 'success'
+            except asyncio.TimeoutError:
+                branch['status'] = 'timeout'
+                branch['error'] = f"no answer within {branch['deadline']:g}s"
+            except asyncio.CancelledError:
+                raise
+            except BulkheadFull as e:
+                branch['status'] = 'shed'
+                branch['error'] = str(e)
+            except Exception as e:
+                branch['status'] = 'error'
+                branch['error'] = str(e)
+            branch['timings']['kickoff'] = time.perf_counter() - stage_start
+
+        await asyncio.gather(*(run(branch) for branch in branches if branch['crew'] is not None))
+        request.timings['kickoff'] = time.perf_counter() - stage_start
+        return self._fanout_result(request.session_id, request.query, branches, request.language,
+                                   request.rag_context, request.start_time, request.timings,
+                                   request_deadline=request.deadline, execution_tier=request.profile.name)
+
+    def _fanout_result(self, session_id: str, query: str, branches: List[Dict], language: str,
+                       rag_context: List[str], start_time: float, timings: Dict, **extra) -> Dict:
+        """Store and merge the answered branches; the best answered agent is reported as selected"""
+        answered = [branch for branch in branches if branch['answer'] is not None]
+        report = {
+            'agents': [
+                {
+                    'agent': branch['agent'],
+                    'confidence': branch['confidence'],
+                    'status': branch['status'],
+                    'coalesced': branch['coalesced'],
+                    'deadline': branch['deadline'],
+                    'kickoff': branch['timings'].get('kickoff'),
+                    'error': branch.get('error'),
+                    'context_packing': branch.get('context_packing')
+                }
+                for branch in branches
+            ]
+        }
+        lead = answered[0] if answered else branches[0]
+
+        # The other agents' outcomes feed RL training alongside the lead's
+        response_time = time.time() - start_time
+        for branch in branches:
+            if branch is not lead:
+                self._record_interaction(session_id, query, branch['agent'], branch['confidence'], response_time,
+                                         rag_context, success=branch['answer'] is not None,
+                                         cached=branch['status'] == 'cached')
+
+        if not answered:
+            error = '; '.join(f"{branch['agent']}: {branch.get('error')}" for branch in branches)
+            return self._failure_result(session_id, query, lead['agent'], lead['confidence'], rag_context, start_time,
+                                        timings, error, fanout=report, **extra)
+
+        for branch in answered:
+            if branch['status'] == 'success' and not branch['coalesced']:
+                self._store_answer(branch['cache_key'], branch['agent'], branch['answer'], query, language)
+        merged = merge_answers([(branch['agent'], branch['confidence'], str(branch['answer'])) for branch in answered],
+                               language)
+        return self._success_result(session_id, query, lead['agent'], lead['confidence'], rag_context, start_time,
+                                    timings, merged, cached=all(branch['status'] == 'cached' for branch in answered),
+                                    fanout=report, **extra)
+
+    def _build_crew(self, selected_agent: str, query: str, context: str, rag_context: List[str],
+                    language: str, timings: Dict, profile: Optional[ExecutionProfile] = None,
+                    memory: str = "", verbose: bool = False) -> 'Crew':
+        """Create the task and a single-agent crew for the selected agent; verbose prints CrewAI's steps"""
+        stage_start = time.perf_counter()
+        task = self._create_task_for_agent(selected_agent, query, context, rag_context, language, memory, profile)
+
+        # Create crew with only the selected agent, the one its task runs on
+        _, Crew, _ = get_crewai()
         crew = Crew(
-            agents=[self.agents[selected_agent]],
+            agents=[task.agent],
             tasks=[task],
-            verbose=True,
+            verbose=VERBOSE or verbose,
             memory=False,
             process="sequential"
         )
+        timings['task_build'] = time.perf_counter() - stage_start
+        return crew
 
-        # Execute and return result
+    def _success_result(self, session_id: str, query: str, selected_agent: str, confidence: float,
+                        rag_context: List[str], start_time: float, timings: Dict, result, cached: bool = False,
+                        coalesced: bool = False, request_deadline: Optional[RequestDeadline] = None,
+                        **extra) -> Dict:
+        response_time = time.time() - start_time
+
+        # Record interaction for RL training
+        self._record_interaction(session_id, query, selected_agent, confidence, response_time, rag_context,
+                                 success=True, cached=cached)
+        outcome = 'cached' if cached else 'coalesced' if coalesced else 'success'
+        self.metrics.observe_request(selected_agent, timings, response_time, outcome)
+
+        return {
+            'success': True,
+            'result': str(result),
+            'selected_agent': selected_agent,
+            'confidence': confidence,
+            'rag_context_used': len(rag_context) > 0,
+            'session_id': session_id,
+            'response_time': response_time,
+            'latency_breakdown': timings,
+            'cached': cached,
+            'coalesced': coalesced,
+            **self._deadline_report(request_deadline),
+            **extra
+        }
+
+    def _failure_result(self, session_id: str, query: str, selected_agent: str, confidence: float,
+                        rag_context: List[str], start_time: float, timings: Dict, error: str,
+                        request_deadline: Optional[RequestDeadline] = None, **extra) -> Dict:
+        response_time = time.time() - start_time
+
+        # Record failed interaction
+        self._record_interaction(session_id, query, selected_agent, confidence, response_time, rag_context, success=False)
+        self.metrics.observe_request(selected_agent, timings, response_time, 'error')
+
+        return {
+            'success': False,
+            'error': error,
+            'selected_agent': selected_agent,
+            'confidence': confidence,
+            'session_id': session_id,
+            'response_time': response_time,
+            'latency_breakdown': timings,
+            **self._deadline_report(request_deadline),
+            **extra
+        }
+
+    def _shed_result(self, session_id: str, query: str, selected_agent: str, confidence: float, start_time: float,
+                     timings: Dict, error: BulkheadFull, request_deadline: Optional[RequestDeadline] = None,
+                     **extra) -> Dict:
+        """Result for a request its agent's bulkhead turned away; overload says nothing about the
+        routing decision, so no RL interaction is recorded"""
+        response_time = time.time() - start_time
+        self.metrics.observe_request(selected_agent, timings, response_time, 'shed')
+        return {
+            'success': False,
+            'error': str(error),
+            'overloaded': True,
+            'retry_after': error.retry_after,
+            'selected_agent': selected_agent,
+            'confidence': confidence,
+            'session_id': session_id,
+            'response_time': response_time,
+            'latency_breakdown': timings,
+            **self._deadline_report(request_deadline),
+            **extra
+        }
+
+    @staticmethod
+    def _deadline_report(request_deadline: Optional[RequestDeadline]) -> Dict:
+        """{'deadline': {...}} for results of requests that had a deadline or were degraded"""
+        report = request_deadline.report() if request_deadline is not None else None
+        return {'deadline': report} if report is not None else {}
+
+    def _record_interaction(self, session_id: str, query: str, selected_agent: str, confidence: float,
+                            response_time: float, rag_context: List[str], success: bool, cached: bool = False) -> None:
+        """Record an interaction for RL training; failures get a low rating"""
+        if not self.rl_optimizer:
+            return
+        AgentInteraction = get_rl_components()[1]
+        complexity = self._assess_query_complexity(query)
+        interaction = AgentInteraction(
+            session_id=session_id,
+            query=query,
+            selected_agent=selected_agent,
+            confidence=confidence,
+            user_rating=None if success else 1.0,  # Success ratings arrive via feedback
+            response_time=response_time,
+            rag_context_used=len(rag_context) > 0,
+            timestamp=datetime.now(),
+            query_complexity=complexity,
+            user_satisfaction=None if success else 1.0,
+            task_completion=None if success else False
+        )
+        # Optimizers predate the cache, so the flag is attached rather than passed
         try:
-            result = crew.kickoff()
-            response_time = time.time() - start_time
-
-            # Record interaction for RL training
-            if self.rl_optimizer:
-                complexity = self._assess_query_complexity(query)
-                interaction = AgentInteraction(
-                    session_id=session_id,
-                    query=query,
-                    selected_agent=selected_agent,
-                    confidence=confidence,
-                    user_rating=None,  # Will be updated via feedback
-                    response_time=response_time,
-                    rag_context_used=len(rag_context) > 0,
-                    timestamp=datetime.now(),
-                    query_complexity=complexity,
-                    user_satisfaction=None,
-                    task_completion=None
-                )
-                self.rl_optimizer.record_interaction(interaction)
+            interaction.cached = cached
+        except AttributeError:
+            pass
+        if self.rl_writer is not None:
+            self.rl_writer.submit(interaction)
+        else:
+            (self.rl_policy or self.rl_optimizer).record_interaction(interaction)
+
+    def _recall(self, conversation_id: Optional[str]) -> str:
+        """The conversation's bounded memory section, or "" without a conversation"""
+        if conversation_id is None or self.session_memory is None:
+            return ""
+        return self.session_memory.render(conversation_id)
+
+    def _remember(self, conversation_id: Optional[str], query: str, result: Dict) -> None:
+        if conversation_id is not None and self.session_memory is not None and result.get('success'):
+            self.session_memory.append(conversation_id, query, result['result'])
+
+    def get_tracing_stats(self) -> Dict:
+        """Get traced/sampled request counts and exporter totals"""
+        return self.tracer.get_stats()
+
+    def get_session_memory_stats(self) -> Dict:
+        """Get conversation memory session counts and compaction totals"""
+        if self.session_memory is None:
+            return {'enabled': False}
+        return dict(self.session_memory.get_stats(), enabled=True)
+
+    def get_rl_writer_stats(self) -> Dict:
+        """Get queued/written/dropped counts for background RL recording"""
+        if self.rl_writer is None:
+            return {'enabled': False}
+        return dict(self.rl_writer.get_stats(), enabled=True)
+
+    def get_rl_policy_stats(self) -> Dict:
+        """Get the serving RL snapshot version, recommendation cache hits and trainer traffic"""
+        if self.rl_policy is None:
+            return {'enabled': False}
+        return dict(self.rl_policy.get_stats(), enabled=True)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Drain background RL writes and stop worker threads"""
+        if self.routing_watcher is not None:
+            self.routing_watcher.stop()
+        if self.rl_writer is not None:
+            self.rl_writer.close(timeout)
+        if self.rl_policy is not None:
+            self.rl_policy.close(timeout)
+        if self.session_memory is not None:
+            self.session_memory.close(timeout)
+        self.tracer.close(timeout)
+        self._io_executor.shutdown(wait=False)
+        if self._fanout_executor is not None:
+            self._fanout_executor.shutdown(wait=False)
+
+    def _lookup_answer(self, selected_agent: str, query: str, context: str, rag_context: List[str],
+                       language: str, bypass_cache: bool = False,
+                       profile: Optional[ExecutionProfile] = None) -> Tuple[Optional[str], Optional[str]]:
+        """Return (cache key, cached answer or None) from the persistent answer cache"""
+        if self.answer_cache is None or (profile is not None and not profile.use_answer_cache):
+            return None, None
+        llm = getattr(self._agent_for(selected_agent, profile), 'llm', None)
+        cache_key = self.answer_cache.make_key(
+            selected_agent, query, rag_context, language,
+            model=str(getattr(llm, 'model', '') or getattr(llm, 'model_name', '') or ''),
+            temperature=getattr(llm, 'temperature', None),
+            context=context,
+            max_tokens=getattr(llm, 'max_tokens', None)
+        )
+        if bypass_cache:
+            self.answer_cache.record_bypass()
+            return cache_key, None
+        max_age = profile.cache_max_age_seconds if profile is not None else None
+        return cache_key, self.answer_cache.get(cache_key, max_age=max_age)
+
+    def _store_answer(self, cache_key: Optional[str], selected_agent: str, result, query: str = "",
+                      language: str = 'en') -> None:
+        if self.answer_cache is not None and cache_key is not None:
+            # The query key lets a deadline-bound request fall back to this answer later
+            query_key = self.answer_cache.make_query_key(selected_agent, query, language) if query else None
+            self.answer_cache.put(cache_key, str(result), selected_agent, query_key=query_key)
+
+    def _retrieve_context(self, query: str, prioritize_uploads: bool = False) -> List[str]:
+        """Retrieve RAG context through the query-level cache"""
+        return self.rag_cache.get_or_retrieve(self.rag_system, query, prioritize_uploads)
+
+    def _timed_retrieval(self, query: str, prioritize_uploads: bool) -> Tuple[List[str], float]:
+        """Retrieve context and report how long the retrieval itself took"""
+        started = time.perf_counter()
+        rag_context = self._retrieve_context(query, prioritize_uploads)
+        return rag_context, time.perf_counter() - started
+
+    def _start_speculative_retrieval(self, query: str) -> Dict[bool, Future]:
+        """Submit retrieval for the upload-priority variants routing could still need
+
+        Only document_intelligence retrieves with prioritize_uploads=True, and
+        it can only win when its routing rules match. When they do, routing is
+        ambiguous and both variants are fetched; otherwise only the default one.
+        """
+        variants = [False]
+        if self._calculate_agent_confidence(query, 'document_intelligence') > 0:
+            variants.append(True)
+        return {
+            variant: self._io_executor.submit(self._timed_retrieval, query, variant)
+            for variant in variants
+        }
 
-            return {
-                'success': True,
-                'result': str(result),
-                'selected_agent': selected_agent,
-                'confidence': confidence,
-                'rag_context_used': len(rag_context) > 0,
-                'session_id': session_id,
-                'response_time': response_time
-            }
-        except Exception as e:
-            response_time = time.time() - start_time
-
-            # Record failed interaction
-            if self.rl_optimizer:
-                complexity = self._assess_query_complexity(query)
-                interaction = AgentInteraction(
-                    session_id=session_id,
-                    query=query,
-                    selected_agent=selected_agent,
-                    confidence=confidence,
-                    user_rating=1.0,  # Low rating for failures
-                    response_time=response_time,
-                    rag_context_used=len(rag_context) > 0,
-                    timestamp=datetime.now(),
-                    query_complexity=complexity,
-                    user_satisfaction=1.0,
-                    task_completion=False
+    def _await_retrieval(self, retrievals: Dict[bool, Future], query: str, prioritize_uploads: bool, timings: Dict,
+                         profile: Optional[ExecutionProfile] = None,
+                         request_deadline: Optional[RequestDeadline] = None) -> List[str]:
+        """Collect the retrieval matching the routed agent, recording time spent blocked on it
+
+        Under a request deadline the wait is bounded by its retrieval share;
+        when that runs out the query proceeds without RAG context.
+        """
+        if profile is not None and not profile.retrieves:
+            return []
+        timeout = request_deadline.retrieval_timeout() if request_deadline is not None else None
+        wait_start = time.perf_counter()
+        future = retrievals.get(prioritize_uploads)
+        if future is None and timeout is not None:
+            future = self._io_executor.submit(self._timed_retrieval, query, prioritize_uploads)
+        if future is not None:
+            try:
+                rag_context, retrieval_time = future.result(timeout=timeout)
+            except FutureTimeoutError:
+                # The retrieval keeps running and still warms the RAG cache
+                timings['rag_wait'] = time.perf_counter() - wait_start
+                request_deadline.degrade(SKIPPED_RAG)
+                return []
+        else:
+            # Routing picked a variant that was not speculated; fetch it inline
+            rag_context, retrieval_time = self._timed_retrieval(query, prioritize_uploads)
+        timings['rag_wait'] = time.perf_counter() - wait_start
+        timings['rag_retrieval'] = retrieval_time
+        timings['retrieval_overlap_saved'] = max(0.0, retrieval_time - timings['rag_wait'])
+
+        # The unused variant still warms the cache if it is already running
+        for variant, other in retrievals.items():
+            if variant != prioritize_uploads:
+                other.cancel()
+        return profile.limit_context(rag_context) if profile is not None else rag_context
+
+    async def _aretrieve_context(self, query: str, prioritize_uploads: bool = False) -> Tuple[List[str], float]:
+        """Async, cached retrieval; uses the backend's async API when it has one"""
+        started = time.perf_counter()
+        rag_context = self.rag_cache.get(query, prioritize_uploads)
+        if rag_context is None:
+            generation = self.rag_cache.generation
+            aretrieve = getattr(self.rag_system, 'aretrieve_relevant_context', None)
+            if aretrieve is not None:
+                rag_context = await aretrieve(query, prioritize_uploads=prioritize_uploads)
+            else:
+                rag_context = await asyncio.to_thread(
+                    self.rag_system.retrieve_relevant_context, query, prioritize_uploads=prioritize_uploads
                 )
-                self.rl_optimizer.record_interaction(interaction)
+            self.rag_cache.put(query, prioritize_uploads, rag_context, generation=generation)
+        return rag_context, time.perf_counter() - started
+
+    def _astart_speculative_retrieval(self, query: str) -> Dict[bool, 'asyncio.Task']:
+        """Async counterpart of _start_speculative_retrieval()"""
+        variants = [False]
+        if self._calculate_agent_confidence(query, 'document_intelligence') > 0:
+            variants.append(True)
+        return {
+            variant: asyncio.ensure_future(self._aretrieve_context(query, variant))
+            for variant in variants
+        }
 
-            return {
-                'success': False,
-                'error': str(e),
-                'selected_agent': selected_agent,
-                'confidence': confidence,
-                'session_id': session_id,
-                'response_time': response_time
-            }
+    async def _aawait_retrieval(self, retrievals: Dict[bool, 'asyncio.Task'], query: str, prioritize_uploads: bool,
+                                timings: Dict, profile: Optional[ExecutionProfile] = None,
+                                request_deadline: Optional[RequestDeadline] = None) -> List[str]:
+        """Async counterpart of _await_retrieval()"""
+        if profile is not None and not profile.retrieves:
+            return []
+        timeout = request_deadline.retrieval_timeout() if request_deadline is not None else None
+        wait_start = time.perf_counter()
+        task = retrievals.get(prioritize_uploads)
+        if task is None:
+            task = asyncio.ensure_future(self._aretrieve_context(query, prioritize_uploads))
+        try:
+            rag_context, retrieval_time = await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            timings['rag_wait'] = time.perf_counter() - wait_start
+            request_deadline.degrade(SKIPPED_RAG)
+            return []
+        timings['rag_wait'] = time.perf_counter() - wait_start
+        timings['rag_retrieval'] = retrieval_time
+        timings['retrieval_overlap_saved'] = max(0.0, retrieval_time - timings['rag_wait'])
+        return profile.limit_context(rag_context) if profile is not None else rag_context
+
+    def notify_documents_uploaded(self) -> None:
+        """Invalidate cached retrieval results and answers after the knowledge base changes"""
+        self.rag_cache.invalidate()
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate()
+
+    def get_answer_cache_stats(self) -> Dict:
+        """Get persistent answer cache metrics"""
+        if self.answer_cache is None:
+            return {'enabled': False}
+        return dict(self.answer_cache.get_stats(), enabled=True)
+
+    def get_rag_cache_stats(self) -> Dict:
+        """Get RAG context cache hit-rate metrics"""
+        return self.rag_cache.get_stats()
 
     def _calculate_agent_confidence(self, query: str, agent_name: str) -> float:
         """Calculate confidence score for specific agent based on routing rules"""
-        if agent_name not in self.routing_rules:
+        matcher = self._matcher
+        if agent_name not in matcher.rules:
             return 0.1
-
-        rules = self.routing_rules[agent_name]
-        query_lower = query.lower()
-        score = 0
-
-        # Check keywords
-        for keyword in rules['keywords']:
-            if keyword in query_lower:
-                score += 1
-
-        # Check patterns
-        for pattern in rules['patterns']:
-            if re.search(pattern, query_lower):
-                score += 2
-
-        # Apply priority weighting
-        priority_weight = 1 / rules['priority']
-        return min(1.0, (score * priority_weight) / 10)
+        return min(1.0, matcher.agent_score(query.lower(), agent_name) / 10)
 
     def _assess_query_complexity(self, query: str) -> str:
         """Assess query complexity for RL training"""
@@ -774,8 +2014,15 @@ class AgentRouter:
         else:
             return 'simple'
 
-    def _create_task_for_agent(self, agent_name: str, query: str, context: str, rag_context: List[str], language: str = 'en') -> Task:
-        """Create appropriate task based on agent type"""
+    def _create_task_for_agent(self, agent_name: str, query: str, context: str, rag_context: List[str],
+                               language: str = 'en', memory: str = "",
+                               profile: Optional[ExecutionProfile] = None) -> 'Task':
+        """Create appropriate task based on agent type; conversation memory is appended to any template
+
+        The task is bound to a new agent with the profile's settings: CrewAI
+        runs each task on task.agent, and one agent cannot run two tasks at once.
+        """
+        _, _, Task = get_crewai()
 
         # Enhance context with RAG information
         enhanced_context = context
@@ -783,175 +2030,44 @@ class AgentRouter:
             rag_context_str = "\n".join([f"- {item}" for item in rag_context])
             enhanced_context = f"{context}\n\nRELEVANT KNOWLEDGE BASE:\n{rag_context_str}"
 
-        # Define language-specific prompts
-        if language == 'pt':
-            language_instruction = "Responda em português brasileiro com linguagem técnica e detalhada."
-            lang_suffix = "em português brasileiro"
-        else:
-            language_instruction = "Respond in English with technical and detailed language."
-            lang_suffix = "in English"
-
-        task_configs = {
-            'fccs_expert': {
-                'description': f"""
-                You are an Oracle FCCS expert focused on giving EXACTLY what the user needs.
-
-                CRITICAL INSTRUCTIONS:
-                - For CONFIGURATION questions: Give navigation steps and settings only
-                - For SCRIPTING questions: Provide code only when specifically requested
-                - Keep responses under 3 sentences for simple questions
-                - Never provide scripts unless explicitly asked for code/script/groovy
-                - Ask for clarification if unsure whether they want configuration steps or code
-
-                QUESTION TYPE DETECTION:
-                - "How do I set up..." = Configuration (give menu steps)
-                - "Where do I find..." = Configuration (give navigation)
-                - "What settings..." = Configuration (list settings)
-                - "Create a script..." = Scripting (provide code)
-                - "Write groovy..." = Scripting (provide code)
-
-                User Question: {query}
-
-                Enhanced Context: {enhanced_context}
-
-                Respond with EXACTLY what they need - configuration steps OR code - not both {lang_suffix}
-                """,
-                'expected_output': f"Precise, concise answer matching the question type (configuration steps OR code) {lang_suffix}"
-            },
-            'groovy_validator': {
-                'description': f"""
-                Analyze and validate the following Groovy code/rule for FCCS:
-
-                CODE/RULE: {query}
-
-                CONTEXT: {enhanced_context}
-
-                {language_instruction}
-                Check for syntax errors, logic issues, and performance problems.
-                Suggest specific improvements and best practices.
-                """,
-                'expected_output': f"Technical validation with improvement suggestions {lang_suffix}"
-            },
-            'smartview_designer': {
-                'description': f"""
-                Design a Smart View report layout for FCCS based on the following requirements:
-
-                REQUIREMENTS: {query}
-
-                CONTEXT: {enhanced_context}
-
-                {language_instruction}
-                Include POV setup, dimensions, member selections, and formatting recommendations.
-                """,
-                'expected_output': f"Smart View report model with detailed layout {lang_suffix}"
-            },
-            'pdf_converter': {
-                'description': f"""
-                Extract and process technical content from the provided document:
-
-                DOCUMENT: {query}
-
-                CONTEXT: {enhanced_context}
-
-                {language_instruction}
-                Focus on technical FCCS information, procedures, and configuration details.
-                """,
-                'expected_output': f"Extracted and processed technical content {lang_suffix}"
-            },
-            'consolidation_validator': {
-                'description': f"""
-                Analyze and detect consolidation errors in Oracle FCCS:
-
-                ISSUE/QUERY: {query}
-
-                CONTEXT: {enhanced_context}
-
-                {language_instruction}
-
-                Perform the following analysis:
-                1. Identify the type of consolidation error (elimination posting, intercompany mismatch, account mapping, etc.)
-                2. Explain the root cause of the error
-                3. Assess the impact on financial statements
-                4. Provide step-by-step correction procedures
-                5. Suggest preventive measures for future occurrences
-                6. Include relevant Groovy rules or Data Management corrections if applicable
-
-                Focus on practical, actionable solutions for FCCS consolidation issues.
-                """,
-                'expected_output': f"Comprehensive consolidation error analysis with correction steps {lang_suffix}"
-            },
-            'document_intelligence': {
-                'description': f"""
-                Analyze uploaded documents to extract specific company information and answer the question:
-
-                QUESTION: {query}
-
-                CONTEXT: {enhanced_context}
-
-                {language_instruction}
-
-                Focus on finding specific information from uploaded documents rather than providing generic advice:
-                1. Search for specific company procedures, and timelines mentioned in uploaded documents
-                2. Extract exact dates, deadlines, and schedules from company materials
-                3. Identify organization-specific requirements and procedures
-                4. Quote or reference specific sections from uploaded documents when available
-                5. If specific information isn't found in documents, clearly state that and suggest where to look
-                6. Prioritize document-sourced answers over general best practices
-
-                Always specify the source of information (uploaded document vs. general knowledge).
-                """,
-                'expected_output': f"Document-specific analysis with exact quotes and references {lang_suffix}"
-            },
-            'sox_compliance': {
-                'description': f"""
-                Provide expert SOX compliance guidance for the following FCCS-related question:
-
-                QUESTION: {query}
-
-                CONTEXT: {enhanced_context}
-
-                {language_instruction}
-
-                Address the following SOX compliance aspects:
-                1. Identify relevant SOX requirements and control objectives
-                2. Specify applicable COSO framework components
-                3. Detail required control activities and documentation
-                4. Explain testing procedures and evidence requirements
-                5. Address segregation of duties and access control requirements
-                6. Identify potential control deficiencies and remediation steps
-                7. Provide audit preparation guidance and evidence collection
-                8. Reference relevant PCAOB standards when applicable
-
-                Focus on practical, implementable SOX controls for FCCS environments.
-                Include specific control procedures, testing steps, and documentation requirements.
-                """,
-                'expected_output': f"Comprehensive SOX compliance guidance with specific control procedures {lang_suffix}"
-            },
-            'orchestrator': {
-                'description': f"""
-                You coordinate FCCS workflows with a friendly, efficient approach.
+        # Only the selected agent's precompiled template is rendered
+        template_key = agent_name if agent_name in TASK_TEMPLATES else 'fccs_expert'
+        description, expected_output = self._task_templates[(template_key, 'pt' if language == 'pt' else 'en')]
 
-                STYLE:
-                - Be conversational and supportive
-                - Keep responses brief and focused
-                - Show understanding of workflow pressures
-                - Give step-by-step guidance when needed
-
-                USER REQUEST: {query}
+        description = description.format(query=query, enhanced_context=enhanced_context)
+        if memory:
+            description = f"{description}\n\nCONVERSATION MEMORY (earlier turns of this chat):\n{memory}\n"
+        return Task(
+            description=description,
+            expected_output=expected_output,
+            agent=self._crew_agent(agent_name, profile)
+        )
 
-                Determine what type of close they need and give them clear next steps {lang_suffix}
-                """,
-                'expected_output': f"Clear workflow guidance with next steps {lang_suffix}"
-            }
-        }
+    def _compile_task_templates(self) -> Dict[Tuple[str, str], Tuple[str, str]]:
+        """Pre-render every task template per language, leaving only query and context to fill"""
+        compiled = {}
+        for language, prompts in LANGUAGE_PROMPTS.items():
+            for agent_name, config in TASK_TEMPLATES.items():
+                description = config['description'].format(
+                    query='{query}', enhanced_context='{enhanced_context}', **prompts
+                )
+                compiled[(agent_name, language)] = (description, config['expected_output'].format(**prompts))
+        return compiled
 
-        config = task_configs.get(agent_name, task_configs['fccs_expert'])
+    def _pack_context(self, agent_name: str, query: str, rag_context: List[str], timings: Dict,
+                      profile: Optional[ExecutionProfile] = None) -> Tuple[List[str], Dict]:
+        """Deduplicate, rank and trim retrieved context to the agent's token budget, scaled by the tier"""
+        stage_start = time.perf_counter()
+        budget = None
+        if profile is not None and profile.context_budget_scale != 1.0:
+            budget = int(self.context_packer.budget_for(agent_name) * profile.context_budget_scale)
+        packed, report = self.context_packer.pack(query, rag_context, agent_name, budget=budget)
+        timings['context_packing'] = time.perf_counter() - stage_start
+        return packed, report
 
-        return Task(
-            description=config['description'],
-            expected_output=config['expected_output'],
-            agent=self.agents[agent_name]
-        )
+    def get_context_packing_stats(self) -> Dict:
+        """Get cumulative RAG context packing totals (tokens saved per request)"""
+        return self.context_packer.get_stats()
 
 
     def get_agent_info(self) -> Dict[str, Dict]:
@@ -968,13 +2084,50 @@ class AgentRouter:
 class CrewAIRouter(AgentRouter):
     """Compatibility wrapper for main.py"""
     
-    def route_query(self, question: str) -> str:
-        """Route query and return result string for main.py compatibility"""
+    def route_query(self, question: str, session_id: Optional[str] = None) -> str:
+        """Route query and return result string for main.py compatibility
+
+        Pass the chat's session_id to give the agents memory of earlier turns.
+        """
         try:
-            result = super().route_query(question)
+            result = super().route_query(question, conversation_id=session_id)
             if result.get('success'):
                 return result.get('result', '')
             else:
                 return f"Error: {result.get('error', 'Unknown error')}"
         except Exception as e:
-            return f"Error: {str(e)}"
\ No newline at end of file
+            return f"Error: {str(e)}"
+
+    async def aroute_query(self, question: str, request_id: Optional[str] = None,
+                           timeout: Optional[float] = None, session_id: Optional[str] = None) -> str:
+        """Async variant of route_query() for async web servers"""
+        try:
+            result = await super().aroute_query(question, request_id=request_id, timeout=timeout,
+                                                conversation_id=session_id)
+            if result.get('success'):
+                return result.get('result', '')
+            else:
+                return f"Error: {result.get('error', 'Unknown error')}"
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return f"Error: {str(e)}"
+
+
+def stream_to_sse(events: Iterable[Dict]) -> Iterator[str]:
+    """Serialize stream_query() events as Server-Sent Events"""
+    for event in events:
+        payload = {key: value for key, value in event.items() if key != 'event'}
+        yield f"event: {event['event']}\ndata: {json.dumps(payload, default=str)}\n\n"
+
+
+_record_init('module_import', time.perf_counter() - _MODULE_IMPORT_STARTED, 'ok')
+
+
+if __name__ == '__main__':
+    # Profile report mode: python agent_router.py --profile-init
+    if '--profile-init' in sys.argv:
+        try:
+            warm_up()
+        finally:
+            print(format_init_profile())
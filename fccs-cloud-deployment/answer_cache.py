@@ -0,0 +1,216 @@
+"""
+Persistent Answer Cache for FCCS AI System
+SQLite-backed cache of final agent answers keyed on agent, query, context, language and model
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from rag_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    cache_key TEXT PRIMARY KEY,
+    answer TEXT NOT NULL,
+    selected_agent TEXT NOT NULL,
+    kb_version INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    size_bytes INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS answers_last_access ON answers (last_access);
+CREATE TABLE IF NOT EXISTS metadata (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def hash_rag_context(rag_context: List[str]) -> str:
+    """Stable digest of the retrieved context a prompt was built from"""
+    digest = hashlib.sha256()
+    for item in rag_context:
+        digest.update(item.encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+class AnswerCache:
+    """Durable LLM answer cache on local disk with TTL and size-based eviction"""
+
+    def __init__(self, path: str = 'answer_cache.sqlite3', ttl_seconds: float = 7 * 24 * 3600,
+                 max_bytes: int = 64 * 1024 * 1024):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'expirations': 0, 'bypassed': 0,
+                       'fallback_hits': 0}
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+        self._migrate()
+        self._kb_version = self._load_kb_version()
+
+    def _migrate(self) -> None:
+        """Add columns introduced after the cache file may have been created"""
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(answers)')}
+        if 'query_key' not in columns:
+            self._conn.execute('ALTER TABLE answers ADD COLUMN query_key TEXT')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS answers_query_key ON answers (query_key, created_at)')
+
+    @classmethod
+    def from_env(cls) -> Optional['AnswerCache']:
+        """Build the cache from ANSWER_CACHE_* settings; None when ANSWER_CACHE_ENABLED=0"""
+        if os.getenv('ANSWER_CACHE_ENABLED', '1').lower() in ('0', 'false', 'no'):
+            return None
+        try:
+            return cls(
+                path=os.getenv('ANSWER_CACHE_PATH', 'answer_cache.sqlite3'),
+                ttl_seconds=float(os.getenv('ANSWER_CACHE_TTL_SECONDS', str(7 * 24 * 3600))),
+                max_bytes=int(os.getenv('ANSWER_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Answer cache disabled: {e}")
+            return None
+
+    def make_key(self, selected_agent: str, query: str, rag_context: List[str], language: str,
+                 model: str = "", temperature: Optional[float] = None, context: str = "",
+                 max_tokens: Optional[int] = None) -> str:
+        """Build the cache key from everything that determines the answer
+
+        Caller-supplied context (e.g. chat history) also shapes the prompt, so
+        it is hashed together with the RAG context.
+        """
+        parts = [selected_agent, normalize_query(query), hash_rag_context([context] + list(rag_context)), language,
+                 model, '' if temperature is None else f"{temperature:g}", '' if max_tokens is None else str(max_tokens)]
+        return hashlib.sha256(json.dumps(parts).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def make_query_key(selected_agent: str, query: str, language: str) -> str:
+        """Looser key (agent, normalized query, language) used for deadline fallbacks"""
+        return hashlib.sha256(json.dumps([selected_agent, normalize_query(query), language]).encode('utf-8')).hexdigest()
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[str]:
+        """Return a fresh answer for the key, or None
+
+        max_age tightens freshness for this lookup only; an entry older than
+        max_age but within the TTL counts as a miss and is kept.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT answer, kb_version, created_at FROM answers WHERE cache_key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                self._stats['misses'] += 1
+                return None
+            answer, kb_version, created_at = row
+            if kb_version != self._refresh_kb_version_locked() or now - created_at > self.ttl_seconds:
+                self._conn.execute('DELETE FROM answers WHERE cache_key = ?', (key,))
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return None
+            if max_age is not None and now - created_at > max_age:
+                self._stats['misses'] += 1
+                return None
+            self._conn.execute('UPDATE answers SET last_access = ? WHERE cache_key = ?', (now, key))
+            self._stats['hits'] += 1
+            return answer
+
+    def get_fallback(self, query_key: str) -> Optional[str]:
+        """Most recent valid answer to the same question, whatever context or model produced it
+
+        Used when a request's deadline leaves no time to run the LLM; the
+        answer may be older than a tier's max_age but never older than the TTL
+        or from a previous knowledge-base version.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT cache_key, answer FROM answers WHERE query_key = ? AND kb_version = ? AND created_at >= ? '
+                'ORDER BY created_at DESC LIMIT 1',
+                (query_key, self._refresh_kb_version_locked(), now - self.ttl_seconds)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute('UPDATE answers SET last_access = ? WHERE cache_key = ?', (now, row[0]))
+            self._stats['fallback_hits'] += 1
+            return row[1]
+
+    def put(self, key: str, answer: str, selected_agent: str, query_key: Optional[str] = None) -> None:
+        """Store an answer and evict least recently used entries beyond max_bytes"""
+        now = time.time()
+        size = len(answer.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO answers (cache_key, answer, selected_agent, kb_version, created_at, '
+                'last_access, size_bytes, query_key) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, answer, selected_agent, self._refresh_kb_version_locked(), now, now, size, query_key)
+            )
+            self._stats['stores'] += 1
+            self._evict_locked()
+
+    def _evict_locked(self) -> None:
+        total = self._conn.execute('SELECT COALESCE(SUM(size_bytes), 0) FROM answers').fetchone()[0]
+        while total > self.max_bytes:
+            row = self._conn.execute(
+                'SELECT cache_key, size_bytes FROM answers ORDER BY last_access LIMIT 1'
+            ).fetchone()
+            if row is None:
+                break
+            self._conn.execute('DELETE FROM answers WHERE cache_key = ?', (row[0],))
+            total -= row[1]
+            self._stats['evictions'] += 1
+
+    def record_bypass(self) -> None:
+        with self._lock:
+            self._stats['bypassed'] += 1
+
+    def _load_kb_version(self) -> int:
+        row = self._conn.execute("SELECT value FROM metadata WHERE name = 'kb_version'").fetchone()
+        return int(row[0]) if row else 0
+
+    def _refresh_kb_version_locked(self) -> int:
+        # Read on every lookup and store (a primary-key read), so an invalidation by any
+        # process sharing the file takes effect everywhere at once
+        self._kb_version = self._load_kb_version()
+        return self._kb_version
+
+    def invalidate(self) -> None:
+        """Invalidate every answer, e.g. when the knowledge base changes
+
+        Bumps a persisted knowledge-base version so other processes sharing the
+        file also stop serving old answers, then deletes the stale rows.
+        """
+        with self._lock:
+            self._kb_version = self._load_kb_version() + 1
+            self._conn.execute(
+                "INSERT OR REPLACE INTO metadata VALUES ('kb_version', ?)", (str(self._kb_version),)
+            )
+            self._conn.execute('DELETE FROM answers WHERE kb_version < ?', (self._kb_version,))
+
+    def get_stats(self) -> Dict:
+        """Return hit-rate and size metrics for monitoring"""
+        with self._lock:
+            stats = dict(self._stats)
+            entries, size = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM answers'
+            ).fetchone()
+        lookups = stats['hits'] + stats['misses']
+        stats.update({
+            'entries': entries,
+            'size_bytes': size,
+            'hit_rate': stats['hits'] / lookups if lookups else 0.0,
+            'kb_version': self._kb_version
+        })
+        return stats
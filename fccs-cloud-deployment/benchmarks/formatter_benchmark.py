@@ -0,0 +1,256 @@
+"""
+Response Formatter Benchmark for FCCS AI System
+Checks FCCSResponseFormatter against a golden corpus of agent answers and their
+expected HTML, verifies the single-pass renderer (_apply_formatting) against the
+multi-pass reference (reference_formatter.py) and the linear-time cleaner
+(_clean_response) against the regex reference (reference_formatter.py), and times
+them on large and pathological responses.
+
+Usage:
+    python benchmarks/formatter_benchmark.py [--corpus PATH] [--size 100000]
+        [--repeat 20] [--fuzz 2000] [--min-speedup 0]
+        [--pathological-size 1000000] [--reference-size 5000] [--max-clean-ms 1000]
+        [--update] [--json]
+
+The large response is built by concatenating the corpus answers until it
+reaches --size characters. --fuzz N also compares the two renderers on N
+random documents assembled from corpus lines (seeded by --seed). --update
+rewrites the corpus' expected HTML from the current formatter after an
+intended output change.
+
+Pathological responses repeat a disclaimer or filler opening phrase without
+its closing phrase (or final period) to --pathological-size characters, the
+input on which the regex cleaner backtracks quadratically. The regex cleaner
+is only timed, and compared, on a --reference-size prefix of each.
+
+Exits with status 1 on any golden, renderer or cleaner mismatch, when the
+speedup is below --min-speedup, or when cleaning a pathological response
+takes longer than --max-clean-ms.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reference_formatter import apply_formatting_multipass, clean_response_regex  # noqa: E402
+from response_formatter import FCCSResponseFormatter  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'formatter_corpus.json')
+SEPARATORS = ('\n', '\n', '\n\n', ' \n', '\n ')
+PATHOLOGICAL_UNITS = {
+    'unclosed_disclaimer': "This information is for general guidance only. Review the eliminations. ",
+    'unclosed_note': "Please note that this is general information about the close. ",
+    'consult_without_period': "Always consult a professional ",
+    'filler_without_closing': "Let me know if you need the FX rates ",
+    'whitespace_runs': "Entity \n\n\n\t  "
+}
+
+
+def load_corpus(path: str) -> List[Dict]:
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def check_golden(formatter: FCCSResponseFormatter, corpus: List[Dict]) -> List[str]:
+    """Names of corpus entries whose formatted HTML differs from the expected HTML"""
+    return [item['name'] for item in corpus
+            if formatter.format_response(item['response'], item['agent']) != item['html']]
+
+
+def compare_renderers(formatter: FCCSResponseFormatter, texts: List[str]) -> List[str]:
+    """Cleaned inputs on which the single-pass and multi-pass renderers disagree"""
+    mismatches = []
+    for text in texts:
+        cleaned = formatter._clean_response(text)
+        if formatter._apply_formatting(cleaned) != apply_formatting_multipass(cleaned):
+            mismatches.append(cleaned)
+    return mismatches
+
+
+def compare_cleaners(formatter: FCCSResponseFormatter, texts: List[str]) -> List[str]:
+    """Inputs on which the linear-time and regex cleaners disagree"""
+    return [text for text in texts if formatter._clean_response(text) != clean_response_regex(text)]
+
+
+def fuzz_documents(corpus: List[Dict], count: int, seed: int) -> List[str]:
+    """Random documents built from corpus lines, so line kinds meet in unusual orders"""
+    lines = sorted({line for item in corpus for line in item['response'].split('\n') if line.strip()})
+    rng = random.Random(seed)
+    documents = []
+    for _ in range(count):
+        parts = []
+        for _ in range(rng.randint(1, 16)):
+            parts.append(rng.choice(lines))
+            parts.append(rng.choice(SEPARATORS))
+        documents.append("".join(parts))
+    return documents
+
+
+def build_large_response(corpus: List[Dict], size: int) -> str:
+    answers = [item['response'] for item in corpus]
+    parts, length = [], 0
+    while length < size:
+        answer = answers[len(parts) % len(answers)]
+        parts.append(answer)
+        length += len(answer) + 2
+    return "\n\n".join(parts)
+
+
+def build_pathological_response(unit: str, size: int) -> str:
+    return unit * max(1, size // len(unit))
+
+
+def time_call(function: Callable[[str], str], text: str, repeat: int) -> Dict:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(text)
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return {'best_ms': samples[0] * 1000, 'median_ms': samples[len(samples) // 2] * 1000}
+
+
+def run(args: argparse.Namespace) -> Dict:
+    formatter = FCCSResponseFormatter()
+    corpus = load_corpus(args.corpus)
+
+    large = build_large_response(corpus, args.size)
+    cleaned = formatter._clean_response(large)
+    single = time_call(formatter._apply_formatting, cleaned, args.repeat)
+    multipass = time_call(apply_formatting_multipass, cleaned, args.repeat)
+    full = time_call(lambda text: formatter.format_response(text, 'fccs_expert'), large, args.repeat)
+
+    texts = [item['response'] for item in corpus] + [large] + fuzz_documents(corpus, args.fuzz, args.seed)
+    renderer_mismatches = compare_renderers(formatter, texts)
+
+    clean = time_call(formatter._clean_response, large, args.repeat)
+    clean_regex = time_call(clean_response_regex, large, args.repeat)
+    pathological, references = {}, []
+    for name, unit in PATHOLOGICAL_UNITS.items():
+        response = build_pathological_response(unit, args.pathological_size)
+        reference = response[:args.reference_size]
+        references.append(reference)
+        pathological[name] = {
+            'chars': len(response),
+            'clean_ms': time_call(formatter._clean_response, response, max(1, args.repeat // 4))['best_ms'],
+            'reference_chars': len(reference),
+            'reference_clean_ms': time_call(formatter._clean_response, reference, 1)['best_ms'],
+            'reference_regex_ms': time_call(clean_response_regex, reference, 1)['best_ms']
+        }
+    cleaner_mismatches = compare_cleaners(formatter, texts + references)
+    return {
+        'corpus_entries': len(corpus),
+        'golden_mismatches': check_golden(formatter, corpus),
+        'renderer_checks': len(texts),
+        'renderer_mismatches': len(renderer_mismatches),
+        'first_renderer_mismatch': renderer_mismatches[0] if renderer_mismatches else None,
+        'cleaner_checks': len(texts) + len(references),
+        'cleaner_mismatches': len(cleaner_mismatches),
+        'first_cleaner_mismatch': cleaner_mismatches[0] if cleaner_mismatches else None,
+        'response_chars': len(large),
+        'single_pass': single,
+        'multipass': multipass,
+        'format_response': full,
+        'speedup': multipass['best_ms'] / single['best_ms'] if single['best_ms'] else 0.0,
+        'clean': clean,
+        'clean_regex': clean_regex,
+        'pathological': pathological
+    }
+
+
+def update_golden(path: str) -> int:
+    formatter = FCCSResponseFormatter()
+    corpus = load_corpus(path)
+    for item in corpus:
+        item['html'] = formatter.format_response(item['response'], item['agent'])
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(corpus, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+    return len(corpus)
+
+
+def check_thresholds(report: Dict, min_speedup: float, max_clean_ms: float) -> List[str]:
+    failures = []
+    if report['golden_mismatches']:
+        failures.append(f"HTML differs from the golden corpus for: {', '.join(report['golden_mismatches'])}")
+    if report['renderer_mismatches']:
+        failures.append(f"single-pass and multi-pass renderers disagree on {report['renderer_mismatches']} of "
+                        f"{report['renderer_checks']} inputs, e.g. {json.dumps(report['first_renderer_mismatch'])}")
+    if report['cleaner_mismatches']:
+        failures.append(f"linear-time and regex cleaners disagree on {report['cleaner_mismatches']} of "
+                        f"{report['cleaner_checks']} inputs, e.g. {json.dumps(report['first_cleaner_mismatch'])}")
+    if min_speedup and report['speedup'] < min_speedup:
+        failures.append(f"speedup {report['speedup']:.2f}x < {min_speedup:.2f}x")
+    for name, result in report['pathological'].items():
+        if max_clean_ms and result['clean_ms'] > max_clean_ms:
+            failures.append(f"cleaning {name} ({result['chars']:,} chars) took {result['clean_ms']:.1f} ms "
+                            f"> {max_clean_ms:.0f} ms")
+    return failures
+
+
+def print_report(report: Dict) -> None:
+    print(f"Response formatter benchmark ({report['response_chars']:,} character response)")
+    print(f"  golden corpus:   {report['corpus_entries'] - len(report['golden_mismatches'])}"
+          f"/{report['corpus_entries']} entries match")
+    print(f"  renderer checks: {report['renderer_checks'] - report['renderer_mismatches']}"
+          f"/{report['renderer_checks']} inputs identical")
+    for label, key in (('single-pass', 'single_pass'), ('multi-pass', 'multipass'),
+                       ('format_response', 'format_response')):
+        timing = report[key]
+        print(f"  {label:<16} best {timing['best_ms']:8.2f} ms   median {timing['median_ms']:8.2f} ms")
+    print(f"  speedup:         {report['speedup']:.2f}x")
+    print(f"  cleaner checks:  {report['cleaner_checks'] - report['cleaner_mismatches']}"
+          f"/{report['cleaner_checks']} inputs identical")
+    for label, key in (('clean', 'clean'), ('clean (regex)', 'clean_regex')):
+        timing = report[key]
+        print(f"  {label:<16} best {timing['best_ms']:8.2f} ms   median {timing['median_ms']:8.2f} ms")
+    print("  pathological responses:")
+    for name, result in report['pathological'].items():
+        print(f"    {name:<24} {result['chars']:>9,} chars {result['clean_ms']:8.2f} ms   "
+              f"at {result['reference_chars']:,} chars: {result['reference_clean_ms']:.2f} ms "
+              f"vs regex {result['reference_regex_ms']:.2f} ms")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS)
+    parser.add_argument('--size', type=int, default=100_000, help='characters in the timed response')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--fuzz', type=int, default=2000, help='random documents to compare the renderers on')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--min-speedup', type=float, default=0.0)
+    parser.add_argument('--pathological-size', type=int, default=1_000_000,
+                        help='characters in each pathological response')
+    parser.add_argument('--reference-size', type=int, default=5000,
+                        help='characters of each pathological response given to the regex cleaner')
+    parser.add_argument('--max-clean-ms', type=float, default=1000.0,
+                        help='fail when cleaning a pathological response takes longer (0 disables)')
+    parser.add_argument('--update', action='store_true', help="rewrite the corpus' expected HTML")
+    parser.add_argument('--json', action='store_true', help='print the full report as JSON')
+    args = parser.parse_args(argv)
+
+    if args.update:
+        print(f"✅ Updated expected HTML for {update_golden(args.corpus)} corpus entries")
+        return 0
+
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print_report(report)
+
+    failures = check_thresholds(report, args.min_speedup, args.max_clean_ms)
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Response formatter benchmark passed")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
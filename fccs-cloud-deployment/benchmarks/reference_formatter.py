@@ -0,0 +1,159 @@
+"""
+Reference Response Formatter for FCCS AI System
+The original multi-pass HTML renderer and regex cleaner of FCCSResponseFormatter,
+kept outside the production class so formatter_benchmark.py can check the
+single-pass renderer and linear-time cleaner against them and time both
+"""
+import re
+
+
+def apply_formatting_multipass(text: str) -> str:
+    """Reference for FCCSResponseFormatter._apply_formatting(): one regex or line pass per rule"""
+
+    # 1. First handle numbered headers specifically (before general bold formatting)
+    text = re.sub(r'^\d+\.\s+\*\*([^*]+?)\*\*:?\s*$', r'<h4 class="fccs-subheader">\1</h4>', text, flags=re.MULTILINE)
+
+    # 2. Handle standalone headers
+    text = re.sub(r'^\*\*([^*]+?):\*\*\s*$', r'<h3 class="fccs-header">\1</h3>', text, flags=re.MULTILINE)
+
+    # 3. Handle all caps headers
+    text = re.sub(r'^([A-Z][A-Z\s]{2,}):?\s*$', r'<h3 class="fccs-header">\1</h3>', text, flags=re.MULTILINE)
+
+    # 4. Convert numbered lists
+    text = _format_numbered_lists(text)
+
+    # 5. Convert bullet points
+    text = _format_bullet_points(text)
+
+    # 6. Convert remaining bold text (not headers)
+    text = re.sub(r'\*\*([^*]+?)\*\*', r'<strong class="fccs-bold">\1</strong>', text)
+
+    # 7. Convert code blocks
+    text = _format_code_blocks(text)
+
+    # 8. Convert line breaks to paragraphs
+    text = _format_paragraphs(text)
+
+    return text
+
+
+def clean_response_regex(response: str) -> str:
+    """Reference for FCCSResponseFormatter._clean_response(): the original backtracking cleanup
+
+    Quadratic when an opening phrase repeats without its closing phrase.
+    """
+    # Remove excessive disclaimers and warnings
+    response = re.sub(r'This information is for general guidance only\..*?consult with qualified professionals.*?\.', '', response, flags=re.IGNORECASE | re.DOTALL)
+    response = re.sub(r'Please note that this is general information.*?specific advice.*?\.', '', response, flags=re.IGNORECASE | re.DOTALL)
+    response = re.sub(r'It\'s recommended to consult.*?implementation.*?\.', '', response, flags=re.IGNORECASE | re.DOTALL)
+    response = re.sub(r'Always consult.*?professional.*?\.', '', response, flags=re.IGNORECASE | re.DOTALL)
+
+    # Remove excessive filler phrases
+    response = re.sub(r'I hope this helps!?\s*', '', response, flags=re.IGNORECASE)
+    response = re.sub(r'Let me know if you need.*?assistance.*?\.?\s*', '', response, flags=re.IGNORECASE)
+    response = re.sub(r'Feel free to ask.*?questions.*?\.?\s*', '', response, flags=re.IGNORECASE)
+
+    # Remove redundant introductions for simple questions
+    response = re.sub(r'^To answer your question about.*?,\s*', '', response, flags=re.IGNORECASE)
+    response = re.sub(r'^Regarding your question.*?,\s*', '', response, flags=re.IGNORECASE)
+
+    # Clean up excessive whitespace
+    response = re.sub(r'\n{3,}', '\n\n', response)
+    response = re.sub(r'\s{3,}', ' ', response)
+
+    return response.strip()
+
+
+def _format_numbered_lists(text: str) -> str:
+    """Convert numbered lists to HTML ordered lists"""
+    # Pattern: 1. Item\n2. Item\n3. Item
+    lines = text.split('\n')
+    result = []
+    in_list = False
+
+    for line in lines:
+        stripped = line.strip()
+        if re.match(r'^\d+\.\s+', stripped):
+            if not in_list:
+                result.append('<ol class="fccs-list">')
+                in_list = True
+            item_text = re.sub(r'^\d+\.\s+', '', stripped).strip()
+            if item_text:  # Only add non-empty list items
+                result.append(f'<li>{item_text}</li>')
+        else:
+            if in_list:
+                result.append('</ol>')
+                in_list = False
+            # Only add non-empty lines
+            if stripped:
+                result.append(line)
+
+    if in_list:
+        result.append('</ol>')
+
+    return '\n'.join(result)
+
+
+def _format_bullet_points(text: str) -> str:
+    """Convert bullet points to HTML unordered lists"""
+    # Pattern: - Item\n- Item\n- Item or • Item
+    lines = text.split('\n')
+    result = []
+    in_list = False
+
+    for line in lines:
+        stripped = line.strip()
+        if re.match(r'^[-•*]\s+', stripped):
+            if not in_list:
+                result.append('<ul class="fccs-list">')
+                in_list = True
+            item_text = re.sub(r'^[-•*]\s+', '', stripped).strip()
+            if item_text:  # Only add non-empty list items
+                result.append(f'<li>{item_text}</li>')
+        else:
+            if in_list:
+                result.append('</ul>')
+                in_list = False
+            # Only add non-empty lines
+            if stripped:
+                result.append(line)
+
+    if in_list:
+        result.append('</ul>')
+
+    return '\n'.join(result)
+
+
+def _format_code_blocks(text: str) -> str:
+    """Format code blocks and inline code"""
+    # ```code block```
+    text = re.sub(r'```(.*?)```', r'<pre class="fccs-code-block"><code>\1</code></pre>', text, flags=re.DOTALL)
+
+    # `inline code`
+    text = re.sub(r'`([^`]+)`', r'<code class="fccs-inline-code">\1</code>', text)
+
+    return text
+
+
+def _format_paragraphs(text: str) -> str:
+    """Convert line breaks to proper paragraphs while removing excessive whitespace"""
+    # Remove excessive empty lines (more than 2 consecutive newlines)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+
+    # Split by double line breaks for paragraphs
+    paragraphs = re.split(r'\n\s*\n', text)
+    formatted_paragraphs = []
+
+    for para in paragraphs:
+        para = para.strip()
+        if para:
+            # Don't wrap if already has HTML tags
+            if not re.search(r'<(h[1-6]|ul|ol|pre|div)', para):
+                # Remove excessive spaces within lines
+                para = re.sub(r'\s+', ' ', para)
+                # Replace single line breaks with <br> within paragraphs, but avoid excessive breaks
+                para = re.sub(r'\n+', '<br>', para)
+                para = f'<p class="fccs-paragraph">{para}</p>'
+            formatted_paragraphs.append(para)
+
+    return ''.join(formatted_paragraphs)
@@ -0,0 +1,307 @@
+"""
+Router Load Benchmark for FCCS Agent Router
+Drives the full route_query() path - routing, retrieval, context packing, crew
+construction and kickoff, response formatting and RL recording - on the offline
+LLM, RAG and RL stand-ins (offline_backends.py), so end-to-end throughput and
+latency can be measured locally and reproducibly.
+
+Usage:
+    python benchmarks/router_load_benchmark.py [--corpus PATH] [--requests 200]
+        [--concurrency 8] [--llm-latency lognormal:0.05:0.3] [--tokens-per-second 400]
+        [--rag-latency uniform:0.01:0.03] [--workers 0] [--answer-cache] [--rl-inference optimizer]
+        [--max-failures 0] [--min-qps 0] [--max-p95 0] [--min-rl-agreement 1.0] [--json]
+
+Needs no API keys; CrewAI must be installed because crews are really built and
+kicked off. Simulated latencies are seeded per prompt (--seed), so two runs
+with the same arguments produce the same answers (compare 'answers_digest').
+With --workers N the requests are served by a RouterWorkerPool of N router
+processes (worker_pool.py) instead of in-process; compare runs with 1 and N
+workers at --llm-latency 0 to see how CPU-bound throughput scales with cores.
+Per-stage and RL figures are only reported in-process.
+
+In-process runs also ask the RL snapshot policy (rl_snapshot.py) for every
+corpus query and count how often it picks the optimizer's agent: the router's
+own policy with --rl-inference snapshot (after it trained on the run's
+interactions), a fresh one otherwise.
+Exits with status 1 when more than --max-failures requests fail (any failure
+by default, including requests shed by bulkheads, so error results never pass
+as throughput) or a --min-qps, --max-p95 or --min-rl-agreement threshold is
+missed.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'routing_corpus.json')
+DEFAULT_ANSWERS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               'configs', 'offline_answers.json')
+
+
+def configure_offline_backends(args: argparse.Namespace) -> None:
+    """Point the router at the offline stand-ins; must run before the router is built"""
+    os.environ.update({
+        'AGENT_ROUTER_LLM_BACKEND': 'offline',
+        'AGENT_ROUTER_RAG_BACKEND': 'offline',
+        'AGENT_ROUTER_RL_BACKEND': 'offline',
+        'OFFLINE_LLM_LATENCY': args.llm_latency,
+        'OFFLINE_LLM_TOKENS_PER_SECOND': str(args.tokens_per_second),
+        'OFFLINE_LLM_ANSWERS': args.answers,
+        'OFFLINE_RAG_LATENCY': args.rag_latency,
+        'OFFLINE_RL_LATENCY': args.rl_latency,
+        'OFFLINE_SEED': str(args.seed),
+        'AGENT_ROUTER_RL_INFERENCE': args.rl_inference,
+        'AGENT_ROUTER_TRACING_EXPORTER': 'none'
+    })
+    if not args.answer_cache:
+        os.environ['ANSWER_CACHE_ENABLED'] = '0'
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def rl_recorded(router) -> int:
+    """Interactions recorded so far; the snapshot policy hands them to its trainer process's optimizer"""
+    from offline_backends import get_offline_rl_optimizer
+
+    if router.rl_policy is not None:
+        return router.rl_policy.get_stats()['interactions_sent']
+    return get_offline_rl_optimizer().get_stats()['recorded']
+
+
+def measure_rl_agreement(router, queries: List[str]) -> Optional[Dict]:
+    """How often the snapshot policy recommends the same agent as the RL optimizer"""
+    from rl_snapshot import SnapshotRLPolicy
+
+    if router.rl_optimizer is None:
+        return None
+    policy = router.rl_policy or SnapshotRLPolicy(list(router.agents))
+    matcher = router._matcher
+    unique = list(dict.fromkeys(queries))
+    disagreements = []
+    for query in unique:
+        scores = router._traditional_scores(matcher, matcher.weighted_scores(query.lower()))
+        expected = router.rl_optimizer.get_optimized_agent_recommendation(query, scores)[0]
+        chosen = policy.get_optimized_agent_recommendation(query, scores)[0]
+        if chosen != expected:
+            disagreements.append({'query': query, 'optimizer': expected, 'snapshot': chosen})
+    return {
+        'queries': len(unique),
+        'agreement': 1 - len(disagreements) / len(unique) if unique else 1.0,
+        'snapshot_version': policy.snapshot.version,
+        'disagreements': disagreements
+    }
+
+
+def run(args: argparse.Namespace) -> Dict:
+    configure_offline_backends(args)
+    from agent_router import AgentRouter
+    from response_formatter import FCCSResponseFormatter
+
+    with open(args.corpus, encoding='utf-8') as f:
+        queries = [item['query'] for item in json.load(f)]
+    workload = [queries[index % len(queries)] for index in range(args.requests)]
+
+    if args.workers:
+        return run_pooled(args, queries, workload)
+
+    router = AgentRouter()
+    formatter = FCCSResponseFormatter()
+
+    def serve(query: str) -> Dict:
+        started = time.perf_counter()
+        result = router.route_query(query)
+        formatted = formatter.format_response(result.get('result', ''), result.get('selected_agent'))
+        return {
+            'query': query,
+            'success': result['success'],
+            'agent': result.get('selected_agent'),
+            'cached': result.get('cached', False),
+            'shed': result.get('overloaded', False),
+            'answer': result.get('result', ''),
+            'html_bytes': len(formatted),
+            'latency': time.perf_counter() - started
+        }
+
+    # A few untimed requests so lazy initialisation is not measured
+    for query in queries[:args.concurrency]:
+        serve(query)
+    if router.rl_writer is not None:
+        router.rl_writer.flush(5.0)
+    router.metrics = type(router.metrics)()
+    rl_recorded_before = rl_recorded(router)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        served = list(executor.map(serve, workload))
+    elapsed = time.perf_counter() - started
+    router.close()
+
+    stages = {}
+    for stage, agents in router.metrics.snapshot()['stages'].items():
+        count = sum(summary['count'] for summary in agents.values())
+        total = sum(summary['sum'] for summary in agents.values())
+        stages[stage] = {'count': count, 'mean_ms': total / count * 1000 if count else 0.0}
+    return dict(
+        summarize(served, elapsed, args),
+        stages=dict(sorted(stages.items(), key=lambda item: -item[1]['mean_ms'])),
+        rl_recorded=rl_recorded(router) - rl_recorded_before,
+        rl_writer=router.get_rl_writer_stats(),
+        rl_agreement=measure_rl_agreement(router, queries)
+    )
+
+
+def run_pooled(args: argparse.Namespace, queries: List[str], workload: List[str]) -> Dict:
+    """Serve the workload through a RouterWorkerPool; formatting happens in the workers"""
+    from worker_pool import RouterWorkerPool
+
+    pool = RouterWorkerPool(workers=args.workers)
+    if not pool.wait_until_ready(120):
+        pool.close()
+        raise RuntimeError("router workers did not become ready")
+
+    def serve(query: str) -> Dict:
+        started = time.perf_counter()
+        result = pool.route_query(query, format_html=True)
+        return {
+            'query': query,
+            'success': result['success'],
+            'agent': result.get('selected_agent'),
+            'cached': result.get('cached', False),
+            'shed': result.get('overloaded', False),
+            'answer': result.get('result', ''),
+            'html_bytes': len(result.get('formatted', '')),
+            'latency': time.perf_counter() - started
+        }
+
+    for query in queries[:args.concurrency]:
+        serve(query)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        served = list(executor.map(serve, workload))
+    elapsed = time.perf_counter() - started
+    report = dict(summarize(served, elapsed, args), pool=pool.get_stats())
+    pool.close()
+    return report
+
+
+def summarize(served: List[Dict], elapsed: float, args: argparse.Namespace) -> Dict:
+    latencies = [item['latency'] for item in served]
+    answers = sorted(f"{item['query']}\x00{item['answer']}" for item in served)
+    return {
+        'requests': len(served),
+        'concurrency': args.concurrency,
+        'workers': args.workers,
+        'elapsed_seconds': elapsed,
+        'throughput_qps': len(served) / elapsed if elapsed else 0.0,
+        'latency_ms': {
+            'mean': sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+            'p50': percentile(latencies, 0.50) * 1000,
+            'p95': percentile(latencies, 0.95) * 1000,
+            'p99': percentile(latencies, 0.99) * 1000,
+            'max': max(latencies, default=0.0) * 1000
+        },
+        'failures': sum(not item['success'] for item in served),
+        'shed': sum(item['shed'] for item in served),
+        'cached': sum(item['cached'] for item in served),
+        'agents': dict(Counter(item['agent'] for item in served).most_common()),
+        'answers_digest': hashlib.sha256("\n".join(answers).encode('utf-8')).hexdigest()[:16]
+    }
+
+
+def check_thresholds(report: Dict, max_failures: int, min_qps: float, max_p95_ms: float,
+                     min_rl_agreement: float) -> List[str]:
+    failures = []
+    if report['failures'] > max_failures:
+        failures.append(f"{report['failures']} of {report['requests']} requests failed")
+    if min_qps and report['throughput_qps'] < min_qps:
+        failures.append(f"throughput {report['throughput_qps']:,.1f} q/s < {min_qps:,.1f} q/s")
+    if max_p95_ms and report['latency_ms']['p95'] > max_p95_ms:
+        failures.append(f"p95 latency {report['latency_ms']['p95']:,.1f} ms > {max_p95_ms:,.1f} ms")
+    agreement = report.get('rl_agreement')
+    if agreement and agreement['agreement'] < min_rl_agreement:
+        first = agreement['disagreements'][0]
+        failures.append(f"RL snapshot agrees with the optimizer on {agreement['agreement']:.1%} of queries "
+                        f"< {min_rl_agreement:.1%}, e.g. {json.dumps(first, ensure_ascii=False)}")
+    return failures
+
+
+def print_report(report: Dict) -> None:
+    latency = report['latency_ms']
+    mode = f"{report['workers']} worker processes" if report['workers'] else "in-process"
+    print(f"Router load benchmark ({report['requests']} requests, concurrency {report['concurrency']}, {mode})")
+    print(f"  throughput:     {report['throughput_qps']:,.1f} q/s over {report['elapsed_seconds']:.2f}s")
+    print(f"  latency (ms):   mean {latency['mean']:.1f}  p50 {latency['p50']:.1f}  p95 {latency['p95']:.1f}"
+          f"  p99 {latency['p99']:.1f}  max {latency['max']:.1f}")
+    print(f"  failures:       {report['failures']} ({report['shed']} shed by bulkheads)"
+          f"   answer cache hits: {report['cached']}")
+    if 'rl_recorded' in report:
+        print(f"  RL recorded:    {report['rl_recorded']} interactions")
+    if report.get('rl_agreement'):
+        agreement = report['rl_agreement']
+        print(f"  RL agreement:   {agreement['agreement']:.1%} of {agreement['queries']} queries "
+              f"(snapshot v{agreement['snapshot_version']} vs optimizer)")
+    if 'pool' in report:
+        print(f"  worker pool:    {report['pool']['completed']} completed, {report['pool']['crashes']} crashes,"
+              f" {report['pool']['restarts']} restarts")
+    print(f"  answers digest: {report['answers_digest']}")
+    if 'stages' in report:
+        print("  stage means (ms):")
+        for stage, summary in report['stages'].items():
+            print(f"    {stage:<28} {summary['mean_ms']:10.2f}  ({summary['count']} samples)")
+    print("  selected agents:")
+    for agent, count in report['agents'].items():
+        print(f"    {agent:<28} {count:10d}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--llm-latency', default='lognormal:0.05:0.3', help='time to first token distribution')
+    parser.add_argument('--tokens-per-second', type=float, default=400.0)
+    parser.add_argument('--rag-latency', default='uniform:0.01:0.03')
+    parser.add_argument('--rl-latency', default='0')
+    parser.add_argument('--answers', default=DEFAULT_ANSWERS, help='canned answers JSON ("" for none)')
+    parser.add_argument('--seed', default='0')
+    parser.add_argument('--workers', type=int, default=0, help='serve through N router processes (0: in-process)')
+    parser.add_argument('--answer-cache', action='store_true', help='keep the persistent answer cache on')
+    parser.add_argument('--rl-inference', choices=('optimizer', 'snapshot'), default='optimizer',
+                        help='AGENT_ROUTER_RL_INFERENCE for the router')
+    parser.add_argument('--max-failures', type=int, default=0, help='failed requests tolerated')
+    parser.add_argument('--min-qps', type=float, default=0.0)
+    parser.add_argument('--max-p95', type=float, default=0.0, help='maximum p95 latency in ms')
+    parser.add_argument('--min-rl-agreement', type=float, default=1.0,
+                        help='minimum share of queries on which snapshot and optimizer pick the same agent')
+    parser.add_argument('--json', action='store_true', help='print the full report as JSON')
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print_report(report)
+
+    failures = check_thresholds(report, args.max_failures, args.min_qps, args.max_p95, args.min_rl_agreement)
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Router load benchmark passed")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
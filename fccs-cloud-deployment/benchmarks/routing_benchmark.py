@@ -0,0 +1,185 @@
+"""
+Routing Benchmark for FCCS Agent Router
+Measures routing accuracy, agent confusion, language detection accuracy and
+routing throughput against a labeled English/Portuguese query corpus.
+
+Usage:
+    python benchmarks/routing_benchmark.py [--corpus PATH] [--min-accuracy 0.85]
+        [--min-language-accuracy 0.95] [--min-qps 2000] [--json]
+
+Exits with status 1 when any metric regresses past its threshold, so it can
+gate CI runs. Needs no API keys and no CrewAI installation.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent_router import AgentRouter  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'routing_corpus.json')
+
+# Baseline guardrails; raise them as the router improves
+DEFAULT_MIN_ACCURACY = 0.85
+DEFAULT_MIN_LANGUAGE_ACCURACY = 0.95
+DEFAULT_MIN_QPS = 2000.0
+
+
+def load_corpus(path: str) -> List[Dict]:
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def evaluate_routing(router: AgentRouter, corpus: List[Dict]) -> Dict:
+    """Rule-routing accuracy and confusion on labeled queries
+
+    _direct_agent_routing() never returns the orchestrator (it is the default
+    of analyze_intent()), so orchestrator-labeled queries are scored by
+    whether analyze_intent() keeps them on the orchestrator instead.
+    """
+    confusion: Dict[str, Counter] = defaultdict(Counter)
+    per_agent = defaultdict(lambda: {'total': 0, 'correct': 0})
+    correct = total = 0
+    orchestrator_total = orchestrator_kept = 0
+    misrouted = []
+
+    for item in corpus:
+        query, expected = item['query'], item['agent']
+        if expected == 'orchestrator':
+            orchestrator_total += 1
+            predicted, _ = router.analyze_intent(query)
+            orchestrator_kept += predicted == 'orchestrator'
+        else:
+            predicted, _ = router._direct_agent_routing(query.lower())
+        confusion[expected][predicted] += 1
+        per_agent[expected]['total'] += 1
+        total += 1
+        if predicted == expected:
+            correct += 1
+            per_agent[expected]['correct'] += 1
+        else:
+            misrouted.append({'query': query, 'expected': expected, 'predicted': predicted})
+
+    return {
+        'accuracy': correct / total if total else 0.0,
+        'per_agent_accuracy': {
+            agent: counts['correct'] / counts['total'] for agent, counts in sorted(per_agent.items())
+        },
+        'orchestrator_kept_rate': orchestrator_kept / orchestrator_total if orchestrator_total else None,
+        'confusion': {expected: dict(predicted) for expected, predicted in sorted(confusion.items())},
+        'misrouted': misrouted
+    }
+
+
+def evaluate_language(router: AgentRouter, corpus: List[Dict]) -> Dict:
+    """detect_language() accuracy against the corpus language labels"""
+    wrong = [item['query'] for item in corpus if router.detect_language(item['query']) != item['language']]
+    return {
+        'accuracy': 1 - len(wrong) / len(corpus) if corpus else 0.0,
+        'wrong': wrong
+    }
+
+
+def measure_throughput(router: AgentRouter, corpus: List[Dict], min_seconds: float = 1.0) -> Dict:
+    """Queries/second for each routing step and for the full routing decision"""
+    queries = [item['query'] for item in corpus]
+    steps = {
+        'analyze_intent': lambda q: router.analyze_intent(q),
+        'direct_agent_routing': lambda q: router._direct_agent_routing(q.lower()),
+        'calculate_agent_confidence': lambda q: [router._calculate_agent_confidence(q, name) for name in router.agents],
+        'detect_language': lambda q: router.detect_language(q),
+        'route_decision': lambda q: router._select_agent(q, {})
+    }
+    results = {}
+    for name, step in steps.items():
+        count = 0
+        started = time.perf_counter()
+        elapsed = 0.0
+        while elapsed < min_seconds:
+            for query in queries:
+                step(query)
+            count += len(queries)
+            elapsed = time.perf_counter() - started
+        results[name] = count / elapsed
+    return results
+
+
+def run(corpus_path: str = DEFAULT_CORPUS, min_seconds: float = 1.0) -> Dict:
+    corpus = load_corpus(corpus_path)
+    router = AgentRouter.routing_only()
+    labeled_agents = {item['agent'] for item in corpus}
+    return {
+        'corpus_size': len(corpus),
+        'uncovered_agents': sorted(set(router.routing_rules) - labeled_agents),
+        'routing': evaluate_routing(router, corpus),
+        'language': evaluate_language(router, corpus),
+        'throughput_qps': measure_throughput(router, corpus, min_seconds)
+    }
+
+
+def check_thresholds(report: Dict, min_accuracy: float, min_language_accuracy: float, min_qps: float) -> List[str]:
+    failures = []
+    if report['routing']['accuracy'] < min_accuracy:
+        failures.append(f"routing accuracy {report['routing']['accuracy']:.1%} < {min_accuracy:.1%}")
+    if report['language']['accuracy'] < min_language_accuracy:
+        failures.append(f"language accuracy {report['language']['accuracy']:.1%} < {min_language_accuracy:.1%}")
+    qps = report['throughput_qps']['route_decision']
+    if qps < min_qps:
+        failures.append(f"route_decision throughput {qps:,.0f} q/s < {min_qps:,.0f} q/s")
+    if report['uncovered_agents']:
+        failures.append(f"corpus has no queries for: {', '.join(report['uncovered_agents'])}")
+    return failures
+
+
+def print_report(report: Dict) -> None:
+    routing = report['routing']
+    print(f"Routing benchmark ({report['corpus_size']} queries)")
+    print(f"  routing accuracy:   {routing['accuracy']:.1%}")
+    if routing['orchestrator_kept_rate'] is not None:
+        print(f"  orchestrator kept:  {routing['orchestrator_kept_rate']:.1%}")
+    print(f"  language accuracy:  {report['language']['accuracy']:.1%}")
+    print("  per-agent accuracy:")
+    for agent, accuracy in routing['per_agent_accuracy'].items():
+        confused = {k: v for k, v in routing['confusion'][agent].items() if k != agent}
+        note = f"  confused with {confused}" if confused else ""
+        print(f"    {agent:<32} {accuracy:6.1%}{note}")
+    print("  throughput (queries/s):")
+    for step, qps in report['throughput_qps'].items():
+        print(f"    {step:<32} {qps:12,.0f}")
+    if report['language']['wrong']:
+        print("  language misdetections:")
+        for query in report['language']['wrong']:
+            print(f"    {query}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS)
+    parser.add_argument('--min-accuracy', type=float, default=DEFAULT_MIN_ACCURACY)
+    parser.add_argument('--min-language-accuracy', type=float, default=DEFAULT_MIN_LANGUAGE_ACCURACY)
+    parser.add_argument('--min-qps', type=float, default=DEFAULT_MIN_QPS)
+    parser.add_argument('--seconds', type=float, default=1.0, help='minimum timing window per step')
+    parser.add_argument('--json', action='store_true', help='print the full report as JSON')
+    args = parser.parse_args(argv)
+
+    report = run(args.corpus, args.seconds)
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print_report(report)
+
+    failures = check_thresholds(report, args.min_accuracy, args.min_language_accuracy, args.min_qps)
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Routing benchmark passed")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
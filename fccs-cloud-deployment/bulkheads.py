@@ -0,0 +1,287 @@
+"""
+Agent Bulkheads for FCCS AI System
+Per-agent concurrency limits with bounded FIFO queues, so a burst on one slow agent cannot take
+execution capacity from the others; requests over a limit are shed at once with a retry hint
+"""
+import asyncio
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Deque, Dict, Iterator, Optional
+
+from routing_metrics import LatencyHistogram
+
+# Queue waits are short when the pools are sized right; long ones mean the agent is overloaded
+QUEUE_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LIMIT_SETTINGS = ('max_concurrent', 'max_queue', 'queue_timeout')
+# Floor for an agent's default share of the router-wide concurrency limit
+MIN_DEFAULT_CONCURRENT = 4
+
+
+class BulkheadFull(Exception):
+    """Raised when an agent's pool cannot take a request: its queue is full or the wait timed out"""
+
+    def __init__(self, agent_name: str, reason: str, retry_after: int):
+        self.agent_name = agent_name
+        self.reason = reason
+        self.retry_after = retry_after
+        detail = "queue is full" if reason == 'queue_full' else "queue wait timed out"
+        super().__init__(f"{agent_name} is overloaded ({detail}); retry in {retry_after}s")
+
+
+class _Waiter:
+    """A queued request; `granted` is set under the bulkhead lock when a slot is handed to it"""
+    __slots__ = ('event', 'loop', 'future', 'granted')
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.loop = loop
+        self.future = loop.create_future() if loop is not None else None
+        self.event = threading.Event() if loop is None else None
+        self.granted = False
+
+    def wake(self) -> bool:
+        if self.loop is None:
+            self.event.set()
+            return True
+        try:
+            self.loop.call_soon_threadsafe(self._resolve)
+        except RuntimeError:
+            # The waiter's event loop is closed; nobody is left to take the slot
+            return False
+        return True
+
+    def _resolve(self) -> None:
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class Bulkhead:
+    """At most `max_concurrent` executions of one agent, `max_queue` more waiting in FIFO order
+
+    A freed slot is handed straight to the oldest waiter, so queued requests
+    cannot be overtaken by new arrivals. Threads and event loops share the
+    same slots. The retry hint assumes the queue drains at the recent mean
+    execution time per slot.
+    """
+
+    def __init__(self, name: str, max_concurrent: int = 8, max_queue: int = 16, queue_timeout: float = 10.0):
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: Deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+        self._mean_service: Optional[float] = None
+        self._queue_wait = LatencyHistogram(QUEUE_WAIT_BUCKETS)
+        self._stats = {'admitted': 0, 'queued': 0, 'completed': 0, 'shed_queue_full': 0, 'shed_timeout': 0,
+                       'max_active': 0, 'max_queued': 0}
+
+    def acquire(self, timeout: Optional[float] = None) -> float:
+        """Take a slot, waiting at most min(timeout, queue_timeout); returns the seconds spent queued"""
+        started = time.monotonic()
+        with self._lock:
+            if self._admit_now():
+                return 0.0
+            waiter = self._enqueue(None)
+        if waiter.event.wait(self._wait_limit(timeout)):
+            return self._admitted_after(started)
+        with self._lock:
+            if not waiter.granted:
+                self._waiters.remove(waiter)
+                raise self._shed('timeout')
+        return self._admitted_after(started)
+
+    async def aacquire(self, timeout: Optional[float] = None) -> float:
+        """Async acquire(); a cancelled waiter leaves the queue (or passes on a slot it was just given)"""
+        started = time.monotonic()
+        with self._lock:
+            if self._admit_now():
+                return 0.0
+            waiter = self._enqueue(asyncio.get_running_loop())
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self._wait_limit(timeout))
+        except asyncio.TimeoutError:
+            with self._lock:
+                if not waiter.granted:
+                    self._waiters.remove(waiter)
+                    raise self._shed('timeout') from None
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter.granted:
+                    self._hand_off()
+                else:
+                    self._waiters.remove(waiter)
+            raise
+        return self._admitted_after(started)
+
+    def release(self, service_time: Optional[float] = None) -> None:
+        """Free a slot; service_time (seconds the slot was held) feeds the retry hint"""
+        with self._lock:
+            self._stats['completed'] += 1
+            if service_time is not None:
+                self._mean_service = service_time if self._mean_service is None else \
+                    0.8 * self._mean_service + 0.2 * service_time
+            self._hand_off()
+
+    @contextmanager
+    def slot(self, timeout: Optional[float] = None) -> Iterator[float]:
+        """Hold a slot for the block; yields the seconds spent queued"""
+        waited = self.acquire(timeout)
+        started = time.monotonic()
+        try:
+            yield waited
+        finally:
+            self.release(time.monotonic() - started)
+
+    @asynccontextmanager
+    async def aslot(self, timeout: Optional[float] = None) -> AsyncIterator[float]:
+        waited = await self.aacquire(timeout)
+        started = time.monotonic()
+        try:
+            yield waited
+        finally:
+            self.release(time.monotonic() - started)
+
+    def _admit_now(self) -> bool:
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self._stats['admitted'] += 1
+            self._stats['max_active'] = max(self._stats['max_active'], self.active)
+            self._queue_wait.observe(0.0)
+            return True
+        return False
+
+    def _enqueue(self, loop: Optional[asyncio.AbstractEventLoop]) -> _Waiter:
+        if len(self._waiters) >= self.max_queue:
+            raise self._shed('queue_full')
+        waiter = _Waiter(loop)
+        self._waiters.append(waiter)
+        self._stats['queued'] += 1
+        self._stats['max_queued'] = max(self._stats['max_queued'], len(self._waiters))
+        return waiter
+
+    def _wait_limit(self, timeout: Optional[float]) -> float:
+        return max(0.0, self.queue_timeout if timeout is None else min(timeout, self.queue_timeout))
+
+    def _admitted_after(self, started: float) -> float:
+        waited = time.monotonic() - started
+        with self._lock:
+            self._stats['admitted'] += 1
+            self._queue_wait.observe(waited)
+        return waited
+
+    def _hand_off(self) -> None:
+        # Called with the lock held: the slot passes to the oldest live waiter, else it is freed
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+            if waiter.wake():
+                return
+        self.active -= 1
+
+    def _shed(self, reason: str) -> BulkheadFull:
+        self._stats['shed_queue_full' if reason == 'queue_full' else 'shed_timeout'] += 1
+        return BulkheadFull(self.name, reason, self._retry_after())
+
+    def _retry_after(self) -> int:
+        # Time for the slots to work through everything queued now, in whole seconds (HTTP Retry-After)
+        mean_service = self._mean_service if self._mean_service is not None else 1.0
+        rounds = (len(self._waiters) + 1) / self.max_concurrent
+        return max(1, math.ceil(mean_service * rounds))
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['active'] = self.active
+            stats['waiting'] = len(self._waiters)
+            wait = self._queue_wait.snapshot()
+            mean_service = self._mean_service
+        stats.update(max_concurrent=self.max_concurrent, max_queue=self.max_queue, queue_timeout=self.queue_timeout,
+                     mean_service_seconds=mean_service, queue_wait=wait)
+        return stats
+
+
+class AgentBulkheads:
+    """One Bulkhead per agent, created on first use from the defaults and per-agent overrides"""
+
+    def __init__(self, max_concurrent: int = 8, max_queue: int = 16, queue_timeout: float = 10.0,
+                 limits: Optional[Dict[str, Dict]] = None):
+        self.defaults = {'max_concurrent': max_concurrent, 'max_queue': max_queue, 'queue_timeout': queue_timeout}
+        self.limits = dict(limits or {})
+        for agent_name, settings in self.limits.items():
+            unknown = set(settings) - set(LIMIT_SETTINGS)
+            if unknown:
+                raise ValueError(f"unknown bulkhead settings for {agent_name}: {', '.join(sorted(unknown))}")
+        self._lock = threading.Lock()
+        self._bulkheads: Dict[str, Bulkhead] = {}
+
+    @classmethod
+    def from_env(cls, capacity: int = 200, agent_count: int = 1) -> Optional['AgentBulkheads']:
+        """Build from AGENT_BULKHEAD_* settings; None when AGENT_BULKHEADS_ENABLED=0.
+        Each agent defaults to an equal share of the router-wide `capacity`
+        (at least MIN_DEFAULT_CONCURRENT slots) and a queue twice that size.
+        AGENT_BULKHEAD_LIMITS may hold a JSON object of per-agent overrides, e.g.
+        {"orchestrator": {"max_concurrent": 2, "max_queue": 4}}"""
+        if os.getenv('AGENT_BULKHEADS_ENABLED', '1').lower() in ('0', 'false', 'no'):
+            return None
+        share = max(MIN_DEFAULT_CONCURRENT, capacity // max(1, agent_count))
+        max_concurrent = int(os.getenv('AGENT_BULKHEAD_MAX_CONCURRENT', str(share)))
+        return cls(
+            max_concurrent=max_concurrent,
+            max_queue=int(os.getenv('AGENT_BULKHEAD_MAX_QUEUE', str(2 * max_concurrent))),
+            queue_timeout=float(os.getenv('AGENT_BULKHEAD_QUEUE_TIMEOUT_SECONDS', '10')),
+            limits=json.loads(os.getenv('AGENT_BULKHEAD_LIMITS', '{}'))
+        )
+
+    def get(self, agent_name: str) -> Bulkhead:
+        bulkhead = self._bulkheads.get(agent_name)
+        if bulkhead is None:
+            with self._lock:
+                bulkhead = self._bulkheads.get(agent_name)
+                if bulkhead is None:
+                    settings = dict(self.defaults, **self.limits.get(agent_name, {}))
+                    bulkhead = self._bulkheads[agent_name] = Bulkhead(agent_name, **settings)
+        return bulkhead
+
+    def get_stats(self) -> Dict:
+        """Limits, occupancy, shed counts and queue wait summary per agent that has been used"""
+        with self._lock:
+            bulkheads = dict(self._bulkheads)
+        return {
+            'defaults': dict(self.defaults),
+            'agents': {name: bulkhead.get_stats() for name, bulkhead in sorted(bulkheads.items())}
+        }
+
+    def render_prometheus(self, prefix: str = 'fccs_router') -> str:
+        """Queue wait histograms, occupancy gauges and shed counters by agent"""
+        agents = self.get_stats()['agents']
+        lines = [
+            f"# HELP {prefix}_bulkhead_queue_wait_seconds Time requests waited for an agent execution slot",
+            f"# TYPE {prefix}_bulkhead_queue_wait_seconds histogram"
+        ]
+        for agent_name, stats in agents.items():
+            wait = stats['queue_wait']
+            for bound, cumulative in wait['buckets']:
+                le = '+Inf' if bound == float('inf') else f"{bound:g}"
+                lines.append(f'{prefix}_bulkhead_queue_wait_seconds_bucket{{agent="{agent_name}",le="{le}"}} '
+                             f'{cumulative}')
+            lines.append(f'{prefix}_bulkhead_queue_wait_seconds_sum{{agent="{agent_name}"}} {wait["sum"]:.6f}')
+            lines.append(f'{prefix}_bulkhead_queue_wait_seconds_count{{agent="{agent_name}"}} {wait["count"]}')
+        for gauge, key, description in (('active', 'active', 'Agent executions holding a slot'),
+                                         ('waiting', 'waiting', 'Requests queued for an agent slot')):
+            lines.append(f"# HELP {prefix}_bulkhead_{gauge} {description}")
+            lines.append(f"# TYPE {prefix}_bulkhead_{gauge} gauge")
+            for agent_name, stats in agents.items():
+                lines.append(f'{prefix}_bulkhead_{gauge}{{agent="{agent_name}"}} {stats[key]}')
+        lines.append(f"# HELP {prefix}_bulkhead_shed_total Requests shed by agent and reason")
+        lines.append(f"# TYPE {prefix}_bulkhead_shed_total counter")
+        for agent_name, stats in agents.items():
+            for reason in ('queue_full', 'timeout'):
+                lines.append(f'{prefix}_bulkhead_shed_total{{agent="{agent_name}",reason="{reason}"}} '
+                             f'{stats["shed_" + reason]}')
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,155 @@
+"""
+RAG Context Packer for FCCS AI System
+Deduplicates, ranks and truncates retrieved passages to a per-agent token budget
+"""
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from rag_cache import normalize_query
+
+# Rough token estimate (~4 characters per token for English/Portuguese prose);
+# good enough for budgeting without pulling in a tokenizer dependency
+CHARS_PER_TOKEN = 4
+
+# Agents whose prompts do not use RAG context get a zero budget
+DEFAULT_TOKEN_BUDGETS = {
+    'fccs_expert': 1200,
+    'groovy_validator': 1000,
+    'smartview_designer': 1000,
+    'pdf_converter': 1500,
+    'consolidation_validator': 1500,
+    'document_intelligence': 2500,
+    'sox_compliance': 1500,
+    'orchestrator': 0
+}
+
+_STOPWORDS = {
+    'the', 'a', 'an', 'and', 'or', 'of', 'to', 'in', 'on', 'for', 'is', 'are', 'what', 'how',
+    'do', 'i', 'my', 'it', 'with', 'by', 'at', 'be', 'can', 'o', 'os', 'as', 'de', 'da',
+    'em', 'um', 'uma', 'e', 'que', 'para', 'com', 'como', 'no', 'na'
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of LLM tokens in a piece of text"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _shingles(words: List[str], size: int = 3) -> Set[Tuple[str, ...]]:
+    if len(words) < size:
+        return {tuple(words)}
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class ContextPacker:
+    """Pack retrieved RAG passages into a bounded prompt section"""
+
+    def __init__(self, budgets: Optional[Dict[str, int]] = None, default_budget: int = 1200,
+                 similarity_threshold: float = 0.8):
+        self.budgets = dict(DEFAULT_TOKEN_BUDGETS)
+        self.budgets.update(budgets or {})
+        self.default_budget = default_budget
+        self.similarity_threshold = similarity_threshold
+        self._lock = threading.Lock()
+        self._totals = {'requests': 0, 'input_tokens': 0, 'packed_tokens': 0, 'tokens_saved': 0,
+                        'duplicates_removed': 0, 'passages_dropped': 0}
+
+    @classmethod
+    def from_env(cls) -> 'ContextPacker':
+        """Build a packer; RAG_CONTEXT_BUDGETS may hold a JSON object of per-agent budgets"""
+        budgets = json.loads(os.getenv('RAG_CONTEXT_BUDGETS', '{}'))
+        return cls(budgets=budgets, default_budget=int(os.getenv('RAG_CONTEXT_DEFAULT_BUDGET', '1200')))
+
+    def budget_for(self, agent_name: str) -> int:
+        return self.budgets.get(agent_name, self.default_budget)
+
+    def pack(self, query: str, rag_context: List[str], agent_name: str,
+             budget: Optional[int] = None) -> Tuple[List[str], Dict]:
+        """Return the packed passages and a report of what was removed; budget overrides the agent's"""
+        if budget is None:
+            budget = self.budget_for(agent_name)
+        input_tokens = sum(estimate_tokens(item) for item in rag_context)
+
+        unique, duplicates = self._deduplicate(rag_context)
+        ranked = self._rank(query, unique)
+
+        packed = []
+        used = 0
+        truncated = False
+        for passage in ranked:
+            cost = estimate_tokens(passage)
+            if used + cost <= budget:
+                packed.append(passage)
+                used += cost
+                continue
+            remaining = budget - used
+            # Keep a truncated head of the next passage if a useful amount fits
+            if remaining >= 50 and not truncated:
+                head = passage[:remaining * CHARS_PER_TOKEN - 1].rsplit(' ', 1)[0] + '…'
+                packed.append(head)
+                used += estimate_tokens(head)
+                truncated = True
+            break
+
+        report = {
+            'budget': budget,
+            'input_passages': len(rag_context),
+            'packed_passages': len(packed),
+            'duplicates_removed': duplicates,
+            'passages_dropped': len(ranked) - len(packed),
+            'truncated': truncated,
+            'input_tokens': input_tokens,
+            'packed_tokens': used,
+            'tokens_saved': input_tokens - used
+        }
+        with self._lock:
+            self._totals['requests'] += 1
+            for key in ('input_tokens', 'packed_tokens', 'tokens_saved', 'duplicates_removed', 'passages_dropped'):
+                self._totals[key] += report[key]
+        return packed, report
+
+    def _deduplicate(self, passages: List[str]) -> Tuple[List[str], int]:
+        """Drop passages that are exact or near-identical (shingle Jaccard) copies of earlier ones"""
+        kept: List[str] = []
+        kept_shingles: List[Set[Tuple[str, ...]]] = []
+        duplicates = 0
+        for passage in passages:
+            words = normalize_query(passage).split()
+            if not words:
+                duplicates += 1
+                continue
+            shingles = _shingles(words)
+            is_duplicate = False
+            for other in kept_shingles:
+                overlap = len(shingles & other) / len(shingles | other)
+                if overlap >= self.similarity_threshold:
+                    is_duplicate = True
+                    break
+            if is_duplicate:
+                duplicates += 1
+                continue
+            kept.append(passage)
+            kept_shingles.append(shingles)
+        return kept, duplicates
+
+    def _rank(self, query: str, passages: List[str]) -> List[str]:
+        """Order passages by query-term coverage, keeping retriever order for ties"""
+        terms = {word for word in normalize_query(query).split() if word not in _STOPWORDS}
+        if not terms:
+            return passages
+
+        def coverage(indexed: Tuple[int, str]) -> Tuple[float, int]:
+            index, passage = indexed
+            words = set(normalize_query(passage).split())
+            return -len(terms & words) / len(terms), index
+
+        return [passage for _, passage in sorted(enumerate(passages), key=coverage)]
+
+    def get_stats(self) -> Dict:
+        """Cumulative packing totals, including tokens saved across requests"""
+        with self._lock:
+            stats = dict(self._totals)
+        stats['avg_tokens_saved'] = stats['tokens_saved'] / stats['requests'] if stats['requests'] else 0.0
+        return stats
@@ -0,0 +1,100 @@
+"""
+Request Deadlines for FCCS AI System
+Splits a per-request time budget across routing stages and records graceful degradations
+"""
+import os
+import time
+from typing import Dict, List, Optional
+
+# Degradations reported in results when the budget runs short
+SKIPPED_RL = 'skipped_rl'
+SKIPPED_RAG = 'skipped_rag'
+CACHED_ANSWER = 'cached_answer'
+PARTIAL_RESPONSE = 'partial_response'
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a stage cannot produce anything within its share of the budget"""
+
+
+class RequestDeadline:
+    """Time budget of one request; an unbounded deadline (seconds=None) never expires"""
+
+    def __init__(self, seconds: Optional[float], policy: 'DeadlinePolicy'):
+        self.seconds = seconds
+        self.policy = policy
+        self.started = time.monotonic()
+        self.degradations: List[str] = []
+
+    @property
+    def bounded(self) -> bool:
+        return self.seconds is not None
+
+    def remaining(self) -> float:
+        if self.seconds is None:
+            return float('inf')
+        return max(0.0, self.started + self.seconds - time.monotonic())
+
+    def retrieval_timeout(self) -> Optional[float]:
+        """How long to block on RAG retrieval: a share of what is left, leaving room to execute"""
+        if self.seconds is None:
+            return None
+        remaining = self.remaining()
+        execution_floor = self.policy.min_execution_seconds + self.policy.reserve_seconds
+        return max(0.0, min(remaining * self.policy.retrieval_share, remaining - execution_floor))
+
+    def execution_budget(self) -> Optional[float]:
+        """Seconds the LLM/crew may run, keeping a reserve for formatting and bookkeeping"""
+        if self.seconds is None:
+            return None
+        return max(0.0, self.remaining() - self.policy.reserve_seconds)
+
+    def can_execute(self) -> bool:
+        """Whether enough budget is left to start the LLM at all"""
+        return self.seconds is None or self.remaining() >= self.policy.min_execution_seconds
+
+    def allows_rl(self) -> bool:
+        """RL scoring is optional; skip it once the budget is tight"""
+        return self.seconds is None or self.remaining() >= self.policy.min_rl_seconds
+
+    def degrade(self, degradation: str) -> None:
+        if degradation not in self.degradations:
+            self.degradations.append(degradation)
+
+    def report(self) -> Optional[Dict]:
+        if self.seconds is None and not self.degradations:
+            return None
+        return {
+            'budget': self.seconds,
+            'remaining': None if self.seconds is None else round(self.remaining(), 4),
+            'degradations': list(self.degradations)
+        }
+
+
+class DeadlinePolicy:
+    """How a request deadline is divided between retrieval, RL scoring and execution"""
+
+    def __init__(self, default_seconds: Optional[float] = None, retrieval_share: float = 0.3,
+                 min_execution_seconds: float = 1.0, reserve_seconds: float = 0.05, min_rl_seconds: float = 2.0):
+        self.default_seconds = default_seconds
+        self.retrieval_share = retrieval_share
+        self.min_execution_seconds = min_execution_seconds
+        self.reserve_seconds = reserve_seconds
+        self.min_rl_seconds = min_rl_seconds
+
+    @classmethod
+    def from_env(cls) -> 'DeadlinePolicy':
+        """Build a policy from AGENT_ROUTER_DEADLINE_* settings; no default deadline unless
+        AGENT_ROUTER_DEADLINE_SECONDS is set"""
+        default = os.getenv('AGENT_ROUTER_DEADLINE_SECONDS')
+        return cls(
+            default_seconds=float(default) if default else None,
+            retrieval_share=float(os.getenv('AGENT_ROUTER_DEADLINE_RETRIEVAL_SHARE', '0.3')),
+            min_execution_seconds=float(os.getenv('AGENT_ROUTER_DEADLINE_MIN_EXECUTION_SECONDS', '1.0')),
+            reserve_seconds=float(os.getenv('AGENT_ROUTER_DEADLINE_RESERVE_SECONDS', '0.05')),
+            min_rl_seconds=float(os.getenv('AGENT_ROUTER_DEADLINE_MIN_RL_SECONDS', '2.0'))
+        )
+
+    def start(self, seconds: Optional[float] = None) -> RequestDeadline:
+        """Start the clock for a request; seconds=None falls back to the default deadline"""
+        return RequestDeadline(self.default_seconds if seconds is None else seconds, self)
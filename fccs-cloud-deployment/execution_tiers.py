@@ -0,0 +1,119 @@
+"""
+Execution Tiers for FCCS AI System
+Maps query complexity (simple/moderate/complex) to an execution profile: model, token limit,
+retrieval depth, context budget and answer cache policy
+"""
+import json
+import logging
+import os
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIERS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'configs', 'execution_tiers.json')
+COMPLEXITY_LEVELS = ('simple', 'moderate', 'complex')
+
+
+class ExecutionProfile:
+    """How to run one request
+
+    Unset LLM settings (None) keep the shared client's values, so a profile
+    with no LLM overrides runs on the default agents. rag_passages=None keeps
+    every retrieved passage and 0 skips retrieval altogether.
+    """
+
+    def __init__(self, name: str, model: Optional[str] = None, max_tokens: Optional[int] = None,
+                 temperature: Optional[float] = None, rag_passages: Optional[int] = None,
+                 context_budget_scale: float = 1.0, cache_max_age_seconds: Optional[float] = None,
+                 use_answer_cache: bool = True):
+        self.name = name
+        self.model = model
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.rag_passages = rag_passages
+        self.context_budget_scale = context_budget_scale
+        self.cache_max_age_seconds = cache_max_age_seconds
+        self.use_answer_cache = use_answer_cache
+
+    @classmethod
+    def from_dict(cls, name: str, settings: Dict) -> 'ExecutionProfile':
+        unknown = set(settings) - {'model', 'max_tokens', 'temperature', 'rag_passages', 'context_budget_scale',
+                                   'cache_max_age_seconds', 'use_answer_cache'}
+        if unknown:
+            raise ValueError(f"unknown settings for execution tier {name}: {', '.join(sorted(unknown))}")
+        return cls(name, **settings)
+
+    @property
+    def llm_settings(self) -> Dict:
+        """LLM parameters this profile overrides"""
+        settings = {'model': self.model, 'max_tokens': self.max_tokens, 'temperature': self.temperature}
+        return {key: value for key, value in settings.items() if value is not None}
+
+    @property
+    def retrieves(self) -> bool:
+        return self.rag_passages != 0
+
+    def limit_context(self, rag_context: List[str]) -> List[str]:
+        """Keep the retriever's top rag_passages passages"""
+        if self.rag_passages is None:
+            return rag_context
+        return rag_context[:self.rag_passages]
+
+    def to_dict(self) -> Dict:
+        return {
+            'name': self.name,
+            **self.llm_settings,
+            'rag_passages': self.rag_passages,
+            'context_budget_scale': self.context_budget_scale,
+            'cache_max_age_seconds': self.cache_max_age_seconds,
+            'use_answer_cache': self.use_answer_cache
+        }
+
+
+DEFAULT_PROFILE = ExecutionProfile('default')
+
+
+class ExecutionTierPolicy:
+    """Select an ExecutionProfile from the assessed query complexity"""
+
+    def __init__(self, profiles: Optional[Dict[str, ExecutionProfile]] = None,
+                 selection: Optional[Dict[str, str]] = None, forced_tier: Optional[str] = None):
+        self.profiles = dict(profiles or {})
+        self.selection = dict(selection or {})
+        for complexity, tier in self.selection.items():
+            if tier not in self.profiles:
+                raise ValueError(f"complexity '{complexity}' maps to unknown execution tier '{tier}'")
+        if forced_tier is not None and forced_tier not in self.profiles:
+            raise ValueError(f"unknown execution tier '{forced_tier}'")
+        self.forced_tier = forced_tier
+
+    @classmethod
+    def from_file(cls, path: str, forced_tier: Optional[str] = None) -> 'ExecutionTierPolicy':
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+        profiles = {name: ExecutionProfile.from_dict(name, settings) for name, settings in config['tiers'].items()}
+        return cls(profiles, config.get('selection', {}), forced_tier)
+
+    @classmethod
+    def from_env(cls) -> 'ExecutionTierPolicy':
+        """Load tiers from EXECUTION_TIERS_PATH; EXECUTION_TIERS_ENABLED=0 runs every query on the
+        default profile and EXECUTION_TIER forces one tier for every query"""
+        if os.getenv('EXECUTION_TIERS_ENABLED', '1').lower() in ('0', 'false', 'no'):
+            return cls()
+        path = os.getenv('EXECUTION_TIERS_PATH', DEFAULT_TIERS_PATH)
+        try:
+            return cls.from_file(path, os.getenv('EXECUTION_TIER') or None)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"⚠️ Execution tiers disabled, could not load {path}: {e}")
+            return cls()
+
+    def select(self, complexity: str) -> ExecutionProfile:
+        tier = self.forced_tier or self.selection.get(complexity)
+        return self.profiles.get(tier, DEFAULT_PROFILE)
+
+    def get_info(self) -> Dict:
+        return {
+            'selection': dict(self.selection),
+            'forced_tier': self.forced_tier,
+            'tiers': {name: profile.to_dict() for name, profile in self.profiles.items()}
+        }
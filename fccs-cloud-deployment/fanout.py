@@ -0,0 +1,111 @@
+"""
+Multi-Agent Fan-out for FCCS AI System
+Decides when a query should run on several agents at once and merges their answers deterministically
+"""
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from rag_cache import normalize_query
+
+SECTION_TITLES = {
+    'en': {
+        'fccs_expert': 'FCCS Configuration',
+        'groovy_validator': 'Groovy Rules',
+        'smartview_designer': 'Smart View Reporting',
+        'pdf_converter': 'Document Extraction',
+        'consolidation_validator': 'Consolidation Validation',
+        'document_intelligence': 'Company Documents',
+        'sox_compliance': 'SOX Compliance',
+        'orchestrator': 'Workflow Coordination'
+    },
+    'pt': {
+        'fccs_expert': 'Configuração FCCS',
+        'groovy_validator': 'Regras Groovy',
+        'smartview_designer': 'Relatórios Smart View',
+        'pdf_converter': 'Extração de Documentos',
+        'consolidation_validator': 'Validação da Consolidação',
+        'document_intelligence': 'Documentos da Empresa',
+        'sox_compliance': 'Conformidade SOX',
+        'orchestrator': 'Coordenação do Workflow'
+    }
+}
+
+
+class FanoutPolicy:
+    """Pick the agents to run concurrently when several rule scores are close
+
+    An agent joins the fan-out when its rule confidence is at least min_score
+    and within margin of the best specialist's confidence. The orchestrator
+    never takes part: fan-out replaces it for composite questions.
+    """
+
+    def __init__(self, enabled: bool = False, max_agents: int = 3, margin: float = 0.1,
+                 min_score: float = 0.1, agent_deadline: float = 60.0,
+                 deadlines: Optional[Dict[str, float]] = None):
+        self.enabled = enabled
+        self.max_agents = max_agents
+        self.margin = margin
+        self.min_score = min_score
+        self.agent_deadline = agent_deadline
+        self.deadlines = dict(deadlines or {})
+
+    @classmethod
+    def from_env(cls) -> 'FanoutPolicy':
+        """Build a policy from AGENT_ROUTER_FANOUT_* settings; AGENT_ROUTER_FANOUT_DEADLINES may hold
+        a JSON object of per-agent deadlines in seconds"""
+        return cls(
+            enabled=os.getenv('AGENT_ROUTER_FANOUT', '0').lower() in ('1', 'true', 'yes'),
+            max_agents=int(os.getenv('AGENT_ROUTER_FANOUT_MAX_AGENTS', '3')),
+            margin=float(os.getenv('AGENT_ROUTER_FANOUT_MARGIN', '0.1')),
+            min_score=float(os.getenv('AGENT_ROUTER_FANOUT_MIN_SCORE', '0.1')),
+            agent_deadline=float(os.getenv('AGENT_ROUTER_FANOUT_DEADLINE_SECONDS', '60')),
+            deadlines=json.loads(os.getenv('AGENT_ROUTER_FANOUT_DEADLINES', '{}'))
+        )
+
+    def deadline_for(self, agent_name: str) -> float:
+        return self.deadlines.get(agent_name, self.agent_deadline)
+
+    def candidates(self, confidences: Dict[str, float]) -> List[Tuple[str, float]]:
+        """Agents to fan out to, best first; empty when fewer than two qualify"""
+        ranked = sorted(
+            ((name, score) for name, score in confidences.items()
+             if name != 'orchestrator' and score >= self.min_score),
+            key=lambda item: (-item[1], item[0])
+        )
+        if not ranked:
+            return []
+        best = ranked[0][1]
+        # Small epsilon so scores built from float weights compare as intended
+        selected = [(name, score) for name, score in ranked if best - score <= self.margin + 1e-9]
+        selected = selected[:self.max_agents]
+        return selected if len(selected) > 1 else []
+
+
+def merge_answers(answers: List[Tuple[str, float, str]], language: str = 'en') -> str:
+    """Combine (agent, confidence, answer) triples into one response
+
+    Sections are ordered by confidence (agent name breaks ties) and
+    paragraphs already given by a higher-ranked agent are dropped, so the
+    same inputs always produce the same text. A single answer is returned
+    unchanged.
+    """
+    ordered = sorted(answers, key=lambda item: (-item[1], item[0]))
+    if len(ordered) == 1:
+        return ordered[0][2]
+
+    titles = SECTION_TITLES.get(language, SECTION_TITLES['en'])
+    seen = set()
+    sections = []
+    for agent_name, _, answer in ordered:
+        paragraphs = []
+        for paragraph in str(answer).strip().split('\n\n'):
+            key = normalize_query(paragraph)
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            paragraphs.append(paragraph.strip())
+        if paragraphs:
+            title = titles.get(agent_name, agent_name.replace('_', ' ').title())
+            sections.append(f"## {title}\n\n" + '\n\n'.join(paragraphs))
+    return '\n\n'.join(sections)
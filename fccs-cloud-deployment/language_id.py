@@ -0,0 +1,184 @@
+"""
+Language Identifier for FCCS AI System
+Character n-gram log-probability classifier for English vs Brazilian Portuguese queries
+
+The model is a precomputed table (configs/language_ngrams.json) holding, for
+each character 1-3 gram, the difference log P(gram | pt) - log P(gram | en).
+Classifying a query is one dictionary lookup per n-gram; no substring
+matching of whole words, so "complete" or "parameter" no longer count as
+Portuguese. Rebuild the table from configs/language_training/ with:
+
+    python language_id.py --build
+"""
+import json
+import math
+import os
+import re
+import sys
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_TABLE_PATH = os.path.join(_BASE_DIR, 'configs', 'language_ngrams.json')
+TRAINING_DIR = os.path.join(_BASE_DIR, 'configs', 'language_training')
+LANGUAGES = ('en', 'pt')
+NGRAM_ORDERS = (1, 2, 3)
+
+_NON_LETTERS = re.compile(r"[^\w']+|[\d_]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _NON_LETTERS.sub(' ', text.lower()).split()
+
+
+def word_ngrams(word: str) -> List[str]:
+    """Character 1-3 grams of one word, padded with spaces to mark word boundaries"""
+    padded = f" {word} "
+    return [padded[i:i + n] for n in NGRAM_ORDERS for i in range(len(padded) - n + 1)]
+
+
+def extract_ngrams(text: str) -> List[str]:
+    grams = []
+    for word in tokenize(text):
+        grams.extend(word_ngrams(word))
+    return grams
+
+
+def build_table(samples: Dict[str, str], smoothing: float = 0.5, min_count: int = 1) -> Dict:
+    """Train the log-probability difference table from per-language sample text"""
+    counts = {language: Counter(extract_ngrams(samples[language])) for language in LANGUAGES}
+    vocabulary = {gram for language in LANGUAGES for gram, count in counts[language].items() if count >= min_count}
+    denominators = {
+        language: sum(counts[language].values()) + smoothing * (len(vocabulary) + 1)
+        for language in LANGUAGES
+    }
+
+    def log_prob(language: str, gram: str) -> float:
+        return math.log((counts[language].get(gram, 0) + smoothing) / denominators[language])
+
+    weights = {gram: round(log_prob('pt', gram) - log_prob('en', gram), 4) for gram in sorted(vocabulary)}
+    unseen = math.log(smoothing / denominators['pt']) - math.log(smoothing / denominators['en'])
+    return {
+        'languages': list(LANGUAGES),
+        'orders': list(NGRAM_ORDERS),
+        'unseen_weight': round(unseen, 4),
+        'weights': weights
+    }
+
+
+def load_training_samples(directory: str = TRAINING_DIR) -> Dict[str, str]:
+    samples = {}
+    for language in LANGUAGES:
+        with open(os.path.join(directory, f"{language}.txt"), encoding='utf-8') as f:
+            samples[language] = f.read()
+    return samples
+
+
+class NGramLanguageIdentifier:
+    """Classify text as 'en' or 'pt' with a confidence in [0.5, 1.0]"""
+
+    def __init__(self, table: Dict):
+        self.weights: Dict[str, float] = table['weights']
+        self.unseen_weight: float = table['unseen_weight']
+        self._vector_index: Optional[Dict[str, int]] = None
+        self._vector_weights = None
+        # Query vocabulary is small and repetitive, so per-word scores are memoized
+        self._word_scores: Dict[str, float] = {}
+        self.max_cached_words = 50000
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_TABLE_PATH) -> 'NGramLanguageIdentifier':
+        """Load the precomputed table, training it from the bundled samples if it is missing"""
+        try:
+            with open(path, encoding='utf-8') as f:
+                return cls(json.load(f))
+        except FileNotFoundError:
+            return cls(build_table(load_training_samples()))
+
+    def score(self, text: str) -> float:
+        """Log-likelihood ratio log P(text | pt) - log P(text | en)"""
+        word_scores = self._word_scores
+        total = 0.0
+        for word in tokenize(text):
+            word_score = word_scores.get(word)
+            if word_score is None:
+                word_score = self._score_word(word)
+                if len(word_scores) < self.max_cached_words:
+                    word_scores[word] = word_score
+            total += word_score
+        return total
+
+    def _score_word(self, word: str) -> float:
+        weights = self.weights
+        unseen = self.unseen_weight
+        return sum(weights.get(gram, unseen) for gram in word_ngrams(word))
+
+    def detect(self, text: str) -> Tuple[str, float]:
+        """Return (language, confidence); text without letters defaults to ('en', 0.5)"""
+        return self._decide(self.score(text))
+
+    def detect_batch(self, texts: Iterable[str]) -> List[Tuple[str, float]]:
+        """Classify many texts at once, vectorized with numpy when it is installed"""
+        texts = list(texts)
+        if not NUMPY_AVAILABLE or not texts:
+            return [self.detect(text) for text in texts]
+
+        if self._vector_index is None:
+            self._vector_index = {gram: index for index, gram in enumerate(self.weights)}
+            # Last slot holds the weight for n-grams missing from the table
+            self._vector_weights = np.array(list(self.weights.values()) + [self.unseen_weight])
+        index = self._vector_index
+        unseen_slot = len(index)
+
+        gram_ids = []
+        offsets = [0]
+        for text in texts:
+            gram_ids.extend(index.get(gram, unseen_slot) for gram in extract_ngrams(text))
+            offsets.append(len(gram_ids))
+        scores = np.zeros(len(texts))
+        if gram_ids:
+            cumulative = np.concatenate(([0.0], np.cumsum(self._vector_weights[np.array(gram_ids)])))
+            bounds = np.array(offsets)
+            scores = cumulative[bounds[1:]] - cumulative[bounds[:-1]]
+        return [self._decide(float(score)) for score in scores]
+
+    @staticmethod
+    def _decide(score: float) -> Tuple[str, float]:
+        # Logistic of the log-likelihood ratio is P(pt | text) under equal priors
+        probability_pt = 1.0 / (1.0 + math.exp(-max(-50.0, min(50.0, score))))
+        if probability_pt > 0.5:
+            return 'pt', probability_pt
+        return 'en', 1.0 - probability_pt
+
+
+_identifier: Optional[NGramLanguageIdentifier] = None
+_identifier_lock = threading.Lock()
+
+
+def get_language_identifier() -> NGramLanguageIdentifier:
+    """Shared identifier, loaded on first use"""
+    global _identifier
+    if _identifier is None:
+        with _identifier_lock:
+            if _identifier is None:
+                _identifier = NGramLanguageIdentifier.load()
+    return _identifier
+
+
+if __name__ == '__main__':
+    if '--build' in sys.argv:
+        table = build_table(load_training_samples())
+        with open(DEFAULT_TABLE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(table, f, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+        print(f"✅ Wrote {len(table['weights'])} n-gram weights to {DEFAULT_TABLE_PATH}")
+    else:
+        for text in sys.argv[1:]:
+            print(text, get_language_identifier().detect(text))
@@ -0,0 +1,352 @@
+"""
+Offline Backends for FCCS AI System
+Deterministic stand-ins for the LLM, the RAG backend and the RL optimizer, so the full
+router path can be run, benchmarked and load-tested without API keys
+
+Select them with AGENT_ROUTER_LLM_BACKEND=offline, AGENT_ROUTER_RAG_BACKEND=offline and
+AGENT_ROUTER_RL_BACKEND=offline. Answers depend only on the prompt and the model
+settings, so the same request always returns the same text, and the text names
+the model and token limit that produced it. Simulated latencies are drawn from a
+generator seeded by the prompt and OFFLINE_SEED, so reruns wait the same amounts:
+
+    OFFLINE_LLM_LATENCY            time to first token, e.g. "lognormal:0.4:0.3" (default 0)
+    OFFLINE_LLM_TOKENS_PER_SECOND  generation speed after the first token (default 0 = instant)
+    OFFLINE_LLM_ANSWERS            JSON list of {"match": regex, "answer": text} canned answers
+    OFFLINE_RAG_LATENCY            retrieval latency, e.g. "uniform:0.05:0.2" (default 0)
+    OFFLINE_RAG_CORPUS             JSON list of {"text", "source"} passages to retrieve from
+    OFFLINE_RL_LATENCY             RL recommendation latency (default 0)
+
+Latency specs are "fixed:S" (or just "S"), "uniform:LOW:HIGH", "normal:MEAN:STDDEV"
+and "lognormal:MEDIAN:SIGMA", all in seconds.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from context_packer import CHARS_PER_TOKEN
+
+try:
+    # CrewAI only accepts LLM objects derived from its own base class
+    from crewai.llms.base_llm import BaseLLM as _LLMBase
+except ImportError:
+    _LLMBase = object
+
+_CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'configs')
+DEFAULT_RAG_CORPUS_PATH = os.path.join(_CONFIG_DIR, 'offline_rag_corpus.json')
+
+_VOCABULARY = (
+    'consolidation', 'entity', 'period', 'scenario', 'journal', 'elimination', 'intercompany', 'rule',
+    'member', 'dimension', 'validate', 'review', 'control', 'evidence', 'close', 'task', 'form', 'report'
+)
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def _seeded_rng(*parts: Any) -> random.Random:
+    """A generator seeded from the given values, independent of call order and threads"""
+    digest = hashlib.sha256("|".join(str(part) for part in parts).encode('utf-8')).digest()
+    return random.Random(int.from_bytes(digest[:8], 'big'))
+
+
+class LatencyModel:
+    """A latency distribution in seconds; sample() never returns a negative value"""
+
+    def __init__(self, distribution: str = 'fixed', a: float = 0.0, b: float = 0.0):
+        if distribution not in ('fixed', 'uniform', 'normal', 'lognormal'):
+            raise ValueError(f"unknown latency distribution '{distribution}'")
+        self.distribution = distribution
+        self.a = a
+        self.b = b
+
+    @classmethod
+    def parse(cls, spec: Optional[str]) -> 'LatencyModel':
+        """Parse "fixed:S", "S", "uniform:LOW:HIGH", "normal:MEAN:STDDEV" or "lognormal:MEDIAN:SIGMA\""""
+        if not spec:
+            return cls()
+        parts = spec.split(':')
+        if len(parts) == 1:
+            return cls('fixed', float(parts[0]))
+        return cls(parts[0], *(float(value) for value in parts[1:]))
+
+    @property
+    def is_zero(self) -> bool:
+        return self.distribution == 'fixed' and self.a <= 0
+
+    def sample(self, rng: random.Random) -> float:
+        if self.distribution == 'fixed':
+            value = self.a
+        elif self.distribution == 'uniform':
+            value = rng.uniform(self.a, self.b)
+        elif self.distribution == 'normal':
+            value = rng.gauss(self.a, self.b)
+        else:
+            value = self.a * math.exp(rng.gauss(0.0, self.b))
+        return max(0.0, value)
+
+    def __repr__(self) -> str:
+        return f"LatencyModel({self.distribution}, {self.a:g}, {self.b:g})"
+
+
+class CannedAnswers:
+    """Fixed answers for prompts matching a regex; the first matching rule wins"""
+
+    def __init__(self, rules: Optional[List[Dict]] = None):
+        self.rules: List[Tuple['re.Pattern', str]] = [
+            (re.compile(rule['match'], re.IGNORECASE), rule['answer']) for rule in rules or []
+        ]
+
+    @classmethod
+    def from_file(cls, path: str) -> 'CannedAnswers':
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def find(self, prompt: str) -> Optional[str]:
+        for pattern, answer in self.rules:
+            if pattern.search(prompt):
+                return answer
+        return None
+
+
+_canned_answers: Dict[str, CannedAnswers] = {}
+
+
+def _load_canned_answers(path: Optional[str]) -> CannedAnswers:
+    """Every tier's LLM shares the canned answers, so each file is parsed once"""
+    if not path:
+        return CannedAnswers()
+    if path not in _canned_answers:
+        _canned_answers[path] = CannedAnswers.from_file(path)
+    return _canned_answers[path]
+
+
+class _Message:
+    """Minimal stand-in for a LangChain message chunk"""
+
+    def __init__(self, content: str):
+        self.content = content
+
+
+def _content_text(content: Any) -> str:
+    # Content blocks (e.g. with prompt cache markers) are read as their concatenated text
+    if isinstance(content, list):
+        return "\n\n".join(block.get('text', '') if isinstance(block, dict) else str(block) for block in content)
+    return str(content)
+
+
+def _prompt_text(messages: Any) -> str:
+    if isinstance(messages, str):
+        return messages
+    parts = []
+    for message in messages:
+        if isinstance(message, dict):
+            parts.append(_content_text(message.get('content', '')))
+        elif isinstance(message, (tuple, list)) and len(message) == 2:
+            parts.append(_content_text(message[1]))
+        else:
+            parts.append(_content_text(getattr(message, 'content', message)))
+    return "\n".join(parts)
+
+
+class DeterministicLLM(_LLMBase):
+    """LLM stand-in returning a reproducible answer derived from the prompt hash
+
+    Canned answers take precedence over the generated text. With a latency
+    model and a token rate, call() and stream() take as long as a real model
+    would: the time to first token, then one token per 1/tokens_per_second.
+    """
+
+    def __init__(self, model: str = 'offline-deterministic', temperature: Optional[float] = None,
+                 max_tokens: Optional[int] = None, timeout: Optional[float] = None,
+                 latency: Optional[LatencyModel] = None, tokens_per_second: float = 0.0,
+                 answers: Optional[CannedAnswers] = None, seed: str = '0', **kwargs):
+        if _LLMBase is not object:
+            try:
+                super().__init__(model=model, temperature=temperature)
+            except TypeError:
+                super().__init__()
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens or 800
+        self.timeout = timeout
+        self.latency = latency or LatencyModel()
+        self.tokens_per_second = tokens_per_second
+        self.answers = answers or CannedAnswers()
+        self.seed = seed
+        self.calls = 0
+
+    @classmethod
+    def from_env(cls, **settings) -> 'DeterministicLLM':
+        """Build the stand-in with the OFFLINE_LLM_* latency, token rate and canned answers"""
+        return cls(
+            latency=LatencyModel.parse(os.getenv('OFFLINE_LLM_LATENCY')),
+            tokens_per_second=float(os.getenv('OFFLINE_LLM_TOKENS_PER_SECOND', '0')),
+            answers=_load_canned_answers(os.getenv('OFFLINE_LLM_ANSWERS')),
+            seed=os.getenv('OFFLINE_SEED', '0'),
+            **settings
+        )
+
+    def generate(self, prompt: str) -> str:
+        """The answer for a prompt: a canned answer, or a few words per prompt-hash byte capped at ~max_tokens"""
+        canned = self.answers.find(prompt)
+        if canned is not None:
+            return canned
+        digest = hashlib.sha256(f"{self.model}|{self.temperature}|{prompt}".encode('utf-8')).digest()
+        words = [_VOCABULARY[byte % len(_VOCABULARY)] for byte in digest]
+        word_budget = max(1, int(self.max_tokens * 0.75))
+        body = " ".join(words)[:word_budget * 8]
+        return f"[{self.model} max_tokens={self.max_tokens}] {body}"
+
+    def call(self, messages: Any, tools: Optional[List[Dict]] = None, callbacks: Optional[List[Any]] = None,
+             available_functions: Optional[Dict[str, Any]] = None, **kwargs) -> str:
+        prompt = _prompt_text(messages)
+        self.calls += 1
+        answer = self.generate(prompt)
+        time.sleep(self._first_token_delay(prompt) + self._generation_time(answer))
+        return answer
+
+    def invoke(self, messages: Any, **kwargs) -> _Message:
+        return _Message(self.call(messages))
+
+    def stream(self, messages: Any, **kwargs) -> Iterator[_Message]:
+        prompt = _prompt_text(messages)
+        self.calls += 1
+        answer = self.generate(prompt)
+        time.sleep(self._first_token_delay(prompt))
+        for start in range(0, len(answer), 16):
+            chunk = answer[start:start + 16]
+            if start:
+                time.sleep(self._generation_time(chunk))
+            yield _Message(chunk)
+
+    def _first_token_delay(self, prompt: str) -> float:
+        if self.latency.is_zero:
+            return 0.0
+        return self.latency.sample(_seeded_rng(self.seed, self.model, prompt))
+
+    def _generation_time(self, text: str) -> float:
+        if self.tokens_per_second <= 0:
+            return 0.0
+        return len(text) / CHARS_PER_TOKEN / self.tokens_per_second
+
+    def supports_function_calling(self) -> bool:
+        return False
+
+    def supports_stop_words(self) -> bool:
+        return False
+
+    def get_context_window_size(self) -> int:
+        return 200000
+
+
+class OfflineRAGSystem:
+    """RAG stand-in ranking a local passage corpus by word overlap with the query
+
+    Implements the RAG system interface (retrieve_relevant_context with
+    prioritize_uploads, and the async variant). Passages whose source is
+    'upload' rank first when uploads are prioritized.
+    """
+
+    def __init__(self, openai_api_key: Optional[str] = None, corpus: Optional[List[Dict]] = None,
+                 latency: Optional[LatencyModel] = None, top_k: int = 5, seed: Optional[str] = None):
+        if corpus is None:
+            with open(os.getenv('OFFLINE_RAG_CORPUS', DEFAULT_RAG_CORPUS_PATH), encoding='utf-8') as f:
+                corpus = json.load(f)
+        if latency is None:
+            latency = LatencyModel.parse(os.getenv('OFFLINE_RAG_LATENCY'))
+        self.passages = [(item['text'], item.get('source', 'kb'), set(_WORD.findall(item['text'].lower())))
+                         for item in corpus]
+        self.latency = latency
+        self.top_k = top_k
+        self.seed = seed if seed is not None else os.getenv('OFFLINE_SEED', '0')
+        self.calls = 0
+
+    def retrieve_relevant_context(self, query: str, prioritize_uploads: bool = False) -> List[str]:
+        self.calls += 1
+        time.sleep(self._delay(query, prioritize_uploads))
+        return self._rank(query, prioritize_uploads)
+
+    async def aretrieve_relevant_context(self, query: str, prioritize_uploads: bool = False) -> List[str]:
+        self.calls += 1
+        await asyncio.sleep(self._delay(query, prioritize_uploads))
+        return self._rank(query, prioritize_uploads)
+
+    def _delay(self, query: str, prioritize_uploads: bool) -> float:
+        if self.latency.is_zero:
+            return 0.0
+        return self.latency.sample(_seeded_rng(self.seed, 'rag', prioritize_uploads, query))
+
+    def _rank(self, query: str, prioritize_uploads: bool) -> List[str]:
+        words = set(_WORD.findall(query.lower()))
+        scored = []
+        for index, (text, source, passage_words) in enumerate(self.passages):
+            overlap = len(words & passage_words)
+            if overlap:
+                upload_first = prioritize_uploads and source == 'upload'
+                scored.append((not upload_first, -overlap, index, text))
+        scored.sort()
+        return [text for _, _, _, text in scored[:self.top_k]]
+
+
+class OfflineInteraction:
+    """Stand-in for the RL AgentInteraction record; keeps whatever fields it is given"""
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+class OfflineRLOptimizer:
+    """RL optimizer stand-in: recommends the best rule-scored specialist and counts recorded interactions"""
+
+    def __init__(self, latency: Optional[LatencyModel] = None, seed: str = '0'):
+        self.latency = latency or LatencyModel()
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._stats = {'recommendations': 0, 'recorded': 0, 'failures': 0}
+
+    @classmethod
+    def from_env(cls) -> 'OfflineRLOptimizer':
+        return cls(LatencyModel.parse(os.getenv('OFFLINE_RL_LATENCY')), os.getenv('OFFLINE_SEED', '0'))
+
+    def get_optimized_agent_recommendation(self, query: str, scores: Dict[str, float]) -> Tuple[str, float]:
+        if not self.latency.is_zero:
+            time.sleep(self.latency.sample(_seeded_rng(self.seed, 'rl', query)))
+        with self._lock:
+            self._stats['recommendations'] += 1
+        # The orchestrator's fixed score only wins when no specialist has a rule match
+        specialists = sorted((score, agent) for agent, score in scores.items() if agent != 'orchestrator')
+        if specialists and specialists[-1][0] > 0.1:
+            score, agent = specialists[-1]
+            return agent, score
+        return 'orchestrator', scores.get('orchestrator', 0.95)
+
+    def record_interaction(self, interaction) -> None:
+        self.record_interactions([interaction])
+
+    def record_interactions(self, interactions: List) -> None:
+        with self._lock:
+            for interaction in interactions:
+                self._stats['recorded'] += 1
+                self._stats['failures'] += getattr(interaction, 'task_completion', None) is False
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return dict(self._stats)
+
+
+_rl_optimizer: Optional[OfflineRLOptimizer] = None
+_rl_optimizer_lock = threading.Lock()
+
+
+def get_offline_rl_optimizer() -> OfflineRLOptimizer:
+    """Process-wide optimizer, like the get_rl_optimizer() factories of the RL modules"""
+    global _rl_optimizer
+    with _rl_optimizer_lock:
+        if _rl_optimizer is None:
+            _rl_optimizer = OfflineRLOptimizer.from_env()
+        return _rl_optimizer
@@ -0,0 +1,122 @@
+"""
+RAG Context Cache for FCCS AI System
+Size-bounded LRU cache with TTL in front of RAGSystem.retrieve_relevant_context()
+"""
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+_PUNCTUATION = re.compile(r'[^\w\s]')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query so trivially different phrasings share a cache key
+
+    Lowercases, strips accents and punctuation and collapses whitespace, so
+    "How do I run consolidation?" and "how do i run  consolidation" match.
+    """
+    text = unicodedata.normalize('NFKD', query.lower())
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    text = _PUNCTUATION.sub(' ', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+class RAGContextCache:
+    """Thread-safe LRU cache of retrieved RAG context keyed on normalized query"""
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 900.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: 'OrderedDict[Tuple[str, bool], Tuple[float, List[str]]]' = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on invalidation so in-flight retrievals started against the old
+        # knowledge base cannot repopulate the cache with stale context
+        self._generation = 0
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    @classmethod
+    def from_env(cls) -> 'RAGContextCache':
+        """Build a cache from RAG_CACHE_MAX_ENTRIES / RAG_CACHE_TTL_SECONDS"""
+        return cls(
+            max_entries=int(os.getenv('RAG_CACHE_MAX_ENTRIES', '512')),
+            ttl_seconds=float(os.getenv('RAG_CACHE_TTL_SECONDS', '900'))
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    def _key(self, query: str, prioritize_uploads: bool) -> Tuple[str, bool]:
+        return normalize_query(query), bool(prioritize_uploads)
+
+    def get(self, query: str, prioritize_uploads: bool = False) -> Optional[List[str]]:
+        """Return cached context, or None on a miss or expired entry"""
+        if not self.enabled:
+            return None
+        key = self._key(query, prioritize_uploads)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            stored_at, context = entry
+            if now - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return list(context)
+
+    def put(self, query: str, prioritize_uploads: bool, context: List[str], generation: Optional[int] = None) -> None:
+        """Store context; ignored if the cache was invalidated since `generation`"""
+        if not self.enabled:
+            return
+        key = self._key(query, prioritize_uploads)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic(), list(context))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get_or_retrieve(self, rag_system, query: str, prioritize_uploads: bool = False) -> List[str]:
+        """Return cached context or call rag_system.retrieve_relevant_context() and cache it"""
+        context = self.get(query, prioritize_uploads)
+        if context is not None:
+            return context
+        generation = self._generation
+        context = rag_system.retrieve_relevant_context(query, prioritize_uploads=prioritize_uploads)
+        self.put(query, prioritize_uploads, context, generation=generation)
+        return context
+
+    def invalidate(self) -> None:
+        """Drop all entries, e.g. after new documents are uploaded to the knowledge base"""
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self._stats['invalidations'] += 1
+
+    def get_stats(self) -> Dict:
+        """Return hit-rate metrics for monitoring"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['max_entries'] = self.max_entries
+        stats['ttl_seconds'] = self.ttl_seconds
+        return stats
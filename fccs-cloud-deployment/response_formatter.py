@@ -7,6 +7,114 @@ import html
 from typing import Dict, List, Optional
 from datetime import datetime
 
+# Header patterns of the multi-pass formatter; the single-pass renderer matches them at line starts of
+# the whole text, so headers keep their cross-line behaviour (e.g. an all-caps header run over lines)
+NUMBERED_HEADER = re.compile(r'^\d+\.\s+\*\*([^*]+?)\*\*:?\s*$', re.MULTILINE)
+BOLD_HEADER = re.compile(r'^\*\*([^*]+?):\*\*\s*$', re.MULTILINE)
+CAPS_HEADER = re.compile(r'^([A-Z][A-Z\s]{2,}):?\s*$', re.MULTILINE)
+NUMBERED_ITEM = re.compile(r'\d+\.\s+')
+BULLET_ITEM = re.compile(r'[-•*]\s+')
+BOLD = re.compile(r'\*\*([^*]+?)\*\*')
+CODE_BLOCK = re.compile(r'```(.*?)```', re.DOTALL)
+INLINE_CODE = re.compile(r'`([^`]+)`')
+BLOCK_TAG = re.compile(r'<(h[1-6]|ul|ol|pre|div)')
+
+HEADER_HTML = r'<h3 class="fccs-header">\1</h3>'
+BOLD_HTML = r'<strong class="fccs-bold">\1</strong>'
+CODE_BLOCK_HTML = r'<pre class="fccs-code-block"><code>\1</code></pre>'
+INLINE_CODE_HTML = r'<code class="fccs-inline-code">\1</code>'
+
+# Cleanup phrases, matched case-insensitively. A disclaimer runs from its opening phrase through the
+# first period after its closing phrase, across lines; a filler or introduction stays on one line
+DISCLAIMERS = tuple((re.compile(re.escape(opening), re.IGNORECASE), re.compile(re.escape(closing), re.IGNORECASE))
+                    for opening, closing in (
+                        ("This information is for general guidance only.", "consult with qualified professionals"),
+                        ("Please note that this is general information", "specific advice"),
+                        ("It's recommended to consult", "implementation"),
+                        ("Always consult", "professional")))
+FILLERS = tuple((re.compile(re.escape(opening), re.IGNORECASE), re.compile(re.escape(closing), re.IGNORECASE))
+                for opening, closing in (("Let me know if you need", "assistance"),
+                                         ("Feel free to ask", "questions")))
+INTRODUCTIONS = (re.compile(r'To answer your question about', re.IGNORECASE),
+                 re.compile(r'Regarding your question', re.IGNORECASE))
+HOPE_FILLER = re.compile(r'I hope this helps!?\s*', re.IGNORECASE)
+WRAPPED_DISCLAIMER = re.compile(r'This information is for general guidance only\. '
+                                r'Please consult with qualified professionals for specific advice\.?\s*', re.IGNORECASE)
+SPACES = re.compile(r'\s*')
+SPACE_RUN = re.compile(r'\s{3,}')
+
+
+def _line_end(text: str, position: int) -> int:
+    end = text.find('\n', position)
+    return len(text) if end < 0 else end
+
+
+def _remove_disclaimers(text: str, opening: re.Pattern, closing: re.Pattern) -> str:
+    r"""Remove each opening ... closing ... '.' span, shortest first, in one forward scan
+
+    Same result as re.sub(r'opening.*?closing.*?\.', '', text, flags=re.I | re.S),
+    whose failed attempts rescan to the end of the text for every opening
+    phrase. Here a missing closing phrase or period ends the scan: it would
+    be missing after every later opening phrase too.
+    """
+    parts, kept = [], 0
+    while True:
+        start = opening.search(text, kept)
+        if start is None:
+            break
+        middle = closing.search(text, start.end())
+        stop = -1 if middle is None else text.find('.', middle.end())
+        if stop < 0:
+            break
+        parts.append(text[kept:start.start()])
+        kept = stop + 1
+    if not parts:
+        return text
+    parts.append(text[kept:])
+    return "".join(parts)
+
+
+def _remove_fillers(text: str, opening: re.Pattern, closing: re.Pattern) -> str:
+    r"""Remove each opening ... closing['.'] span within a line, with the whitespace after it
+
+    Same result as re.sub(r'opening.*?closing.*?\.?\s*', '', text, flags=re.I);
+    a line whose first opening phrase has no closing phrase after it is
+    skipped whole instead of being rescanned from every later opening phrase.
+    """
+    parts, kept, position = [], 0, 0
+    while True:
+        start = opening.search(text, position)
+        if start is None:
+            break
+        line_end = _line_end(text, start.end())
+        middle = closing.search(text, start.end(), line_end)
+        if middle is None:
+            position = line_end + 1
+            continue
+        end = middle.end() + text.startswith('.', middle.end())
+        parts.append(text[kept:start.start()])
+        kept = position = SPACES.match(text, end).end()
+    if not parts:
+        return text
+    parts.append(text[kept:])
+    return "".join(parts)
+
+
+def _remove_introduction(text: str, opening: re.Pattern) -> str:
+    r"""Drop an opening phrase at the very start through the first comma on its line (r'^opening.*?,\s*')"""
+    start = opening.match(text)
+    if start is None:
+        return text
+    comma = text.find(',', start.end(), _line_end(text, start.end()))
+    return text if comma < 0 else text[SPACES.match(text, comma + 1).end():]
+
+
+def _collapse_spaces(run: re.Match) -> str:
+    # One pass for both rules of the original cleanup: blank line runs keep a single blank line,
+    # any other run of three or more whitespace characters becomes one space
+    return '\n\n' if run.group().count('\n') == len(run.group()) else ' '
+
+
 class FCCSResponseFormatter:
     """Format AI agent responses to HTML with FCCS-specific styling"""
     
@@ -48,148 +156,131 @@ class FCCSResponseFormatter:
         return html_response
     
     def _clean_response(self, response: str) -> str:
-        """Clean and optimize response for better quality"""
+        """Clean and optimize response for better quality
+
+        Every step scans the text forwards once, so cleaning stays linear in the
+        response length however the phrases are arranged. The result is the same
+        as the regex cleaner in benchmarks/reference_formatter.py.
+        """
         # Remove excessive disclaimers and warnings
-        response = re.sub(r'This information is for general guidance only\..*?consult with qualified professionals.*?\.', '', response, flags=re.IGNORECASE | re.DOTALL)
-        response = re.sub(r'Please note that this is general information.*?specific advice.*?\.', '', response, flags=re.IGNORECASE | re.DOTALL)
-        response = re.sub(r'It\'s recommended to consult.*?implementation.*?\.', '', response, flags=re.IGNORECASE | re.DOTALL)
-        response = re.sub(r'Always consult.*?professional.*?\.', '', response, flags=re.IGNORECASE | re.DOTALL)
+        for opening, closing in DISCLAIMERS:
+            response = _remove_disclaimers(response, opening, closing)
         
         # Remove excessive filler phrases
-        response = re.sub(r'I hope this helps!?\s*', '', response, flags=re.IGNORECASE)
-        response = re.sub(r'Let me know if you need.*?assistance.*?\.?\s*', '', response, flags=re.IGNORECASE)
-        response = re.sub(r'Feel free to ask.*?questions.*?\.?\s*', '', response, flags=re.IGNORECASE)
+        response = HOPE_FILLER.sub('', response)
+        for opening, closing in FILLERS:
+            response = _remove_fillers(response, opening, closing)
         
         # Remove redundant introductions for simple questions
-        response = re.sub(r'^To answer your question about.*?,\s*', '', response, flags=re.IGNORECASE)
-        response = re.sub(r'^Regarding your question.*?,\s*', '', response, flags=re.IGNORECASE)
+        for opening in INTRODUCTIONS:
+            response = _remove_introduction(response, opening)
         
         # Clean up excessive whitespace
-        response = re.sub(r'\n{3,}', '\n\n', response)
-        response = re.sub(r'\s{3,}', ' ', response)
+        response = SPACE_RUN.sub(_collapse_spaces, response)
         
         return response.strip()
     
     def _apply_formatting(self, text: str) -> str:
-        """Apply various formatting rules to convert text to HTML"""
-        
-        # 1. First handle numbered headers specifically (before general bold formatting)
-        text = re.sub(r'^\d+\.\s+\*\*([^*]+?)\*\*:?\s*$', r'<h4 class="fccs-subheader">\1</h4>', text, flags=re.MULTILINE)
-        
-        # 2. Handle standalone headers
-        text = re.sub(r'^\*\*([^*]+?):\*\*\s*$', r'<h3 class="fccs-header">\1</h3>', text, flags=re.MULTILINE)
-        
-        # 3. Handle all caps headers
-        text = re.sub(r'^([A-Z][A-Z\s]{2,}):?\s*$', r'<h3 class="fccs-header">\1</h3>', text, flags=re.MULTILINE)
-        
-        # 4. Convert numbered lists
-        text = self._format_numbered_lists(text)
-        
-        # 5. Convert bullet points
-        text = self._format_bullet_points(text)
-        
-        # 6. Convert remaining bold text (not headers)
-        text = re.sub(r'\*\*([^*]+?)\*\*', r'<strong class="fccs-bold">\1</strong>', text)
-        
-        # 7. Convert code blocks
-        text = self._format_code_blocks(text)
-        
-        # 8. Convert line breaks to paragraphs
-        text = self._format_paragraphs(text)
-        
-        return text
-    
-    def _format_numbered_lists(self, text: str) -> str:
-        """Convert numbered lists to HTML ordered lists"""
-        # Pattern: 1. Item\n2. Item\n3. Item
+        """Convert cleaned response text to HTML in a single pass over its lines
+
+        Headers and lists are recognised line by line as they are read, inline
+        bold and code spans are substituted once over the rendered blocks, and
+        the paragraph decision needs no re-split. The output is identical to
+        the multi-pass renderer in benchmarks/reference_formatter.py,
+        except on malformed text where an unclosed '**' header line runs on
+        into a numbered bold header below it.
+        """
         lines = text.split('\n')
-        result = []
-        in_list = False
-        
-        for line in lines:
+        out: List[str] = []
+        append = out.append
+        open_list = None  # closing tag of the list being rendered
+        structured = False
+
+        def emit(line: str) -> None:
+            nonlocal open_list, structured
             stripped = line.strip()
-            if re.match(r'^\d+\.\s+', stripped):
-                if not in_list:
-                    result.append('<ol class="fccs-list">')
-                    in_list = True
-                item_text = re.sub(r'^\d+\.\s+', '', stripped).strip()
-                if item_text:  # Only add non-empty list items
-                    result.append(f'<li>{item_text}</li>')
+            if not stripped:
+                # A blank line ends a numbered list; bullet lists run on across it
+                if open_list == '</ol>':
+                    append(open_list)
+                    open_list = None
+                return
+            head = stripped[0]
+            match = None
+            if head.isdigit():
+                match = NUMBERED_ITEM.match(stripped)
+                opening, closing = '<ol class="fccs-list">', '</ol>'
+            elif head in '-•*':
+                match = BULLET_ITEM.match(stripped)
+                opening, closing = '<ul class="fccs-list">', '</ul>'
+            if match is None:
+                if open_list:
+                    append(open_list)
+                    open_list = None
+                append(line)
+                return
+            if open_list != closing:
+                if open_list:
+                    append(open_list)
+                append(opening)
+                open_list = closing
+                structured = True
+            append(f'<li>{stripped[match.end():]}</li>')
+
+        index, position, count = 0, 0, len(lines)
+        while index < count:
+            line = lines[index]
+            first = line[:1]
+            header = None
+            if first.isdigit():
+                header = NUMBERED_HEADER.match(text, position)
+            elif first == '*':
+                header = BOLD_HEADER.match(text, position)
+            elif 'A' <= first <= 'Z':
+                header = CAPS_HEADER.match(text, position)
+            if header is None:
+                emit(line)
+                index += 1
+                position += len(line) + 1
+                continue
+
+            # A header match can run over several lines and ends at a newline or the end of the text
+            end = header.end()
+            index += text.count('\n', position, end) + 1
+            position = end + 1
+            structured = True
+            if first.isdigit():
+                rendered = f'<h4 class="fccs-subheader">{header.group(1)}</h4>'
             else:
-                if in_list:
-                    result.append('</ol>')
-                    in_list = False
-                # Only add non-empty lines
-                if stripped:
-                    result.append(line)
-        
-        if in_list:
-            result.append('</ol>')
-        
-        return '\n'.join(result)
-    
-    def _format_bullet_points(self, text: str) -> str:
-        """Convert bullet points to HTML unordered lists"""
-        # Pattern: - Item\n- Item\n- Item or • Item
-        lines = text.split('\n')
-        result = []
-        in_list = False
-        
-        for line in lines:
-            stripped = line.strip()
-            if re.match(r'^[-•*]\s+', stripped):
-                if not in_list:
-                    result.append('<ul class="fccs-list">')
-                    in_list = True
-                item_text = re.sub(r'^[-•*]\s+', '', stripped).strip()
-                if item_text:  # Only add non-empty list items
-                    result.append(f'<li>{item_text}</li>')
+                rendered = f'<h3 class="fccs-header">{header.group(1)}</h3>'
+            if '\n' in rendered:
+                # Header text spanning lines still gets the later header rules and list handling
+                if first.isdigit():
+                    rendered = BOLD_HEADER.sub(HEADER_HTML, rendered)
+                if not 'A' <= first <= 'Z':
+                    rendered = CAPS_HEADER.sub(HEADER_HTML, rendered)
+                for rendered_line in rendered.split('\n'):
+                    emit(rendered_line)
             else:
-                if in_list:
-                    result.append('</ul>')
-                    in_list = False
-                # Only add non-empty lines
-                if stripped:
-                    result.append(line)
-        
-        if in_list:
-            result.append('</ul>')
-        
-        return '\n'.join(result)
-    
-    def _format_code_blocks(self, text: str) -> str:
-        """Format code blocks and inline code"""
-        # ```code block```
-        text = re.sub(r'```(.*?)```', r'<pre class="fccs-code-block"><code>\1</code></pre>', text, flags=re.DOTALL)
-        
-        # `inline code`
-        text = re.sub(r'`([^`]+)`', r'<code class="fccs-inline-code">\1</code>', text)
-        
-        return text
-    
-    def _format_paragraphs(self, text: str) -> str:
-        """Convert line breaks to proper paragraphs while removing excessive whitespace"""
-        # Remove excessive empty lines (more than 2 consecutive newlines)
-        text = re.sub(r'\n{3,}', '\n\n', text)
-        
-        # Split by double line breaks for paragraphs
-        paragraphs = re.split(r'\n\s*\n', text)
-        formatted_paragraphs = []
-        
-        for para in paragraphs:
-            para = para.strip()
-            if para:
-                # Don't wrap if already has HTML tags
-                if not re.search(r'<(h[1-6]|ul|ol|pre|div)', para):
-                    # Remove excessive spaces within lines
-                    para = re.sub(r'\s+', ' ', para)
-                    # Replace single line breaks with <br> within paragraphs, but avoid excessive breaks
-                    para = re.sub(r'\n+', '<br>', para)
-                    para = f'<p class="fccs-paragraph">{para}</p>'
-                formatted_paragraphs.append(para)
-        
-        return ''.join(formatted_paragraphs)
-    
+                emit(rendered)
+        if open_list:
+            append(open_list)
+
+        html_text = '\n'.join(out)
+        if '**' in html_text:
+            html_text = BOLD.sub(BOLD_HTML, html_text)
+        if '`' in html_text:
+            if '```' in html_text:
+                html_text = CODE_BLOCK.sub(CODE_BLOCK_HTML, html_text)
+            html_text = INLINE_CODE.sub(INLINE_CODE_HTML, html_text)
+
+        # Blank lines never survive list handling, so the whole text is one block: raw HTML when it
+        # holds block tags, otherwise one paragraph with its whitespace collapsed
+        html_text = html_text.strip()
+        if not html_text or structured or BLOCK_TAG.search(html_text):
+            return html_text
+        return f'<p class="fccs-paragraph">{" ".join(html_text.split())}</p>'
+
     def _add_agent_context(self, html_response: str, agent_name: str) -> str:
         """Add agent-specific context and styling"""
         agent_info = self._get_agent_info(agent_name)
@@ -279,7 +370,7 @@ class FCCSResponseFormatter:
             """
         
         # Remove any disclaimer messages
-        html_response = re.sub(r'This information is for general guidance only\. Please consult with qualified professionals for specific advice\.?\s*', '', html_response, flags=re.IGNORECASE)
+        html_response = WRAPPED_DISCLAIMER.sub('', html_response)
         
         return f"""
         <div class="fccs-response-container">
@@ -290,5 +381,55 @@ class FCCSResponseFormatter:
         </div>
         """
 
+class FCCSStreamingFormatter:
+    """Incrementally format a streamed response into HTML fragments
+
+    Tokens are buffered until a block is complete (a blank line outside a
+    code fence), then the block goes through the same clean and format
+    pipeline as FCCSResponseFormatter.format_response().
+    """
+
+    def __init__(self, formatter: Optional[FCCSResponseFormatter] = None):
+        self.formatter = formatter or FCCSResponseFormatter()
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Add streamed text and return HTML for any blocks it completed"""
+        self._buffer += text
+        fragments = []
+        while True:
+            boundary = self._find_block_boundary()
+            if boundary < 0:
+                break
+            block, self._buffer = self._buffer[:boundary], self._buffer[boundary:].lstrip('\n')
+            fragment = self._format_block(block)
+            if fragment:
+                fragments.append(fragment)
+        return fragments
+
+    def flush(self) -> List[str]:
+        """Format whatever is left once the stream ends"""
+        block, self._buffer = self._buffer, ""
+        fragment = self._format_block(block)
+        return [fragment] if fragment else []
+
+    def _find_block_boundary(self) -> int:
+        """Position of the first blank line that is not inside a code fence, or -1"""
+        start = 0
+        while True:
+            boundary = self._buffer.find('\n\n', start)
+            if boundary < 0:
+                return -1
+            if self._buffer.count('```', 0, boundary) % 2 == 0:
+                return boundary
+            start = boundary + 2
+
+    def _format_block(self, block: str) -> str:
+        cleaned = self.formatter._clean_response(block)
+        if not cleaned:
+            return ""
+        return self.formatter._apply_formatting(cleaned)
+
+
 # Global formatter instance
 fccs_formatter = FCCSResponseFormatter()
\ No newline at end of file
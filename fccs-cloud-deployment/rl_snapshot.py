@@ -0,0 +1,484 @@
+"""
+RL Policy Snapshots for FCCS AI System
+Serves agent recommendations from a small cache and an immutable learned policy snapshot, while a
+background process trains the policy (and the RL optimizer) on batched interactions and publishes snapshots
+"""
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+from rag_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"[^\W\d_]{3,}")
+# RoutingMatcher.confidence() for an agent no rule matched
+RULE_MISS_SCORE = 0.1
+
+# (query, agent, reward) - what the trainer needs from an AgentInteraction
+Example = Tuple[str, str, float]
+# Zero-argument factory, resolved in the trainer process, for the optimizer that also learns from interactions
+DEFAULT_OPTIMIZER_FACTORY = 'agent_router:get_rl_optimizer'
+
+
+def query_features(query: str, dim: int) -> Tuple[int, ...]:
+    """Hashed bag-of-words indices for a query; index 0 is the always-on bias feature"""
+    buckets = {zlib.crc32(token.encode('utf-8')) % (dim - 1) + 1 for token in _TOKEN.findall(query.lower())}
+    return (0,) + tuple(sorted(buckets))
+
+
+def interaction_reward(interaction) -> Optional[float]:
+    """Reward in [-1, 1] for an interaction, or None when it says nothing about the agent
+
+    A 1-5 user rating maps linearly onto [-1, 1]; a failed task is -1; a
+    completed task without feedback is a weak positive. Cache hits did not
+    run the agent, so they are skipped.
+    """
+    if getattr(interaction, 'cached', False):
+        return None
+    rating = getattr(interaction, 'user_rating', None)
+    if rating is not None:
+        return max(-1.0, min(1.0, (float(rating) - 3.0) / 2.0))
+    if getattr(interaction, 'task_completion', None) is False:
+        return -1.0
+    return 0.1
+
+
+class PolicySnapshot:
+    """An immutable per-agent reward model: summed rewards and counts per hashed query feature
+
+    An agent's learned advantage for a query is its summed reward over the
+    query's features divided by their summed count plus `prior`, so sparse
+    evidence is shrunk towards zero. default_decision() is the default: a
+    recommendation only switches to another candidate (the orchestrator or
+    an agent the rules matched) whose advantage beats the default's by more
+    than `margin`, so an empty snapshot, or one that has only seen the
+    default choices succeed, routes like the rule scores.
+    """
+
+    __slots__ = ('version', 'agents', 'dim', 'prior', 'margin', 'interactions', 'created_at',
+                 '_index', '_sums', '_counts')
+
+    def __init__(self, agents: Sequence[str], dim: int = 1024, sums=None, counts=None, version: int = 0,
+                 interactions: int = 0, prior: float = 5.0, margin: float = 0.1, created_at: Optional[float] = None):
+        self.version = version
+        self.agents = tuple(agents)
+        self.dim = dim
+        self.prior = prior
+        self.margin = margin
+        self.interactions = interactions
+        self.created_at = created_at if created_at is not None else time.time()
+        self._index = {agent: row for row, agent in enumerate(self.agents)}
+        shape = (len(self.agents), dim)
+        if NUMPY_AVAILABLE:
+            self._sums = np.zeros(shape) if sums is None else np.array(sums, dtype=float).reshape(shape)
+            self._counts = np.zeros(shape) if counts is None else np.array(counts, dtype=float).reshape(shape)
+            # Published snapshots are shared across threads; make accidental writes fail loudly
+            self._sums.setflags(write=False)
+            self._counts.setflags(write=False)
+        else:
+            self._sums = tuple(tuple(map(float, row)) for row in (sums or [[0.0] * dim] * len(self.agents)))
+            self._counts = tuple(tuple(map(float, row)) for row in (counts or [[0.0] * dim] * len(self.agents)))
+
+    def advantages(self, features: Sequence[int]) -> List[float]:
+        """Learned advantage of every agent (in self.agents order) for a query's features"""
+        if NUMPY_AVAILABLE:
+            columns = np.fromiter(features, dtype=np.intp)
+            sums = self._sums[:, columns].sum(axis=1)
+            counts = self._counts[:, columns].sum(axis=1)
+            return (sums / (counts + self.prior)).tolist()
+        return [
+            sum(sums[f] for f in features) / (sum(counts[f] for f in features) + self.prior)
+            for sums, counts in zip(self._sums, self._counts)
+        ]
+
+    @staticmethod
+    def default_decision(traditional_scores: Dict[str, float]) -> Tuple[str, float]:
+        """The best-scoring specialist a rule matched, else the orchestrator, as the RL optimizer ranks them"""
+        best = None
+        for agent, score in traditional_scores.items():
+            # Ties go to the later agent name, as in a sorted (score, agent) ranking
+            if agent != 'orchestrator' and score > RULE_MISS_SCORE and (best is None or (score, agent) > best):
+                best = (score, agent)
+        if best is None:
+            return 'orchestrator', traditional_scores.get('orchestrator', 0.95)
+        return best[1], best[0]
+
+    def recommend(self, query: str, traditional_scores: Dict[str, float],
+                  baseline: Optional[Tuple[str, float]] = None) -> Tuple[str, float]:
+        """(agent, confidence): the default decision (`baseline` or default_decision()), unless a
+        candidate has learned to do better"""
+        if baseline is None:
+            baseline = self.default_decision(traditional_scores)
+        if not self.interactions:
+            return baseline
+        advantages = self.advantages(query_features(query, self.dim))
+        default_agent = baseline[0]
+        default_row = self._index.get(default_agent)
+        default_advantage = advantages[default_row] if default_row is not None else 0.0
+        best_agent, best_gain = default_agent, self.margin
+        for agent, score in traditional_scores.items():
+            row = self._index.get(agent)
+            # Only agents the rules consider plausible (a rule matched, or the orchestrator) are candidates
+            if row is None or agent == default_agent or (score <= RULE_MISS_SCORE and agent != 'orchestrator'):
+                continue
+            gain = advantages[row] - default_advantage
+            if gain > best_gain:
+                best_agent, best_gain = agent, gain
+        if best_agent == default_agent:
+            return baseline
+        return best_agent, max(0.0, min(1.0, traditional_scores[best_agent] + best_gain))
+
+    def to_dict(self) -> Dict:
+        sums = self._sums.tolist() if NUMPY_AVAILABLE else [list(row) for row in self._sums]
+        counts = self._counts.tolist() if NUMPY_AVAILABLE else [list(row) for row in self._counts]
+        return {'version': self.version, 'agents': list(self.agents), 'dim': self.dim,
+                'interactions': self.interactions, 'created_at': self.created_at, 'sums': sums, 'counts': counts}
+
+    @classmethod
+    def from_dict(cls, data: Dict, prior: float = 5.0, margin: float = 0.1) -> 'PolicySnapshot':
+        return cls(data['agents'], data['dim'], data['sums'], data['counts'], data['version'],
+                   data.get('interactions', 0), prior, margin, data.get('created_at'))
+
+    def save(self, path: str) -> None:
+        """Write atomically, so a reader never sees a half-written snapshot"""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.rl_snapshot-', suffix='.json')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.to_dict(), f, separators=(',', ':'))
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str, agents: Sequence[str], dim: int, prior: float = 5.0,
+             margin: float = 0.1) -> Optional['PolicySnapshot']:
+        """The saved snapshot, or None if missing, unreadable or trained for other agents/dimensions"""
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('agents') != list(agents) or data.get('dim') != dim:
+            return None
+        return cls.from_dict(data, prior, margin)
+
+
+class _Accumulator:
+    """Mutable training state: the trainer process folds examples in and freezes snapshots"""
+
+    def __init__(self, agents: Sequence[str], dim: int, decay: float, base: Optional[PolicySnapshot] = None):
+        self.agents = tuple(agents)
+        self.dim = dim
+        self.decay = decay
+        self.index = {agent: row for row, agent in enumerate(self.agents)}
+        self.version = base.version if base is not None else 0
+        self.interactions = base.interactions if base is not None else 0
+        if NUMPY_AVAILABLE:
+            self.sums = np.array(base._sums) if base is not None else np.zeros((len(self.agents), dim))
+            self.counts = np.array(base._counts) if base is not None else np.zeros((len(self.agents), dim))
+        else:
+            self.sums = [list(row) for row in base._sums] if base is not None else \
+                [[0.0] * dim for _ in self.agents]
+            self.counts = [list(row) for row in base._counts] if base is not None else \
+                [[0.0] * dim for _ in self.agents]
+
+    def update(self, examples: Iterable[Example]) -> int:
+        """Fold a batch in, first decaying older evidence; returns how many examples were used"""
+        examples = [example for example in examples if example[1] in self.index]
+        if not examples:
+            return 0
+        if self.decay < 1.0:
+            factor = self.decay ** len(examples)
+            if NUMPY_AVAILABLE:
+                self.sums *= factor
+                self.counts *= factor
+            else:
+                self.sums = [[value * factor for value in row] for row in self.sums]
+                self.counts = [[value * factor for value in row] for row in self.counts]
+        for query, agent, reward in examples:
+            row = self.index[agent]
+            for feature in query_features(query, self.dim):
+                self.sums[row][feature] += reward
+                self.counts[row][feature] += 1.0
+        self.interactions += len(examples)
+        return len(examples)
+
+    def freeze(self) -> PolicySnapshot:
+        self.version += 1
+        return PolicySnapshot(self.agents, self.dim, self.sums, self.counts, self.version, self.interactions)
+
+
+def _load_optimizer(factory_path: str):
+    """The optimizer built by a 'module:function' factory, or None when unset or unavailable"""
+    if not factory_path:
+        return None
+    module_name, _, factory_name = factory_path.partition(':')
+    try:
+        factory = getattr(importlib.import_module(module_name), factory_name)
+        return factory() if factory else None
+    except Exception as e:
+        logger.error(f"❌ RL snapshot trainer could not build the optimizer from {factory_path}: {e}")
+        return None
+
+
+def _train_optimizer(optimizer, interactions: List) -> None:
+    record_batch = getattr(optimizer, 'record_interactions', None)
+    if record_batch is not None:
+        record_batch(interactions)
+    else:
+        for interaction in interactions:
+            optimizer.record_interaction(interaction)
+
+
+def _trainer_main(conn, base: Dict, decay: float, publish_every: int, publish_interval: float, path: str,
+                  optimizer_factory: str = '') -> None:
+    """Trainer process: fold example batches in, train the optimizer, send (and save) snapshots when due"""
+    snapshot = PolicySnapshot.from_dict(base)
+    accumulator = _Accumulator(snapshot.agents, snapshot.dim, decay, snapshot)
+    # The optimizer trains here, so its learning never competes with request handling for the GIL
+    optimizer = _load_optimizer(optimizer_factory)
+    unpublished = 0
+    last_published = time.monotonic()
+    while True:
+        timeout = max(0.0, last_published + publish_interval - time.monotonic()) if unpublished else None
+        if conn.poll(timeout):
+            try:
+                message = conn.recv()
+            except EOFError:
+                return
+            if message is None:
+                return
+            examples, interactions = message
+            unpublished += accumulator.update(examples)
+            if optimizer is not None and interactions:
+                try:
+                    _train_optimizer(optimizer, interactions)
+                except Exception as e:
+                    logger.error(f"❌ RL optimizer failed to record {len(interactions)} interactions: {e}")
+        if unpublished and (unpublished >= publish_every
+                            or time.monotonic() - last_published >= publish_interval):
+            snapshot = accumulator.freeze()
+            if path:
+                try:
+                    snapshot.save(path)
+                except OSError:
+                    pass
+            conn.send(snapshot.to_dict())
+            unpublished = 0
+            last_published = time.monotonic()
+
+
+class SnapshotRLPolicy:
+    """Answer get_optimized_agent_recommendation() from one policy snapshot, without the optimizer
+
+    Serving reads one immutable PolicySnapshot (swapped by reference when a
+    new one arrives): the rule scores give the default decision and every
+    agent's learned advantage is scored in one vectorized pass, so no
+    request calls the RL optimizer. Answers are kept in a small cache for
+    `cache_ttl` seconds (and until the next snapshot). record_interactions()
+    batches are converted to (query, agent, reward) examples and sent, with
+    the interactions themselves, to a trainer process; it folds the examples
+    into the next snapshot and feeds the interactions to its own optimizer,
+    built from `optimizer_factory`, so the optimizer's store keeps receiving
+    them without training in the serving process. If the trainer dies,
+    serving continues on the last snapshot and the trainer is restarted with
+    the next batch.
+    """
+
+    def __init__(self, agents: Sequence[str], optimizer_factory: str = '', dim: int = 1024, prior: float = 5.0,
+                 margin: float = 0.1, decay: float = 1.0, cache_size: int = 1024, cache_ttl: float = 60.0,
+                 publish_every: int = 50, publish_interval: float = 10.0, path: str = '',
+                 start_method: str = 'spawn'):
+        self.agents = tuple(agents)
+        self.optimizer_factory = optimizer_factory
+        self.dim = dim
+        self.prior = prior
+        self.margin = margin
+        self.decay = decay
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.publish_every = publish_every
+        self.publish_interval = publish_interval
+        self.path = path
+        self._context = multiprocessing.get_context(start_method)
+        loaded = PolicySnapshot.load(path, self.agents, dim, prior, margin) if path else None
+        self.snapshot = loaded or PolicySnapshot(self.agents, dim, prior=prior, margin=margin)
+        # key -> (recommendation, expiry); a new snapshot clears it
+        self._cache: 'OrderedDict[Tuple, Tuple[Tuple[str, float], float]]' = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._stats = {'recommendations': 0, 'cache_hits': 0, 'examples_sent': 0, 'interactions_sent': 0,
+                       'snapshots_received': 0, 'trainer_restarts': 0, 'trainer_errors': 0}
+        self._conn = None
+        self._process = None
+        self._receiver: Optional[threading.Thread] = None
+        self._closed = False
+        self._last_spawn = 0.0
+
+    @classmethod
+    def from_env(cls, agents: Sequence[str]) -> Optional['SnapshotRLPolicy']:
+        """Build a policy from RL_SNAPSHOT_* settings; None unless AGENT_ROUTER_RL_INFERENCE=snapshot
+
+        RL_SNAPSHOT_OPTIMIZER_FACTORY ('module:function', default
+        agent_router:get_rl_optimizer, '' for none) builds the optimizer the
+        trainer process feeds interactions to.
+        """
+        if os.getenv('AGENT_ROUTER_RL_INFERENCE', 'optimizer').lower() != 'snapshot':
+            return None
+        return cls(
+            agents,
+            os.getenv('RL_SNAPSHOT_OPTIMIZER_FACTORY', DEFAULT_OPTIMIZER_FACTORY),
+            dim=int(os.getenv('RL_SNAPSHOT_FEATURES', '1024')),
+            prior=float(os.getenv('RL_SNAPSHOT_PRIOR', '5')),
+            margin=float(os.getenv('RL_SNAPSHOT_MARGIN', '0.1')),
+            decay=float(os.getenv('RL_SNAPSHOT_DECAY', '1.0')),
+            cache_size=int(os.getenv('RL_SNAPSHOT_CACHE_SIZE', '1024')),
+            cache_ttl=float(os.getenv('RL_SNAPSHOT_CACHE_SECONDS', '60')),
+            publish_every=int(os.getenv('RL_SNAPSHOT_PUBLISH_EVERY', '50')),
+            publish_interval=float(os.getenv('RL_SNAPSHOT_PUBLISH_SECONDS', '10')),
+            path=os.getenv('RL_SNAPSHOT_PATH', 'rl_policy_snapshot.json')
+        )
+
+    def get_optimized_agent_recommendation(self, query: str, traditional_scores: Dict[str, float],
+                                           baseline: Optional[Tuple[str, float]] = None) -> Tuple[str, float]:
+        """(agent, confidence); `baseline` is the default decision (default: PolicySnapshot.default_decision())"""
+        snapshot = self.snapshot
+        key = (snapshot.version, normalize_query(query), baseline,
+               tuple(sorted((agent, round(score, 4)) for agent, score in traditional_scores.items())))
+        now = time.monotonic()
+        with self._cache_lock:
+            self._stats['recommendations'] += 1
+            cached = self._cache.get(key)
+            if cached is not None and cached[1] > now:
+                self._cache.move_to_end(key)
+                self._stats['cache_hits'] += 1
+                return cached[0]
+        recommendation = snapshot.recommend(query, traditional_scores, baseline)
+        with self._cache_lock:
+            self._cache[key] = (recommendation, now + self.cache_ttl)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return recommendation
+
+    def record_interaction(self, interaction) -> None:
+        self.record_interactions([interaction])
+
+    def record_interactions(self, interactions: List) -> None:
+        """Send a batch to the trainer process, which trains both the snapshot and the optimizer"""
+        examples = []
+        for interaction in interactions:
+            reward = interaction_reward(interaction)
+            if reward is not None:
+                examples.append((interaction.query, interaction.selected_agent, reward))
+        forwarded = list(interactions) if self.optimizer_factory else []
+        if (examples or forwarded) and not self._closed:
+            self._send(examples, forwarded)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Stop the trainer; it publishes nothing further"""
+        if self._closed:
+            return
+        self._closed = True
+        with self._lock:
+            conn, process = self._conn, self._process
+        if conn is not None:
+            try:
+                conn.send(None)
+            except (OSError, ValueError):
+                pass
+        if process is not None:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        if self._receiver is not None:
+            self._receiver.join(1.0)
+
+    def get_stats(self) -> Dict:
+        """Current snapshot version/age, cache hit counts and trainer traffic"""
+        snapshot = self.snapshot
+        with self._cache_lock:
+            stats = dict(self._stats)
+            stats['cache_size'] = len(self._cache)
+        stats.update({
+            'snapshot_version': snapshot.version,
+            'snapshot_interactions': snapshot.interactions,
+            'snapshot_age_seconds': round(time.time() - snapshot.created_at, 1),
+            'trainer_alive': self._process is not None and self._process.is_alive(),
+            'vectorized': NUMPY_AVAILABLE
+        })
+        return stats
+
+    def _send(self, examples: List[Example], interactions: List) -> None:
+        with self._lock:
+            if self._process is None or not self._process.is_alive():
+                if self._process is not None and time.monotonic() - self._last_spawn < 5.0:
+                    return  # Restarting a crashing trainer at most every few seconds
+                self._spawn()
+            conn = self._conn
+        try:
+            conn.send((examples, interactions))
+            with self._cache_lock:
+                self._stats['examples_sent'] += len(examples)
+                self._stats['interactions_sent'] += len(interactions)
+        except (OSError, ValueError, TypeError, AttributeError):
+            # A closed pipe, or an interaction that cannot be pickled
+            with self._cache_lock:
+                self._stats['trainer_errors'] += 1
+
+    def _spawn(self) -> None:
+        """Start (or restart) the trainer; caller holds the lock"""
+        if self._process is not None:
+            self._stats['trainer_restarts'] += 1
+            logger.error(f"❌ RL snapshot trainer exited with code {self._process.exitcode}; restarting")
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_trainer_main,
+            # Training resumes from the serving snapshot, so versions keep increasing across restarts
+            args=(child_conn, self.snapshot.to_dict(), self.decay, self.publish_every, self.publish_interval,
+                  self.path, self.optimizer_factory),
+            name='rl-snapshot-trainer',
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        self._conn, self._process = parent_conn, process
+        self._last_spawn = time.monotonic()
+        self._receiver = threading.Thread(target=self._receive, args=(parent_conn,), name='rl-snapshot-receiver',
+                                          daemon=True)
+        self._receiver.start()
+
+    def _receive(self, conn) -> None:
+        """Swap in snapshots as the trainer publishes them"""
+        while True:
+            try:
+                data = conn.recv()
+            except (EOFError, OSError):
+                return
+            snapshot = PolicySnapshot.from_dict(data, self.prior, self.margin)
+            if snapshot.version > self.snapshot.version:
+                self.snapshot = snapshot
+                with self._cache_lock:
+                    self._stats['snapshots_received'] += 1
+                    # Entries for older versions can no longer be hit
+                    self._cache.clear()
@@ -0,0 +1,156 @@
+"""
+Background RL Interaction Writer for FCCS AI System
+Moves RL optimizer record_interaction() calls off the request path with a bounded, batching queue
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+_FLUSH = object()
+
+
+class BackgroundInteractionWriter:
+    """Batch AgentInteraction records on a daemon thread and hand them to the RL optimizer
+
+    Batches are flushed when they reach batch_size or flush_interval seconds
+    after their first record. When the queue is full new records are dropped
+    (and counted) rather than blocking the request.
+    """
+
+    def __init__(self, optimizer, max_queue: int = 10000, batch_size: int = 50, flush_interval: float = 2.0):
+        self.optimizer = optimizer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: 'queue.Queue' = queue.Queue(maxsize=max_queue)
+        self._pending = 0
+        self._pending_cond = threading.Condition()
+        self._stats = {'submitted': 0, 'written': 0, 'dropped': 0, 'batches': 0, 'errors': 0}
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='rl-interaction-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @classmethod
+    def from_env(cls, optimizer) -> Optional['BackgroundInteractionWriter']:
+        """Build a writer from RL_WRITER_* settings; None when RL_WRITER_ENABLED=0"""
+        if os.getenv('RL_WRITER_ENABLED', '1').lower() in ('0', 'false', 'no'):
+            return None
+        return cls(
+            optimizer,
+            max_queue=int(os.getenv('RL_WRITER_QUEUE_SIZE', '10000')),
+            batch_size=int(os.getenv('RL_WRITER_BATCH_SIZE', '50')),
+            flush_interval=float(os.getenv('RL_WRITER_FLUSH_SECONDS', '2.0'))
+        )
+
+    def submit(self, interaction) -> bool:
+        """Queue an interaction without blocking; returns False if it was dropped"""
+        if self._closed:
+            self._count('dropped')
+            return False
+        with self._pending_cond:
+            self._pending += 1
+        try:
+            self._queue.put_nowait(interaction)
+        except queue.Full:
+            self._done(1)
+            self._count('dropped')
+            return False
+        self._count('submitted')
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued interaction has been written; False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            # Wake the worker so a partial batch is written now, not at flush_interval
+            self._queue.put_nowait(_FLUSH)
+        except queue.Full:
+            pass
+        with self._pending_cond:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._pending_cond.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 5.0) -> bool:
+        """Stop accepting records, drain the queue and stop the worker"""
+        if self._closed:
+            return True
+        self._closed = True
+        drained = self.flush(timeout)
+        try:
+            self._queue.put(_STOP, timeout=1.0)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=1.0)
+        return drained
+
+    def get_stats(self) -> Dict:
+        """Queue depth plus submitted/written/dropped/error counts"""
+        with self._pending_cond:
+            stats = dict(self._stats)
+            stats['pending'] = self._pending
+        stats['queued'] = self._queue.qsize()
+        stats['closed'] = self._closed
+        return stats
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._pending_cond:
+            self._stats[key] += amount
+
+    def _done(self, count: int) -> None:
+        with self._pending_cond:
+            self._pending -= count
+            if not self._pending:
+                self._pending_cond.notify_all()
+
+    def _run(self) -> None:
+        batch: List = []
+        batch_started = 0.0
+        while True:
+            timeout = None if not batch else max(0.0, batch_started + self.flush_interval - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                self._write(batch)
+                return
+            if item is _FLUSH:
+                self._write(batch)
+                batch = []
+                continue
+            if item is not None:
+                if not batch:
+                    batch_started = time.monotonic()
+                batch.append(item)
+            if batch and (len(batch) >= self.batch_size or item is None):
+                self._write(batch)
+                batch = []
+
+    def _write(self, batch: List) -> None:
+        if not batch:
+            return
+        try:
+            record_batch = getattr(self.optimizer, 'record_interactions', None)
+            if record_batch is not None:
+                record_batch(batch)
+            else:
+                for interaction in batch:
+                    self.optimizer.record_interaction(interaction)
+            self._count('written', len(batch))
+            self._count('batches')
+        except Exception as e:
+            self._count('errors')
+            logger.error(f"❌ RL interaction batch write failed: {e}")
+        finally:
+            self._done(len(batch))
@@ -0,0 +1,183 @@
+"""
+Routing Matcher for FCCS AI System
+Compiled keyword/pattern routing tables loaded from agents_config.json, with a background reload watcher
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Pattern, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'configs', 'agents_config.json')
+
+
+def load_routing_rules(path: str) -> Dict[str, Dict]:
+    """The 'routing' block of every agent in the config file, in file order
+
+    File order is the tie-break order when agents score equally. Agents
+    without a 'routing' block are not routed to.
+    """
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+
+    rules = {}
+    for agent_name, definition in config.items():
+        routing = definition.get('routing') if isinstance(definition, dict) else None
+        if routing:
+            rules[agent_name] = dict({'keywords': [], 'patterns': [], 'priority': 3}, **routing)
+    if not rules:
+        raise ValueError(f"no agent in {path} has a 'routing' block")
+    return rules
+
+
+class RoutingMatcher:
+    """Immutable, precompiled form of the routing rules
+
+    Every keyword is tested once per query no matter how many agents list it,
+    and every pattern is compiled up front, so scoring pays no regex
+    compilation or re-lowercasing. Instances are never mutated after
+    construction; a reload builds a new matcher and swaps the reference.
+    """
+
+    def __init__(self, rules: Dict[str, Dict], source: str = '', version: int = 0):
+        self.rules = rules
+        self.source = source
+        self.version = version
+        self.loaded_at = time.time()
+        self.agent_names = tuple(rules)
+
+        keyword_agents: Dict[str, List[int]] = {}
+        patterns: List[Tuple[int, Pattern]] = []
+        weights = []
+        per_agent: Dict[str, Tuple[Tuple[str, ...], Tuple[Pattern, ...], float]] = {}
+        for index, agent_name in enumerate(self.agent_names):
+            agent_rules = rules[agent_name]
+            priority = agent_rules.get('priority', 1)
+            if not isinstance(priority, (int, float)) or priority <= 0:
+                raise ValueError(f"routing priority for {agent_name} must be a positive number")
+            weights.append(1 / priority)
+            keywords = tuple(keyword.lower() for keyword in agent_rules.get('keywords', []))
+            for keyword in keywords:
+                keyword_agents.setdefault(keyword, []).append(index)
+            compiled = []
+            for pattern in agent_rules.get('patterns', []):
+                try:
+                    compiled.append(re.compile(pattern))
+                except re.error as e:
+                    raise ValueError(f"invalid routing pattern for {agent_name}: {pattern!r} ({e})") from e
+            patterns.extend((index, regex) for regex in compiled)
+            per_agent[agent_name] = (keywords, tuple(compiled), 1 / priority)
+
+        self._keyword_agents = tuple((keyword, tuple(indexes)) for keyword, indexes in keyword_agents.items())
+        self._patterns = tuple(patterns)
+        self._weights = tuple(weights)
+        self._per_agent = per_agent
+
+    @classmethod
+    def from_config(cls, path: str, version: int = 0) -> 'RoutingMatcher':
+        """Compile rules from the config file; raises OSError or ValueError if it is missing or invalid"""
+        return cls(load_routing_rules(path), source=path, version=version)
+
+    def raw_scores(self, query_lower: str) -> Dict[str, int]:
+        """Unweighted keyword (+1) and pattern (+2) hits for every agent"""
+        hits = [0] * len(self.agent_names)
+        for keyword, indexes in self._keyword_agents:
+            if keyword in query_lower:
+                for index in indexes:
+                    hits[index] += 1
+        for index, pattern in self._patterns:
+            if pattern.search(query_lower):
+                hits[index] += 2
+        return dict(zip(self.agent_names, hits))
+
+    def weighted_scores(self, query_lower: str) -> Dict[str, float]:
+        """Hits weighted by agent priority (lower priority number = higher weight)"""
+        hits = self.raw_scores(query_lower)
+        return {name: hits[name] * weight for name, weight in zip(self.agent_names, self._weights)}
+
+    def agent_score(self, query_lower: str, agent_name: str) -> float:
+        """Weighted score of a single agent, without scoring the others"""
+        keywords, patterns, weight = self._per_agent[agent_name]
+        hits = sum(1 for keyword in keywords if keyword in query_lower)
+        hits += sum(2 for pattern in patterns if pattern.search(query_lower))
+        return hits * weight
+
+    def confidence(self, weighted_scores: Dict[str, float], agent_name: str) -> float:
+        if agent_name not in weighted_scores:
+            return 0.1
+        return min(1.0, weighted_scores[agent_name] / 10)
+
+
+class RoutingRulesWatcher:
+    """Poll the routing config file and rebuild the matcher off the request path
+
+    The new matcher is compiled on the watcher thread and handed to on_reload
+    only once it is complete; a file that fails to parse or compile leaves the
+    current matcher in place.
+    """
+
+    def __init__(self, path: str, build: Callable[[int], RoutingMatcher],
+                 on_reload: Callable[[RoutingMatcher], None], interval: float = 5.0):
+        self.path = path
+        self.build = build
+        self.on_reload = on_reload
+        self.interval = interval
+        self._signature = self._file_signature()
+        self._version = 0
+        self._stats = {'checks': 0, 'reloads': 0, 'errors': 0, 'last_error': None}
+        self._check_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='routing-rules-watcher', daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_env(cls, path: str, build: Callable[[int], RoutingMatcher],
+                 on_reload: Callable[[RoutingMatcher], None]) -> Optional['RoutingRulesWatcher']:
+        """Build a watcher polling every ROUTING_RULES_RELOAD_SECONDS; None when set to 0"""
+        interval = float(os.getenv('ROUTING_RULES_RELOAD_SECONDS', '5'))
+        if interval <= 0:
+            return None
+        return cls(path, build, on_reload, interval)
+
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def check(self) -> bool:
+        """Reload now if the file changed since the last check; True when a new matcher was swapped in"""
+        with self._check_lock:
+            self._stats['checks'] += 1
+            signature = self._file_signature()
+            if signature is None or signature == self._signature:
+                return False
+            self._signature = signature
+            try:
+                matcher = self.build(self._version + 1)
+            except Exception as e:
+                self._stats['errors'] += 1
+                self._stats['last_error'] = str(e)
+                logger.error(f"❌ Routing rules reload failed, keeping version {self._version}: {e}")
+                return False
+            self._version = matcher.version
+            self.on_reload(matcher)
+            self._stats['reloads'] += 1
+        logger.info(f"🔄 Routing rules reloaded from {self.path} (version {self._version})")
+        return True
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=1.0)
+
+    def get_stats(self) -> Dict:
+        return dict(self._stats, interval=self.interval, version=self._version)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.check()
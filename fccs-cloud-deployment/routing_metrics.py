@@ -0,0 +1,146 @@
+"""
+Routing Metrics for FCCS AI System
+Per-stage latency histograms per selected agent and sampled routing decision traces
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+# Seconds; spans sub-millisecond rule scoring up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class LatencyHistogram:
+    """Cumulative fixed-bucket histogram (Prometheus style)"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket containing it"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        running = 0
+        for index, bucket_count in enumerate(self.counts):
+            running += bucket_count
+            if running >= target:
+                return self.buckets[index] if index < len(self.buckets) else float('inf')
+        return float('inf')
+
+    def snapshot(self) -> Dict:
+        cumulative = []
+        running = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), self.counts):
+            running += bucket_count
+            cumulative.append((bound, running))
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'buckets': cumulative
+        }
+
+
+class RouterMetrics:
+    """Aggregate AgentRouter stage timings and keep a sample of routing decision traces"""
+
+    def __init__(self, trace_sample_rate: float = 0.0, max_traces: int = 500,
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.trace_sample_rate = trace_sample_rate
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self._requests: Dict[Tuple[str, str], int] = {}
+        self._traces: Deque[Dict] = deque(maxlen=max_traces)
+
+    @classmethod
+    def from_env(cls) -> 'RouterMetrics':
+        """Build metrics from AGENT_ROUTER_TRACE_SAMPLE_RATE / AGENT_ROUTER_MAX_TRACES"""
+        return cls(
+            trace_sample_rate=float(os.getenv('AGENT_ROUTER_TRACE_SAMPLE_RATE', '0')),
+            max_traces=int(os.getenv('AGENT_ROUTER_MAX_TRACES', '500'))
+        )
+
+    def observe_request(self, agent: str, timings: Dict, response_time: float, outcome: str) -> None:
+        """Record every numeric stage timing of one request under the selected agent"""
+        with self._lock:
+            for stage, seconds in timings.items():
+                if isinstance(seconds, (int, float)):
+                    self._histogram(stage, agent).observe(seconds)
+            self._histogram('total', agent).observe(response_time)
+            key = (agent, outcome)
+            self._requests[key] = self._requests.get(key, 0) + 1
+
+    def _histogram(self, stage: str, agent: str) -> LatencyHistogram:
+        key = (stage, agent)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = LatencyHistogram(self.buckets)
+        return histogram
+
+    def should_trace(self) -> bool:
+        return self.trace_sample_rate > 0 and random.random() < self.trace_sample_rate
+
+    def record_trace(self, trace: Dict) -> None:
+        trace.setdefault('timestamp', time.time())
+        with self._lock:
+            self._traces.append(trace)
+
+    def get_traces(self, limit: Optional[int] = None) -> List[Dict]:
+        """Most recent sampled routing traces, newest last"""
+        with self._lock:
+            traces = list(self._traces)
+        return traces[-limit:] if limit else traces
+
+    def snapshot(self) -> Dict:
+        """Histograms as {stage: {agent: summary}} plus request counts per agent and outcome"""
+        with self._lock:
+            stages: Dict[str, Dict] = {}
+            for (stage, agent), histogram in self._histograms.items():
+                stages.setdefault(stage, {})[agent] = histogram.snapshot()
+            requests: Dict[str, Dict[str, int]] = {}
+            for (agent, outcome), count in self._requests.items():
+                requests.setdefault(agent, {})[outcome] = count
+        return {'stages': stages, 'requests': requests}
+
+    def render_prometheus(self, prefix: str = 'fccs_router') -> str:
+        """Render metrics in the Prometheus text exposition format for a /metrics endpoint"""
+        snapshot = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_stage_seconds Latency of each route_query stage by selected agent",
+            f"# TYPE {prefix}_stage_seconds histogram"
+        ]
+        for stage, agents in sorted(snapshot['stages'].items()):
+            for agent, summary in sorted(agents.items()):
+                labels = f'stage="{stage}",agent="{agent}"'
+                for bound, cumulative in summary['buckets']:
+                    le = '+Inf' if bound == float('inf') else f"{bound:g}"
+                    lines.append(f'{prefix}_stage_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f'{prefix}_stage_seconds_sum{{{labels}}} {summary["sum"]:.6f}')
+                lines.append(f'{prefix}_stage_seconds_count{{{labels}}} {summary["count"]}')
+        lines.append(f"# HELP {prefix}_requests_total Routed requests by selected agent and outcome")
+        lines.append(f"# TYPE {prefix}_requests_total counter")
+        for agent, outcomes in sorted(snapshot['requests'].items()):
+            for outcome, count in sorted(outcomes.items()):
+                lines.append(f'{prefix}_requests_total{{agent="{agent}",outcome="{outcome}"}} {count}')
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,279 @@
+"""
+Conversation Memory for FCCS AI System
+Bounded per-session chat memory: recent turns verbatim, older turns compacted into a summary
+by a background worker, rendered into the task prompt within a fixed token budget
+"""
+import atexit
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from context_packer import CHARS_PER_TOKEN, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+# summarizer(previous summary, turns to fold in, token budget) -> new summary
+Summarizer = Callable[[str, List[Tuple[str, str]], int], str]
+
+
+def _clip(text: str, tokens: int) -> str:
+    """Cut text to roughly `tokens` tokens on a word boundary"""
+    limit = tokens * CHARS_PER_TOKEN
+    text = " ".join(text.split())
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(' ', 1)[0] + '…'
+
+
+def extractive_summary(summary: str, turns: List[Tuple[str, str]], budget: int) -> str:
+    """Fold turns into the summary as one line each (first sentence, clipped)
+
+    When the result exceeds the budget the oldest lines are dropped, so the
+    summary favours the most recent context.
+    """
+    lines = summary.splitlines() if summary else []
+    for role, text in turns:
+        first_sentence = _SENTENCE_END.split(text.strip(), 1)[0]
+        lines.append(f"- {role}: {_clip(first_sentence, 40)}")
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > budget:
+        lines.pop(0)
+    summary = "\n".join(lines)
+    return _clip(summary, budget) if estimate_tokens(summary) > budget else summary
+
+
+def _complete(llm, prompt: str) -> str:
+    """Text of one completion from a LangChain chat model (invoke) or a CrewAI-style LLM (call)"""
+    messages = [{'role': 'user', 'content': prompt}]
+    if hasattr(llm, 'invoke'):
+        content = getattr(llm.invoke(messages), 'content', '')
+        if isinstance(content, list):
+            content = "".join(block.get('text', '') for block in content if isinstance(block, dict))
+        return str(content)
+    return str(llm.call(messages))
+
+
+def llm_summarizer(llm, fallback: Summarizer = extractive_summary) -> Summarizer:
+    """Summarize with an LLM; an empty answer falls back to extractive_summary
+
+    LLM errors propagate, so ConversationMemory counts them under
+    summarizer_errors and logs them before using the extractive summary.
+    """
+    def summarize(summary: str, turns: List[Tuple[str, str]], budget: int) -> str:
+        transcript = "\n".join(f"{role}: {text}" for role, text in turns)
+        prompt = (
+            f"Update the running summary of a conversation about Oracle FCCS. Keep facts, entities, "
+            f"decisions and open questions; drop pleasantries. Answer with the summary only, at most "
+            f"{budget * CHARS_PER_TOKEN // 6} words.\n\nCURRENT SUMMARY:\n{summary or '(none)'}\n\n"
+            f"NEW TURNS:\n{transcript}"
+        )
+        updated = _complete(llm, prompt).strip()
+        return _clip(updated, budget) if updated else fallback(summary, turns, budget)
+    return summarize
+
+
+class _Session:
+    __slots__ = ('summary', 'turns', 'turn_tokens', 'compacting', 'last_used', 'compactions')
+
+    def __init__(self):
+        self.summary = ""
+        self.turns: Deque[Tuple[str, str, int]] = deque()
+        self.turn_tokens = 0
+        self.compacting = False
+        self.last_used = time.monotonic()
+        self.compactions = 0
+
+
+class ConversationMemory:
+    """Per-session memory with a token budget
+
+    Every answered question adds a user and an assistant turn. Once a
+    session's turns exceed `token_budget`, the worker thread folds all but the
+    last `recent_turns` turns into the session summary (at most
+    `summary_tokens`). render() never waits for that: it returns the summary
+    plus as many recent turns as fit the budget, so prompts stay flat even
+    while compaction is behind. Sessions are evicted least-recently-used
+    beyond `max_sessions` and after `ttl_seconds` idle.
+    """
+
+    def __init__(self, token_budget: int = 1200, recent_turns: int = 4, summary_tokens: int = 300,
+                 max_sessions: int = 1000, ttl_seconds: float = 3600.0,
+                 summarizer: Optional[Summarizer] = None):
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.summary_tokens = min(summary_tokens, token_budget)
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.summarizer = summarizer or extractive_summary
+        self._sessions: 'OrderedDict[str, _Session]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._queue: 'queue.Queue' = queue.Queue()
+        self._stats = {'turns': 0, 'compactions': 0, 'turns_compacted': 0, 'summarizer_errors': 0,
+                       'evicted': 0, 'rendered': 0, 'turns_omitted': 0}
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='session-memory-compactor', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @classmethod
+    def from_env(cls, summarizer: Optional[Summarizer] = None) -> Optional['ConversationMemory']:
+        """Build a store from SESSION_MEMORY_* settings; None when SESSION_MEMORY_ENABLED=0"""
+        if os.getenv('SESSION_MEMORY_ENABLED', '1').lower() in ('0', 'false', 'no'):
+            return None
+        return cls(
+            token_budget=int(os.getenv('SESSION_MEMORY_TOKEN_BUDGET', '1200')),
+            recent_turns=int(os.getenv('SESSION_MEMORY_RECENT_TURNS', '4')),
+            summary_tokens=int(os.getenv('SESSION_MEMORY_SUMMARY_TOKENS', '300')),
+            max_sessions=int(os.getenv('SESSION_MEMORY_MAX_SESSIONS', '1000')),
+            ttl_seconds=float(os.getenv('SESSION_MEMORY_TTL_SECONDS', '3600')),
+            summarizer=summarizer
+        )
+
+    def append(self, session_id: str, question: str, answer: str) -> None:
+        """Record one exchange and schedule compaction when the session outgrows its budget"""
+        with self._lock:
+            session = self._session(session_id)
+            for role, text in (('User', question), ('Assistant', answer)):
+                tokens = estimate_tokens(text)
+                session.turns.append((role, text, tokens))
+                session.turn_tokens += tokens
+            self._stats['turns'] += 2
+            schedule = (not session.compacting and len(session.turns) > self.recent_turns
+                        and session.turn_tokens > self.token_budget - self.summary_tokens)
+            if schedule:
+                session.compacting = True
+        if schedule and not self._closed:
+            self._queue.put(session_id)
+
+    def render(self, session_id: str) -> str:
+        """The memory section for a prompt: summary plus the newest turns that fit the budget"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or (not session.turns and not session.summary):
+                return ""
+            self._sessions.move_to_end(session_id)
+            session.last_used = time.monotonic()
+            summary = session.summary
+            turns = list(session.turns)
+        budget = self.token_budget - estimate_tokens(summary)
+        recent: List[str] = []
+        for role, text, tokens in reversed(turns):
+            if tokens > budget:
+                if not recent:
+                    # The newest turn alone is too long; keep its beginning
+                    recent.append(f"{role}: {_clip(text, max(budget, 0))}")
+                break
+            recent.append(f"{role}: {text}")
+            budget -= tokens
+        with self._lock:
+            self._stats['rendered'] += 1
+            self._stats['turns_omitted'] += len(turns) - len(recent)
+        parts = []
+        if summary:
+            parts.append(f"Summary of earlier conversation:\n{summary}")
+        if recent:
+            parts.append("Recent turns:\n" + "\n".join(reversed(recent)))
+        return "\n\n".join(parts)
+
+    def forget(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until no compaction is queued or running; False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._idle:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining if remaining is not None else 0.1)
+        return True
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Finish queued compactions and stop the worker"""
+        if self._closed:
+            return
+        self._closed = True
+        self.flush(timeout)
+        self._queue.put(_STOP)
+        self._thread.join(timeout=1.0)
+
+    def get_stats(self) -> Dict:
+        """Session count, compaction totals and how many turns renders had to leave out"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['sessions'] = len(self._sessions)
+            stats['stored_turn_tokens'] = sum(session.turn_tokens for session in self._sessions.values())
+        stats['pending_compactions'] = self._queue.qsize()
+        return stats
+
+    def _session(self, session_id: str) -> _Session:
+        """Get or create a session (caller holds the lock), evicting idle and excess sessions"""
+        now = time.monotonic()
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = _Session()
+        else:
+            self._sessions.move_to_end(session_id)
+        session.last_used = now
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and now - oldest.last_used <= self.ttl_seconds:
+                break
+            del self._sessions[oldest_id]
+            self._stats['evicted'] += 1
+        return session
+
+    def _run(self) -> None:
+        while True:
+            session_id = self._queue.get()
+            try:
+                if session_id is _STOP:
+                    return
+                self._compact(session_id)
+            finally:
+                with self._idle:
+                    self._queue.task_done()
+                    self._idle.notify_all()
+
+    def _compact(self, session_id: str) -> None:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return
+            fold = len(session.turns) - self.recent_turns
+            if fold <= 0:
+                session.compacting = False
+                return
+            turns = [(role, text) for role, text, _ in list(session.turns)[:fold]]
+            summary = session.summary
+
+        # Summarizing may call an LLM, so it runs without the lock; new turns can arrive meanwhile
+        try:
+            updated = self.summarizer(summary, turns, self.summary_tokens)
+        except Exception as e:
+            logger.warning(f"⚠️ Session summarizer failed, using the extractive summary: {e}")
+            updated = extractive_summary(summary, turns, self.summary_tokens)
+            with self._lock:
+                self._stats['summarizer_errors'] += 1
+
+        with self._lock:
+            if self._sessions.get(session_id) is not session:
+                return
+            for _ in range(fold):
+                _, _, tokens = session.turns.popleft()
+                session.turn_tokens -= tokens
+            session.summary = updated
+            session.compacting = False
+            session.compactions += 1
+            self._stats['compactions'] += 1
+            self._stats['turns_compacted'] += fold
@@ -0,0 +1,127 @@
+"""
+Request Coalescing for FCCS AI System
+Lets concurrent identical queries share one in-flight crew execution (singleflight)
+"""
+import asyncio
+import hashlib
+import os
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from rag_cache import normalize_query
+
+
+def coalescing_key(agent_name: str, query: str, language: str, context: str = "") -> Tuple[str, str, str, str]:
+    """(agent, normalized query, language, caller-context hash): calls with equal keys get the same answer"""
+    context_hash = hashlib.sha256(context.encode('utf-8')).hexdigest()[:16] if context else ''
+    return agent_name, normalize_query(query), language, context_hash
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Deduplicate concurrent executions of the same key
+
+    The first caller for a key (the leader) runs the work; callers arriving
+    while it is in flight wait and receive the leader's result or exception.
+    Nothing is remembered once the call completes, so this is not a cache.
+    Threads and each event loop have separate in-flight tables.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Any, _Call] = {}
+        self._async_calls: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Any, asyncio.Task]]' = \
+            weakref.WeakKeyDictionary()
+        self._async_waiters: Dict[int, int] = {}
+        self._stats = {'executions': 0, 'coalesced': 0, 'max_waiters': 0}
+
+    @classmethod
+    def from_env(cls) -> Optional['SingleFlight']:
+        """Build a coalescer; None when AGENT_ROUTER_COALESCE=0"""
+        if os.getenv('AGENT_ROUTER_COALESCE', '1').lower() in ('0', 'false', 'no'):
+            return None
+        return cls()
+
+    def do(self, key, work: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run work() once per in-flight key; returns (result, shared) where shared means another call ran it"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats['executions'] += 1
+            else:
+                call.waiters += 1
+                self._stats['coalesced'] += 1
+                self._stats['max_waiters'] = max(self._stats['max_waiters'], call.waiters)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = work()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    async def ado(self, key, work: Callable[[], Awaitable]) -> Tuple[Any, bool]:
+        """Async do(): the shared execution runs as its own task, so cancelling one
+        caller does not cancel it for the others; it is cancelled only when every
+        caller has gone away"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            calls = self._async_calls.setdefault(loop, {})
+            task = calls.get(key)
+            shared = task is not None
+            if shared:
+                self._stats['coalesced'] += 1
+            else:
+                task = calls[key] = loop.create_task(work())
+                self._stats['executions'] += 1
+                task.add_done_callback(lambda _: self._forget(loop, key, task))
+            waiters = self._async_waiters[id(task)] = self._async_waiters.get(id(task), 0) + 1
+            self._stats['max_waiters'] = max(self._stats['max_waiters'], waiters - 1)
+
+        try:
+            return await asyncio.shield(task), shared
+        except asyncio.CancelledError:
+            with self._lock:
+                remaining = self._async_waiters.get(id(task), 1) - 1
+                self._async_waiters[id(task)] = remaining
+            if remaining <= 0 and not task.done():
+                task.cancel()
+            raise
+
+    def _forget(self, loop: asyncio.AbstractEventLoop, key, task: 'asyncio.Task') -> None:
+        with self._lock:
+            calls = self._async_calls.get(loop)
+            if calls is not None and calls.get(key) is task:
+                del calls[key]
+            self._async_waiters.pop(id(task), None)
+
+    def get_stats(self) -> Dict:
+        """Executions started, calls that joined one instead, and current in-flight keys"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls) + sum(len(calls) for calls in self._async_calls.values())
+        total = stats['executions'] + stats['coalesced']
+        stats['coalesced_rate'] = stats['coalesced'] / total if total else 0.0
+        return stats
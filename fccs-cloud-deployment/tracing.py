@@ -0,0 +1,316 @@
+"""
+Request Tracing for FCCS AI System
+Head-sampled structured spans (request, route, retrieve, kickoff, format) exported as
+OTLP/JSON to a local JSONL file or an OTLP/HTTP collector
+"""
+import atexit
+import json
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from typing import Dict, List, Optional
+
+_STOP = object()
+SERVICE_NAME = 'fccs-agent-router'
+
+
+class Span:
+    """One timed operation inside a request trace"""
+    __slots__ = ('name', 'span_id', 'parent_id', 'start_ns', 'end_ns', 'attributes', 'error')
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: Dict):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def to_otlp(self, trace_id: str) -> Dict:
+        span = {
+            'traceId': trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': 1,  # SPAN_KIND_INTERNAL
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns or time.time_ns()),
+            'attributes': [_otlp_attribute(key, value) for key, value in self.attributes.items() if value is not None],
+            'status': {'code': 2, 'message': self.error} if self.error else {'code': 1}
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+
+class _SpanScope:
+    """Context manager that ends a span and records an escaping exception as its error"""
+    __slots__ = ('_span',)
+
+    def __init__(self, span: Span):
+        self._span = span
+
+    def __enter__(self) -> Span:
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc is not None:
+            self._span.error = f"{exc_type.__name__}: {exc}"
+        self._span.end_ns = time.time_ns()
+        return False
+
+
+class _NoopScope:
+    """Shared stand-in for spans of unsampled requests: records nothing"""
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+_NOOP_SCOPE = _NoopScope()
+
+
+class RequestTrace:
+    """Spans of one request under a root span; an unsampled trace is a no-op
+
+    The sampling decision is made once, when the request starts (head
+    sampling), so the hot path of an unsampled request only pays for a
+    shared no-op context manager per stage.
+    """
+
+    def __init__(self, tracer: Optional['Tracer'], name: str, sampled: bool, verbose: bool = False,
+                 attributes: Optional[Dict] = None):
+        self.tracer = tracer
+        self.sampled = sampled
+        # Flagged requests also get verbose crew output
+        self.verbose = verbose
+        self.trace_id = os.urandom(16).hex() if sampled else None
+        self.root = Span(name, None, dict(attributes or {})) if sampled else None
+        self.spans: List[Span] = []
+        self._ended = False
+
+    def span(self, name: str, **attributes):
+        """Context manager timing one stage as a child of the root span"""
+        if not self.sampled:
+            return _NOOP_SCOPE
+        span = Span(name, self.root.span_id, attributes)
+        self.spans.append(span)
+        return _SpanScope(span)
+
+    def set(self, **attributes) -> None:
+        """Attach attributes to the root span"""
+        if self.sampled:
+            self.root.attributes.update(attributes)
+
+    def end(self, result: Optional[Dict] = None, error: Optional[str] = None) -> None:
+        """Close the root span, copying the outcome from a route_query() result, and export"""
+        if not self.sampled or self._ended:
+            return
+        self._ended = True
+        if result is not None:
+            self.root.attributes.update({
+                'agent': result.get('selected_agent'),
+                'confidence': result.get('confidence'),
+                'success': result.get('success'),
+                'cached': result.get('cached'),
+                'coalesced': result.get('coalesced'),
+                'execution_tier': result.get('execution_tier')
+            })
+            error = error or result.get('error')
+        self.root.error = error
+        self.root.end_ns = time.time_ns()
+        if self.tracer is not None:
+            self.tracer.export(self)
+
+    def to_otlp(self) -> Dict:
+        """The trace as one OTLP/JSON ExportTraceServiceRequest"""
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': [_otlp_attribute('service.name', SERVICE_NAME)]},
+                'scopeSpans': [{
+                    'scope': {'name': 'fccs.agent_router'},
+                    'spans': [span.to_otlp(self.trace_id) for span in [self.root] + self.spans]
+                }]
+            }]
+        }
+
+
+UNSAMPLED = RequestTrace(None, 'request', sampled=False)
+
+
+def _otlp_attribute(key: str, value) -> Dict:
+    if isinstance(value, bool):
+        typed = {'boolValue': value}
+    elif isinstance(value, int):
+        typed = {'intValue': str(value)}
+    elif isinstance(value, float):
+        typed = {'doubleValue': value}
+    else:
+        typed = {'stringValue': str(value)}
+    return {'key': key, 'value': typed}
+
+
+class _BackgroundExporter:
+    """Export traces from a bounded queue on a daemon thread; full queues drop traces"""
+
+    def __init__(self, max_queue: int = 1000, batch_size: int = 50):
+        self.batch_size = batch_size
+        self._queue: 'queue.Queue' = queue.Queue(maxsize=max_queue)
+        self._stats = {'exported': 0, 'dropped': 0, 'errors': 0}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f'trace-exporter-{type(self).__name__}', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, trace: RequestTrace) -> None:
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self._count('dropped')
+
+    def close(self, timeout: float = 5.0) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queued'] = self._queue.qsize()
+        return stats
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[key] += amount
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            traces = [trace for trace in batch if trace is not _STOP]
+            if traces:
+                try:
+                    self._write(traces)
+                    self._count('exported', len(traces))
+                except Exception:
+                    self._count('errors', len(traces))
+            if len(traces) < len(batch):
+                return
+
+    def _write(self, traces: List[RequestTrace]) -> None:
+        raise NotImplementedError
+
+
+class JsonlTraceExporter(_BackgroundExporter):
+    """Append one OTLP/JSON document per trace to a local file"""
+
+    def __init__(self, path: str, **kwargs):
+        self.path = path
+        super().__init__(**kwargs)
+
+    def _write(self, traces: List[RequestTrace]) -> None:
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for trace in traces:
+                f.write(json.dumps(trace.to_otlp(), separators=(',', ':')) + '\n')
+
+
+class OTLPHttpTraceExporter(_BackgroundExporter):
+    """POST batches of traces to an OTLP/HTTP collector (JSON encoding)"""
+
+    def __init__(self, endpoint: str, headers: Optional[Dict[str, str]] = None, timeout: float = 5.0, **kwargs):
+        self.endpoint = endpoint
+        self.headers = dict(headers or {})
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def _write(self, traces: List[RequestTrace]) -> None:
+        resource_spans = [spans for trace in traces for spans in trace.to_otlp()['resourceSpans']]
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps({'resourceSpans': resource_spans}).encode('utf-8'),
+            headers={'Content-Type': 'application/json', **self.headers},
+            method='POST'
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class Tracer:
+    """Start request traces, sampling a fraction of them at the head"""
+
+    def __init__(self, sample_rate: float = 0.0, exporter: Optional[_BackgroundExporter] = None):
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'sampled': 0, 'flagged': 0}
+
+    @classmethod
+    def from_env(cls) -> 'Tracer':
+        """Build a tracer from AGENT_ROUTER_TRACING_* settings
+
+        AGENT_ROUTER_TRACING_SAMPLE_RATE (default 0) is the fraction of
+        requests traced; flagged requests are always traced.
+        AGENT_ROUTER_TRACING_EXPORTER is 'jsonl' (default, to
+        AGENT_ROUTER_TRACING_PATH), 'otlp' (to AGENT_ROUTER_TRACING_OTLP_ENDPOINT
+        or $OTEL_EXPORTER_OTLP_ENDPOINT/v1/traces) or 'none'.
+        """
+        kind = os.getenv('AGENT_ROUTER_TRACING_EXPORTER', 'jsonl').lower()
+        exporter = None
+        if kind == 'jsonl':
+            exporter = JsonlTraceExporter(os.getenv('AGENT_ROUTER_TRACING_PATH', 'traces.jsonl'))
+        elif kind == 'otlp':
+            endpoint = os.getenv('AGENT_ROUTER_TRACING_OTLP_ENDPOINT')
+            if not endpoint:
+                base = os.getenv('OTEL_EXPORTER_OTLP_ENDPOINT', 'http://localhost:4318')
+                endpoint = base.rstrip('/') + '/v1/traces'
+            exporter = OTLPHttpTraceExporter(endpoint)
+        return cls(float(os.getenv('AGENT_ROUTER_TRACING_SAMPLE_RATE', '0')), exporter)
+
+    def start(self, name: str = 'request', flagged: bool = False, **attributes) -> RequestTrace:
+        """Begin a request trace; flagged requests are always sampled and run verbose"""
+        sampled = flagged or (self.sample_rate > 0 and random.random() < self.sample_rate)
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['sampled'] += sampled
+            self._stats['flagged'] += flagged
+        if not sampled:
+            return UNSAMPLED
+        return RequestTrace(self, name, sampled=True, verbose=flagged, attributes=attributes)
+
+    def export(self, trace: RequestTrace) -> None:
+        if self.exporter is not None:
+            self.exporter.submit(trace)
+
+    def close(self, timeout: float = 5.0) -> None:
+        if self.exporter is not None:
+            self.exporter.close(timeout)
+
+    def get_stats(self) -> Dict:
+        """Requests seen, sampled and flagged, plus exporter counts"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['sample_rate'] = self.sample_rate
+        if self.exporter is not None:
+            stats['exporter'] = dict(self.exporter.get_stats(), kind=type(self.exporter).__name__)
+        return stats
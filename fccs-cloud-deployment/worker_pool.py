@@ -0,0 +1,569 @@
+"""
+Router Worker Pool for FCCS AI System
+Serves route_query() from several pre-warmed router processes behind one shared request queue,
+with heartbeat health checks and restart-on-crash, so CPU-bound routing scales past one core
+"""
+import asyncio
+import atexit
+import importlib
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from multiprocessing.connection import wait as wait_for_connections
+from typing import Deque, Dict, Optional, Set, Tuple
+
+from session_memory import ConversationMemory
+
+logger = logging.getLogger(__name__)
+
+_STOP = None
+# Broadcast to every worker after a knowledge-base change
+_INVALIDATE = ('invalidate',)
+DEFAULT_ROUTER = 'agent_router:AgentRouter'
+
+# (request id, query, route_query() keyword arguments, format_html)
+Request = Tuple[int, str, Dict, bool]
+
+
+def _failure(query: str, error: str, **extra) -> Dict:
+    """A route_query()-shaped failure result for requests the pool could not serve"""
+    return {'success': False, 'error': error, 'query': query, 'selected_agent': None, 'confidence': 0.0, **extra}
+
+
+def _heartbeat(heartbeats, slot: int, interval: float, stop: threading.Event) -> None:
+    # A thread rather than the request loop, so a long request is not mistaken for a hang
+    while not stop.wait(interval):
+        heartbeats[slot] = time.time()
+
+
+def _worker_main(slot: int, router_path: str, conn, heartbeats, heartbeat_interval: float, threads: int) -> None:
+    """Worker process: build and warm a router, then serve requests sent over `conn`"""
+    # Conversation memory lives in the parent; a worker only sees the rendered section
+    os.environ['SESSION_MEMORY_ENABLED'] = '0'
+    heartbeats[slot] = time.time()
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(heartbeats, slot, heartbeat_interval, stop),
+                     name='worker-heartbeat', daemon=True).start()
+
+    import agent_router
+    from response_formatter import FCCSResponseFormatter
+
+    module_name, _, class_name = router_path.partition(':')
+    router_class = getattr(importlib.import_module(module_name), class_name)
+    agent_router.warm_up()
+    router = router_class()
+    formatter = FCCSResponseFormatter()
+    # First use fills the regex and language-detection caches
+    router.analyze_intent("warm up consolidation journal rules")
+
+    inbox: 'queue.Queue' = queue.Queue()
+    send_lock = threading.Lock()
+
+    def send(message: Tuple) -> None:
+        with send_lock:
+            conn.send(message)
+
+    def serve() -> None:
+        while True:
+            request = inbox.get()
+            if request is _STOP:
+                return
+            request_id, query, options, format_html = request
+            send(('started', request_id))
+            try:
+                result = router.route_query(query, **options)
+                if format_html:
+                    result['formatted'] = formatter.format_response(result.get('result', ''),
+                                                                    result.get('selected_agent'))
+            except Exception as e:
+                result = _failure(query, str(e))
+            send(('done', request_id, result))
+
+    # A few threads per process overlap LLM and retrieval waits; the processes spread the CPU work.
+    # The threads share one router, which is safe because it gives every crew its own agent
+    servers = [threading.Thread(target=serve, name=f'worker-{slot}-server-{index}', daemon=True)
+               for index in range(max(1, threads))]
+    for server in servers:
+        server.start()
+    send(('ready', os.getpid()))
+    try:
+        while True:
+            try:
+                request = conn.recv()
+            except EOFError:
+                request = _STOP
+            if request is _STOP:
+                break
+            if request == _INVALIDATE:
+                # Handled here, not queued, so it takes effect before any later request starts
+                router.notify_documents_uploaded()
+                continue
+            inbox.put(request)
+        for _ in servers:
+            inbox.put(_STOP)
+        for server in servers:
+            server.join()
+    finally:
+        stop.set()
+        router.close()
+
+
+class _Worker:
+    __slots__ = ('slot', 'process', 'conn', 'send_lock', 'pid', 'ready', 'started_at', 'assigned', 'started',
+                 'served', 'restarts', 'fast_crashes', 'restart_at')
+
+    def __init__(self, slot: int):
+        self.slot = slot
+        self.process: Optional[multiprocessing.process.BaseProcess] = None
+        self.conn = None
+        self.send_lock = threading.Lock()
+        self.pid: Optional[int] = None
+        self.ready = False
+        self.started_at = 0.0
+        # Requests sent to the worker, and the subset it has begun executing
+        self.assigned: Dict[int, Request] = {}
+        self.started: Set[int] = set()
+        self.served = 0
+        self.restarts = 0
+        self.fast_crashes = 0
+        self.restart_at: Optional[float] = None
+
+
+class RouterWorkerPool:
+    """Run route_query() in `workers` router processes fed from one shared queue
+
+    Each worker builds its own router (agents, compiled routing rules, task
+    templates) and serves up to `threads_per_worker` requests at a time, so
+    CPU work such as crew construction, regex scoring and response
+    formatting runs on as many cores as there are workers instead of
+    contending for one GIL, while LLM waits still overlap within a worker.
+    A worker's threads share its router; the router builds a new agent per
+    crew, since CrewAI cannot run one agent's executor concurrently.
+    The queue lives in this process and a request goes to whichever warmed
+    worker has a free thread, which balances load by itself.
+
+    Each worker has its own pipe, so a worker killed mid-read cannot leave
+    a lock held that the others need. A monitor thread restarts workers that
+    exit or whose heartbeat goes stale. Requests a crashed worker had not
+    started go back to the front of the queue; those it was executing fail
+    rather than being retried, since one of them may be what crashed it.
+    Workers that keep crashing soon after starting are restarted with
+    exponential backoff. Conversation memory is kept here and sent to
+    workers as a rendered section, so any worker can serve any turn.
+    notify_documents_uploaded() clears every worker's retrieval and answer
+    caches; a worker restarted later starts with empty caches anyway.
+    """
+
+    def __init__(self, workers: int = 2, router: str = DEFAULT_ROUTER, threads_per_worker: int = 4,
+                 max_pending: int = 1000, request_timeout: float = 300.0, heartbeat_interval: float = 1.0,
+                 health_timeout: float = 30.0, startup_timeout: float = 120.0, restart_backoff: float = 1.0,
+                 max_restart_backoff: float = 30.0, start_method: str = 'spawn',
+                 session_memory: Optional[ConversationMemory] = None):
+        self.workers = max(1, workers)
+        self.router = router
+        self.threads_per_worker = max(1, threads_per_worker)
+        self.max_pending = max_pending
+        self.request_timeout = request_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.health_timeout = health_timeout
+        self.startup_timeout = startup_timeout
+        self.restart_backoff = restart_backoff
+        self.max_restart_backoff = max_restart_backoff
+        self.session_memory = session_memory if session_memory is not None else ConversationMemory.from_env()
+        # spawn, not fork: the parent runs threads, and forked locks can be left held
+        self._context = multiprocessing.get_context(start_method)
+        self._heartbeats = self._context.Array('d', self.workers, lock=False)
+        self._workers = [_Worker(slot) for slot in range(self.workers)]
+        self._queue: Deque[Request] = deque()
+        self._futures: Dict[int, Future] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._state_changed = threading.Condition(self._lock)
+        self._stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0, 'timeouts': 0,
+                       'requeued': 0, 'crashes': 0, 'hangs': 0, 'restarts': 0}
+        self._closed = threading.Event()
+        for worker in self._workers:
+            self._spawn(worker)
+        self._collector = threading.Thread(target=self._collect, name='worker-pool-collector', daemon=True)
+        self._collector.start()
+        self._monitor = threading.Thread(target=self._watch, name='worker-pool-monitor', daemon=True)
+        self._monitor.start()
+        atexit.register(self.close)
+
+    @classmethod
+    def from_env(cls) -> Optional['RouterWorkerPool']:
+        """Build a pool from AGENT_ROUTER_WORKER* settings; None when AGENT_ROUTER_WORKERS=0
+
+        AGENT_ROUTER_WORKERS defaults to the number of CPU cores.
+        """
+        workers = int(os.getenv('AGENT_ROUTER_WORKERS', str(os.cpu_count() or 1)))
+        if workers <= 0:
+            return None
+        return cls(
+            workers=workers,
+            router=os.getenv('AGENT_ROUTER_WORKER_ROUTER', DEFAULT_ROUTER),
+            threads_per_worker=int(os.getenv('AGENT_ROUTER_WORKER_THREADS', '4')),
+            max_pending=int(os.getenv('AGENT_ROUTER_WORKER_MAX_PENDING', '1000')),
+            request_timeout=float(os.getenv('AGENT_ROUTER_WORKER_REQUEST_TIMEOUT', '300')),
+            heartbeat_interval=float(os.getenv('AGENT_ROUTER_WORKER_HEARTBEAT_SECONDS', '1.0')),
+            health_timeout=float(os.getenv('AGENT_ROUTER_WORKER_HEALTH_TIMEOUT', '30')),
+            startup_timeout=float(os.getenv('AGENT_ROUTER_WORKER_STARTUP_TIMEOUT', '120')),
+            start_method=os.getenv('AGENT_ROUTER_WORKER_START_METHOD', 'spawn')
+        )
+
+    def wait_until_ready(self, timeout: Optional[float] = None, all_workers: bool = True) -> bool:
+        """Block until every worker (or at least one) has warmed up; False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._state_changed:
+            while True:
+                ready = sum(worker.ready for worker in self._workers)
+                if ready == self.workers or (ready and not all_workers):
+                    return True
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if (remaining is not None and remaining <= 0) or self._closed.is_set():
+                    return False
+                self._state_changed.wait(remaining if remaining is not None else 0.5)
+
+    def submit(self, query: str, conversation_id: Optional[str] = None, format_html: bool = False,
+               **options) -> Future:
+        """Queue a query for the next free worker; the future resolves to the route_query() result
+
+        `options` are route_query() keyword arguments. format_html=True also
+        renders the answer with FCCSResponseFormatter in the worker, as
+        result['formatted']. When max_pending requests are already waiting the
+        future fails fast with an overload result instead of queueing.
+        Cancelling the future drops the request if no worker has it yet.
+        """
+        future: Future = Future()
+        if self._closed.is_set():
+            future.set_result(_failure(query, "Worker pool is closed"))
+            return future
+        if conversation_id is not None and self.session_memory is not None:
+            options['memory'] = self.session_memory.render(conversation_id)
+            future.add_done_callback(lambda done: self._remember(conversation_id, query, done))
+        with self._lock:
+            self._stats['submitted'] += 1
+            if len(self._futures) >= self.max_pending:
+                self._stats['rejected'] += 1
+                future.set_result(_failure(query, "Worker pool is overloaded", overloaded=True))
+                return future
+            request_id = next(self._ids)
+            self._futures[request_id] = future
+            self._queue.append((request_id, query, options, format_html))
+        self._dispatch()
+        return future
+
+    def route_query(self, query: str, timeout: Optional[float] = None, **options) -> Dict:
+        """Serve a query on a worker and wait for its result (a failure result on timeout)"""
+        future = self.submit(query, **options)
+        try:
+            return future.result(timeout if timeout is not None else self.request_timeout)
+        except FutureTimeoutError:
+            return self._timed_out(query, future)
+
+    async def aroute_query(self, query: str, timeout: Optional[float] = None, **options) -> Dict:
+        """Async variant of route_query() for async web servers"""
+        future = self.submit(query, **options)
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)),
+                                          timeout if timeout is not None else self.request_timeout)
+        except asyncio.TimeoutError:
+            return self._timed_out(query, future)
+
+    def notify_documents_uploaded(self) -> int:
+        """Invalidate cached retrieval results and answers in every worker; returns how many were told"""
+        with self._lock:
+            workers = [worker for worker in self._workers if worker.conn is not None]
+        notified = sum(self._send(worker, _INVALIDATE) for worker in workers)
+        logger.info(f"🔄 Knowledge base changed; invalidated caches in {notified} router workers")
+        return notified
+
+    def health(self) -> Dict:
+        """Liveness per worker; 'healthy' is True when every worker is up and warmed"""
+        now = time.time()
+        with self._lock:
+            workers = [{
+                'slot': worker.slot,
+                'pid': worker.pid,
+                'alive': worker.process is not None and worker.process.is_alive(),
+                'ready': worker.ready,
+                'in_flight': len(worker.assigned),
+                'served': worker.served,
+                'restarts': worker.restarts,
+                'heartbeat_age': round(now - self._heartbeats[worker.slot], 3)
+            } for worker in self._workers]
+        return {
+            'healthy': not self._closed.is_set() and all(worker['alive'] and worker['ready'] for worker in workers),
+            'ready_workers': sum(worker['ready'] for worker in workers),
+            'workers': workers
+        }
+
+    def get_stats(self) -> Dict:
+        """Request totals, crash/restart counts and current queue depth"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['queued'] = len(self._queue)
+            stats['in_flight'] = sum(len(worker.assigned) for worker in self._workers)
+            stats['ready_workers'] = sum(worker.ready for worker in self._workers)
+        stats['workers'] = self.workers
+        stats['threads_per_worker'] = self.threads_per_worker
+        return stats
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Let workers finish the requests they hold, stop them and fail anything still queued"""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        with self._lock:
+            queued = list(self._queue)
+            self._queue.clear()
+        for request_id, query, _, _ in queued:
+            self._resolve(request_id, _failure(query, "Worker pool is closed"))
+        for worker in self._workers:
+            if worker.conn is not None:
+                self._send(worker, _STOP)
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            worker.process.join(max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join(1.0)
+        self._collector.join(self.heartbeat_interval + 1.0)
+        with self._lock:
+            leftover = [(request_id, request[1]) for worker in self._workers
+                        for request_id, request in worker.assigned.items()]
+        for request_id, query in leftover:
+            self._resolve(request_id, _failure(query, "Worker pool is closed"))
+        if self.session_memory is not None:
+            self.session_memory.close(timeout)
+
+    def __enter__(self) -> 'RouterWorkerPool':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def _spawn(self, worker: _Worker) -> None:
+        parent_conn, child_conn = self._context.Pipe()
+        self._heartbeats[worker.slot] = time.time()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(worker.slot, self.router, child_conn, self._heartbeats, self.heartbeat_interval,
+                  self.threads_per_worker),
+            name=f'agent-router-worker-{worker.slot}',
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        with self._lock:
+            worker.process = process
+            worker.conn = parent_conn
+            worker.pid = process.pid
+            worker.ready = False
+            worker.started_at = time.monotonic()
+            worker.restart_at = None
+
+    @staticmethod
+    def _send(worker: _Worker, message) -> bool:
+        try:
+            with worker.send_lock:
+                worker.conn.send(message)
+            return True
+        except (AttributeError, OSError, ValueError):
+            return False
+
+    def _dispatch(self) -> None:
+        """Hand queued requests to ready workers with a free thread"""
+        while True:
+            with self._lock:
+                target = next((worker for worker in self._workers
+                               if worker.ready and len(worker.assigned) < self.threads_per_worker), None)
+                request = None
+                while target is not None and self._queue:
+                    candidate = self._queue.popleft()
+                    future = self._futures.get(candidate[0])
+                    if future is not None and not future.cancelled():
+                        request = candidate
+                        break
+                    self._futures.pop(candidate[0], None)
+                if request is None:
+                    return
+                target.assigned[request[0]] = request
+            if not self._send(target, request):
+                # The worker is dying; the monitor requeues what it was assigned
+                return
+
+    def _remember(self, conversation_id: str, query: str, future: Future) -> None:
+        if future.cancelled():
+            return
+        result = future.result()
+        if result.get('success'):
+            self.session_memory.append(conversation_id, query, result['result'])
+
+    def _resolve(self, request_id: int, result: Dict) -> None:
+        with self._lock:
+            future = self._futures.pop(request_id, None)
+            if future is None or future.cancelled():
+                return
+            self._stats['completed' if result.get('success') else 'failed'] += 1
+        future.set_result(result)
+
+    def _timed_out(self, query: str, future: Future) -> Dict:
+        future.cancel()
+        with self._lock:
+            self._stats['timeouts'] += 1
+        return _failure(query, "Timed out waiting for a router worker")
+
+    def _collect(self) -> None:
+        """Route worker messages to request futures"""
+        while True:
+            with self._lock:
+                connections = {worker.conn: worker for worker in self._workers if worker.conn is not None}
+            if not connections:
+                if self._closed.is_set():
+                    return
+                time.sleep(self.heartbeat_interval)
+                continue
+            for conn in wait_for_connections(list(connections), timeout=self.heartbeat_interval):
+                worker = connections[conn]
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    # The monitor notices the exit and restarts the worker
+                    with self._lock:
+                        if worker.conn is conn:
+                            worker.conn = None
+                    continue
+                self._handle(worker, message)
+
+    def _handle(self, worker: _Worker, message: Tuple) -> None:
+        kind = message[0]
+        if kind == 'ready':
+            with self._state_changed:
+                worker.ready = True
+                worker.fast_crashes = 0
+                self._state_changed.notify_all()
+            logger.info(f"✅ Router worker {worker.slot} ready (pid {message[1]})")
+        elif kind == 'started':
+            with self._lock:
+                worker.started.add(message[1])
+            return
+        elif kind == 'done':
+            with self._lock:
+                worker.assigned.pop(message[1], None)
+                worker.started.discard(message[1])
+                worker.served += 1
+            self._resolve(message[1], dict(message[2], worker=worker.slot))
+        self._dispatch()
+
+    def _watch(self) -> None:
+        """Restart workers that exited or stopped sending heartbeats"""
+        while not self._closed.wait(self.heartbeat_interval):
+            now = time.monotonic()
+            for worker in self._workers:
+                if worker.restart_at is not None:
+                    if now >= worker.restart_at:
+                        self._restart(worker)
+                    continue
+                process = worker.process
+                if not process.is_alive():
+                    self._on_crash(worker, f"exited with code {process.exitcode}", 'crashes')
+                    continue
+                if not worker.ready and now - worker.started_at < self.startup_timeout:
+                    continue
+                stale = time.time() - self._heartbeats[worker.slot]
+                if stale > self.health_timeout:
+                    reason = f"missed heartbeats for {stale:.0f}s"
+                elif not worker.ready:
+                    reason = f"not ready after {self.startup_timeout:.0f}s"
+                else:
+                    continue
+                process.kill()
+                process.join(1.0)
+                self._on_crash(worker, reason, 'hangs')
+
+    def _on_crash(self, worker: _Worker, reason: str, kind: str) -> None:
+        with self._lock:
+            self._stats[kind] += 1
+            failed = [(request_id, request[1]) for request_id, request in worker.assigned.items()
+                      if request_id in worker.started]
+            requeue = [request for request_id, request in worker.assigned.items()
+                       if request_id not in worker.started]
+            self._queue.extendleft(reversed(requeue))
+            self._stats['requeued'] += len(requeue)
+            worker.assigned, worker.started, worker.ready = {}, set(), False
+            conn, worker.conn = worker.conn, None
+            uptime = time.monotonic() - worker.started_at
+            # Crashing again soon after a start means something is broken; back off
+            worker.fast_crashes = worker.fast_crashes + 1 if uptime < max(self.startup_timeout, 60.0) else 0
+            delay = min(self.max_restart_backoff, self.restart_backoff * 2 ** max(0, worker.fast_crashes - 1))
+            worker.restart_at = time.monotonic() + delay
+        if conn is not None:
+            conn.close()
+        logger.error(f"❌ Router worker {worker.slot} (pid {worker.pid}) {reason}; restarting in {delay:.1f}s")
+        for request_id, query in failed:
+            self._resolve(request_id, _failure(query, f"Router worker crashed while serving the request ({reason})",
+                                               worker=worker.slot))
+        self._dispatch()
+
+    def _restart(self, worker: _Worker) -> None:
+        with self._lock:
+            self._stats['restarts'] += 1
+            worker.restarts += 1
+        self._spawn(worker)
+
+
+class PooledCrewAIRouter:
+    """CrewAIRouter's string API on top of a RouterWorkerPool, for main.py
+
+    With AGENT_ROUTER_WORKERS=0 (and no pool given) requests are served by
+    an in-process CrewAIRouter instead.
+    """
+
+    def __init__(self, pool: Optional[RouterWorkerPool] = None):
+        self.pool = pool or RouterWorkerPool.from_env()
+        self.local = None
+        if self.pool is None:
+            from agent_router import CrewAIRouter
+            self.local = CrewAIRouter()
+
+    def route_query(self, question: str, session_id: Optional[str] = None) -> str:
+        if self.local is not None:
+            return self.local.route_query(question, session_id=session_id)
+        return self._text(self.pool.route_query(question, conversation_id=session_id))
+
+    async def aroute_query(self, question: str, timeout: Optional[float] = None,
+                           session_id: Optional[str] = None) -> str:
+        if self.local is not None:
+            return await self.local.aroute_query(question, timeout=timeout, session_id=session_id)
+        return self._text(await self.pool.aroute_query(question, timeout=timeout, conversation_id=session_id))
+
+    def notify_documents_uploaded(self) -> None:
+        """Invalidate retrieval and answer caches wherever requests are served"""
+        if self.local is not None:
+            self.local.notify_documents_uploaded()
+        else:
+            self.pool.notify_documents_uploaded()
+
+    def health(self) -> Dict:
+        if self.local is not None:
+            return {'healthy': True, 'ready_workers': 0, 'workers': []}
+        return self.pool.health()
+
+    def close(self) -> None:
+        if self.local is not None:
+            self.local.close()
+        else:
+            self.pool.close()
+
+    @staticmethod
+    def _text(result: Dict) -> str:
+        if result.get('success'):
+            return result.get('result', '')
+        return f"Error: {result.get('error', 'Unknown error')}"